@@ -0,0 +1,48 @@
+"""Synthetic timelapse frames for benchmarks: a drifting gradient with moving shapes and noise,
+so encoders and temporal filters have realistic work to do."""
+
+import os
+from typing import List
+
+import cv2
+import numpy as np
+
+
+_WRITE_PARAMS = {
+    "webp": [cv2.IMWRITE_WEBP_QUALITY, 85],  # pylint: disable=no-member
+    "jpg": [cv2.IMWRITE_JPEG_QUALITY, 90],   # pylint: disable=no-member
+    "png": [],
+}
+
+
+def generate_frames(
+    directory: str,
+    count: int,
+    width: int = 1280,
+    height: int = 720,
+    seed: int = 0,
+    image_format: str = "webp",
+) -> List[str]:
+    """Write `count` frames (webp, jpg or png) into `directory` (reusing existing ones) and return their paths."""
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    xs = np.linspace(0, 255, width, dtype=np.float32)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"frame_{width}x{height}_{i:06d}.{image_format}")
+        paths.append(path)
+        if os.path.exists(path):
+            continue
+        shift = (i * 3) % 256
+        row = ((xs + shift) % 256).astype(np.uint8)
+        image = np.dstack([np.tile(row, (height, 1))] * 3)
+        image[..., 1] = np.uint8(128 + 100 * np.sin(i / 25))
+        cx = int(width / 2 + width / 3 * np.cos(i / 40))
+        cy = int(height / 2 + height / 3 * np.sin(i / 30))
+        cv2.circle(image, (cx, cy), height // 8, (40, 200, 255), -1)  # pylint: disable=no-member
+        # Small random camera shake, as real captures have.
+        dx, dy = rng.integers(-4, 5, size=2)
+        image = np.roll(image, (int(dy), int(dx)), axis=(0, 1))
+        noise = rng.integers(0, 12, size=image.shape, dtype=np.uint8)
+        cv2.imwrite(path, cv2.add(image, noise), _WRITE_PARAMS[image_format])  # pylint: disable=no-member
+    return paths
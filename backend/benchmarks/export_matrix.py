@@ -0,0 +1,301 @@
+"""Benchmark complete exports across a matrix of filter chains, codecs and resolutions.
+
+Synthetic frames are registered as Frame rows in a scratch SQLite database, and every
+combination is exported through export_manager.run_export, the runner the export queue
+uses, in a worker process of its own so peak memory is measured per run:
+
+    python benchmarks/export_matrix.py --frames 600 --image-format jpg \\
+        --filters none denoise stabilize deflicker --formats mp4 webm \\
+        --resolutions original 1280x720 --output before.json
+
+Needs ffmpeg on PATH. Frames are cached in --work-dir between runs. The export caches
+start empty for every run and export proxies are disabled, so runs do not depend on their
+order. Prints (or writes to --output) a JSON report with wall time, frames/s, peak RSS of
+the worker and of its largest FFmpeg process, and output size per run, together with the
+commit and FFmpeg version it was measured with; compare two reports to find regressions.
+
+FFmpeg's peak RSS is the VmHWM of its own address space, sampled from /proc every
+_SAMPLE_SECONDS while the export runs (null where there is no /proc). getrusage cannot
+tell it apart: a child's ru_maxrss keeps the high-water mark of the forked worker it
+started as.
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+
+import database  # noqa: E402
+import export_manager  # noqa: E402
+import exposure  # noqa: E402
+from benchmarks._synthetic import generate_frames  # noqa: E402
+from models import AppSettings, Camera, ConnectionType, ExportJob, ExportStatus, Frame  # noqa: E402
+from models import Timelapse, TimelapseStatus  # noqa: E402
+
+# Filter chains by name: ExportJob columns on top of an unfiltered export.
+FILTER_CHAINS: Dict[str, dict] = {
+    "none": {},
+    "denoise": {"denoising": True},
+    "stabilize": {"stabilization": True},
+    "deflicker": {"deflicker": True},
+    "auto-color": {"color_correction": "auto"},
+    "manual-color": {"color_correction": "manual", "brightness": 0.05, "contrast": 1.1, "saturation": 1.2},
+    "blend": {"smoothing": "blend"},
+    "interpolate": {"smoothing": "interpolate"},
+    "full": {
+        "denoising": True, "stabilization": True, "deflicker": True,
+        "color_correction": "manual", "brightness": 0.05, "contrast": 1.1, "saturation": 1.2,
+    },
+}
+# Linux reports ru_maxrss in kilobytes, macOS in bytes.
+_MAXRSS_BYTES = 1 if sys.platform == "darwin" else 1024
+_INSERT_BATCH_ROWS = 1000
+_SAMPLE_SECONDS = 0.05
+
+
+def _use_database(path: str) -> None:
+    """Point every SessionLocal of the backend at the scratch database."""
+    database.SessionLocal.configure(
+        bind=create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    )
+
+
+def _build_database(args: argparse.Namespace, frame_paths: List[str], path: str, storage_path: str) -> None:
+    """Create the scratch database with one timelapse holding the frames, measured as capture does."""
+    if os.path.exists(path):
+        os.unlink(path)
+    _use_database(path)
+    database.Base.metadata.create_all(database.SessionLocal.kw["bind"])
+    db = database.SessionLocal()
+    try:
+        db.add(AppSettings(id=1, storage_path=storage_path, proxy_cache_mb=0))
+        camera = Camera(name="benchmark", connection_type=ConnectionType.hardware, device_index=0)
+        db.add(camera)
+        db.flush()
+        timelapse = Timelapse(
+            camera_id=camera.id, name="benchmark", interval_seconds=args.interval,
+            status=TimelapseStatus.completed,
+        )
+        db.add(timelapse)
+        db.flush()
+        start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        rows = []
+        for index, frame_path in enumerate(frame_paths):
+            red, green, blue = exposure.measure_file(frame_path) or (None, None, None)
+            rows.append({
+                "timelapse_id": timelapse.id,
+                "file_path": frame_path,
+                "captured_at": start + datetime.timedelta(seconds=index * args.interval),
+                "red_mean": red, "green_mean": green, "blue_mean": blue,
+            })
+            if len(rows) == _INSERT_BATCH_ROWS:
+                db.execute(insert(Frame), rows)
+                rows = []
+        if rows:
+            db.execute(insert(Frame), rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+class _FfmpegPeak:
+    """Largest VmHWM, in kB, of the FFmpeg processes this process starts while the block runs."""
+
+    def __init__(self) -> None:
+        self.kilobytes: Optional[int] = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "_FfmpegPeak":
+        if os.path.isdir("/proc"):
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._thread.is_alive():
+            self._done.set()
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._done.wait(_SAMPLE_SECONDS):
+            self._sample()
+
+    def _sample(self) -> None:
+        parent = os.getpid()
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat", encoding="utf-8") as fh:
+                    # "pid (comm) state ppid ...": comm may contain spaces.
+                    if int(fh.read().rsplit(")", 1)[1].split()[1]) != parent:
+                        continue
+                with open(f"/proc/{entry}/status", encoding="utf-8") as fh:
+                    status = dict(line.split(":", 1) for line in fh if ":" in line)
+            except (OSError, ValueError, IndexError):
+                continue  # exited meanwhile
+            # Before exec the child is still a copy of this worker.
+            if status.get("Name", "").strip() != "ffmpeg" or "VmHWM" not in status:
+                continue
+            kilobytes = int(status["VmHWM"].split()[0])
+            self.kilobytes = max(self.kilobytes or 0, kilobytes)
+
+
+def _job_columns(args: argparse.Namespace, filters: str, output_format: str, resolution: str) -> dict:
+    columns = {
+        "output_format": output_format,
+        "output_fps": args.fps,
+        "resolution": "original" if resolution == "original" else "custom",
+        "custom_resolution": None if resolution == "original" else resolution,
+        "crf": args.crf,
+        "speed_profile": args.profile,
+        "parallel_segments": args.segments,
+    }
+    columns.update(FILTER_CHAINS[filters])
+    return columns
+
+
+def _run_worker(spec: dict) -> dict:
+    """Export one combination in this process and measure it."""
+    _use_database(spec["database"])
+    shutil.rmtree(spec["storage_path"], ignore_errors=True)
+    os.makedirs(spec["storage_path"])
+    db = database.SessionLocal()
+    try:
+        job = ExportJob(
+            timelapse_id=1,
+            status=ExportStatus.running,
+            total_frames=spec["frames"],
+            output_path=spec["output_path"],
+            **spec["job"],
+        )
+        db.add(job)
+        db.commit()
+        with _FfmpegPeak() as ffmpeg_peak:
+            start = time.perf_counter()
+            export_manager.run_export(job.id)
+            elapsed = time.perf_counter() - start
+        db.expire_all()
+        job = db.get(ExportJob, job.id)
+        status, error = job.status.value, job.error_message
+    finally:
+        db.close()
+    completed = status == "completed"
+    return {
+        "status": status,
+        "error": error,
+        "wall_seconds": round(elapsed, 2),
+        "frames_per_second": round(spec["frames"] / elapsed, 1) if completed else None,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_BYTES / 1e6, 1),
+        "peak_ffmpeg_rss_mb": (
+            round(ffmpeg_peak.kilobytes * 1024 / 1e6, 1) if ffmpeg_peak.kilobytes is not None else None
+        ),
+        "output_bytes": os.path.getsize(spec["output_path"]) if completed else None,
+    }
+
+
+def _describe(command: List[str]) -> str:
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=10, check=False)
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+    lines = result.stdout.splitlines()
+    return lines[0].strip() if result.returncode == 0 and lines else "unknown"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--image-format", choices=("webp", "jpg", "png"), default="webp")
+    parser.add_argument("--interval", type=int, default=60, help="seconds between the synthetic captures")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--crf", type=int, default=28)
+    parser.add_argument("--profile", choices=("fast", "balanced", "archival"), default="balanced")
+    parser.add_argument("--segments", type=int, default=1, help="parallel_segments of every export (0 = one per core)")
+    parser.add_argument("--filters", choices=sorted(FILTER_CHAINS), nargs="+", default=["none", "denoise", "stabilize"])
+    parser.add_argument("--formats", choices=("mp4", "webm"), nargs="+", default=["mp4", "webm"])
+    parser.add_argument("--resolutions", nargs="+", default=["original", "1280x720"], help='"original" or WxH')
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "chronicle_bench"))
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(_run_worker(json.loads(args.worker))))
+        return 0
+
+    for resolution in args.resolutions:
+        if resolution != "original" and not all(v.isdigit() for v in resolution.split("x", 1)):
+            parser.error(f"resolution must be 'original' or WxH: {resolution}")
+
+    frame_paths = generate_frames(
+        os.path.join(args.work_dir, "frames"), args.frames, args.width, args.height, image_format=args.image_format,
+    )
+    database_path = os.path.join(args.work_dir, "export_matrix.db")
+    storage_path = os.path.join(args.work_dir, "storage")
+    _build_database(args, frame_paths, database_path, storage_path)
+
+    runs = []
+    for filters, output_format, resolution in itertools.product(args.filters, args.formats, args.resolutions):
+        spec = {
+            "database": database_path,
+            "storage_path": storage_path,
+            "output_path": os.path.join(args.work_dir, f"matrix.{output_format}"),
+            "frames": args.frames,
+            "job": _job_columns(args, filters, output_format, resolution),
+        }
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", json.dumps(spec)],
+            capture_output=True, text=True, check=False,
+        )
+        if result.returncode != 0:
+            measured = {"status": "error", "error": result.stderr.strip()[-2000:]}
+        else:
+            measured = json.loads(result.stdout.strip().splitlines()[-1])
+        run = {"filters": filters, "format": output_format, "resolution": resolution, **measured}
+        print(
+            f"{filters:>12} {output_format:>4} {resolution:>9}: {run['status']}"
+            f" {run.get('wall_seconds', '-')}s",
+            file=sys.stderr,
+        )
+        runs.append(run)
+
+    report = {
+        "commit": _describe(["git", "-C", os.path.dirname(os.path.abspath(__file__)), "rev-parse", "--short", "HEAD"]),
+        "ffmpeg": _describe(["ffmpeg", "-hide_banner", "-version"]),
+        "cpu_count": os.cpu_count(),
+        "frames": args.frames,
+        "source": f"{args.width}x{args.height} {args.image_format}",
+        "fps": args.fps,
+        "crf": args.crf,
+        "profile": args.profile,
+        "segments": args.segments,
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+            fh.write("\n")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 0 if all(run["status"] == "completed" for run in runs) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
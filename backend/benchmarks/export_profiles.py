@@ -0,0 +1,99 @@
+"""Compare export speed profiles: encode fps and output size per codec on synthetic frames.
+
+Runs the same single-process export_manager encode path the server uses, without the database:
+
+    python benchmarks/export_profiles.py --frames 600 --formats webm mp4 --profiles fast balanced archival
+
+Needs ffmpeg on PATH. Frames are cached in --work-dir between runs. Prints a JSON summary
+with wall time, encode fps and output size per run, and size relative to "balanced".
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import export_manager  # noqa: E402
+from benchmarks._synthetic import generate_frames  # noqa: E402
+from frame_selection import FrameList  # noqa: E402
+from models.export import ExportJob  # noqa: E402
+
+_PROFILES = ("fast", "balanced", "archival")
+
+
+def _job(args: argparse.Namespace, output_format: str, profile: str, output_path: str, job_id: int) -> ExportJob:
+    return ExportJob(
+        id=job_id,
+        output_format=output_format,
+        output_fps=args.fps,
+        resolution="original",
+        crf=args.crf,
+        speed_profile=profile,
+        stabilization=False,
+        denoising=False,
+        output_path=output_path,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--crf", type=int, default=28)
+    parser.add_argument("--formats", choices=("mp4", "webm"), nargs="+", default=["webm", "mp4"])
+    parser.add_argument("--profiles", choices=_PROFILES, nargs="+", default=list(_PROFILES))
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "chronicle_bench"))
+    args = parser.parse_args()
+
+    frame_paths = generate_frames(os.path.join(args.work_dir, "frames"), args.frames, args.width, args.height)
+    frames = FrameList(enumerate(frame_paths, 1))
+    runs = []
+    job_id = 0
+    for output_format in args.formats:
+        for profile in args.profiles:
+            job_id += 1
+            output_path = os.path.join(args.work_dir, f"profile_{profile}.{output_format}")
+            job = _job(args, output_format, profile, output_path, job_id)
+            export_manager.track(job_id)
+            start = time.perf_counter()
+            try:
+                export_manager._encode_single(job, frames)  # pylint: disable=protected-access
+            finally:
+                export_manager._running_jobs.pop(job_id, None)  # pylint: disable=protected-access
+            elapsed = time.perf_counter() - start
+            runs.append({
+                "format": output_format,
+                "profile": profile,
+                "wall_seconds": round(elapsed, 2),
+                "frames_per_second": round(args.frames / elapsed, 1),
+                "output_bytes": os.path.getsize(output_path),
+            })
+
+    frames.close()
+
+    for run in runs:
+        balanced = next(
+            (r for r in runs if r["format"] == run["format"] and r["profile"] == "balanced"), None
+        )
+        if balanced is not None:
+            run["size_vs_balanced"] = round(run["output_bytes"] / balanced["output_bytes"], 2)
+    summary = {
+        "frames": args.frames,
+        "resolution": f"{args.width}x{args.height}",
+        "crf": args.crf,
+        "cpu_count": os.cpu_count(),
+        "runs": runs,
+    }
+    json.dump(summary, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
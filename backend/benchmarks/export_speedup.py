@@ -0,0 +1,97 @@
+"""Compare single-process and parallel segmented export encoding on synthetic frames.
+
+Runs the same export_manager encode paths the server uses, without the database:
+
+    python benchmarks/export_speedup.py --frames 1200 --segments 1 4 8 --denoise --stabilize
+
+Needs ffmpeg on PATH. Frames are cached in --work-dir between runs. Prints a JSON summary
+with wall time, encode fps and speedup relative to the first --segments value.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import export_manager  # noqa: E402
+from benchmarks._synthetic import generate_frames  # noqa: E402
+from frame_selection import FrameList  # noqa: E402
+from models.export import ExportJob  # noqa: E402
+
+
+def _job(args: argparse.Namespace, output_path: str, job_id: int) -> ExportJob:
+    return ExportJob(
+        id=job_id,
+        output_format=args.format,
+        output_fps=args.fps,
+        resolution="original",
+        crf=28,
+        smoothing="interpolate" if args.interpolate else None,
+        stabilization=args.stabilize,
+        denoising=args.denoise,
+        color_correction=None,
+        output_path=output_path,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--format", choices=("mp4", "webm"), default="mp4")
+    parser.add_argument("--segments", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--denoise", action="store_true")
+    parser.add_argument("--stabilize", action="store_true")
+    parser.add_argument("--interpolate", action="store_true")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "chronicle_bench"))
+    args = parser.parse_args()
+
+    frame_paths = generate_frames(os.path.join(args.work_dir, "frames"), args.frames, args.width, args.height)
+    frames = FrameList(enumerate(frame_paths, 1))
+    runs = []
+    for job_id, parts in enumerate(args.segments, start=1):
+        output_path = os.path.join(args.work_dir, f"out_{parts}.{args.format}")
+        job = _job(args, output_path, job_id)
+        export_manager.track(job_id)
+        start = time.perf_counter()
+        try:
+            if parts > 1:
+                export_manager._encode_segmented(job, frames, parts, parts)  # pylint: disable=protected-access
+            else:
+                export_manager._encode_single(job, frames)  # pylint: disable=protected-access
+        finally:
+            export_manager._running_jobs.pop(job_id, None)  # pylint: disable=protected-access
+        elapsed = time.perf_counter() - start
+        runs.append({
+            "segments": parts,
+            "wall_seconds": round(elapsed, 2),
+            "frames_per_second": round(args.frames / elapsed, 1),
+            "output_mb": round(os.path.getsize(output_path) / 1e6, 2),
+        })
+
+    frames.close()
+
+    baseline = runs[0]["wall_seconds"]
+    for run in runs:
+        run["speedup"] = round(baseline / run["wall_seconds"], 2)
+    summary = {
+        "frames": args.frames,
+        "resolution": f"{args.width}x{args.height}",
+        "format": args.format,
+        "filters": [name for name in ("denoise", "stabilize", "interpolate") if getattr(args, name)],
+        "cpu_count": os.cpu_count(),
+        "runs": runs,
+    }
+    json.dump(summary, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""Measure download throughput of a Chronicle file route, e.g. to compare X-Accel-Redirect on/off.
+
+Run it against the nginx port twice, once with ACCEL_REDIRECT_PREFIX set on the backend
+and once without, and compare the results:
+
+    python benchmarks/serve_throughput.py http://localhost:8080/api/v1/exports/1/download \\
+        --concurrency 4 --requests 20
+
+Frame images work too (use a large frame or many requests). Prints a JSON summary.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def _download(url: str) -> tuple[int, float]:
+    start = time.perf_counter()
+    received = 0
+    with urllib.request.urlopen(url) as resp:
+        while chunk := resp.read(_CHUNK_SIZE):
+            received += len(chunk)
+    return received, time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(_download, [args.url] * args.requests))
+    wall = time.perf_counter() - wall_start
+
+    total_bytes = sum(size for size, _ in results)
+    latencies = sorted(elapsed for _, elapsed in results)
+    summary = {
+        "url": args.url,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "total_mb": round(total_bytes / 1e6, 2),
+        "wall_seconds": round(wall, 3),
+        "throughput_mb_s": round(total_bytes / 1e6 / wall, 2),
+        "requests_per_s": round(args.requests / wall, 2),
+        "latency_median_s": round(statistics.median(latencies), 4),
+        "latency_max_s": round(latencies[-1], 4),
+    }
+    json.dump(summary, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
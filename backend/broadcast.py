@@ -0,0 +1,86 @@
+"""In-memory fan-out of the latest value per key to any number of async subscribers."""
+
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, Hashable, Optional, Set, Tuple
+
+_Subscriber = Tuple[asyncio.AbstractEventLoop, "asyncio.Queue[Any]"]
+
+
+def _offer(queue: "asyncio.Queue[Any]", value: Any) -> None:
+    # Slow subscribers skip intermediate values; they always see the newest one.
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(value)
+
+
+class Broadcaster:
+    """Keeps the newest value per key and pushes each update to every subscriber.
+
+    publish() is thread-safe, so worker threads (capture, FFmpeg readers) can feed
+    subscribers that live on the event loop. Each subscriber holds at most one
+    pending value, so memory does not grow with the number or speed of viewers.
+    """
+
+    def __init__(self) -> None:
+        self._latest: Dict[Hashable, Any] = {}
+        self._subscribers: Dict[Hashable, Set[_Subscriber]] = {}
+        self._lock = threading.Lock()
+
+    def latest(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            return self._latest.get(key)
+
+    def publish(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._latest[key] = value
+            subscribers = list(self._subscribers.get(key, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, value)
+            except RuntimeError:  # loop already closed
+                pass
+
+    def seed(self, key: Hashable, value: Any) -> None:
+        """Set the initial value without overriding anything published meanwhile."""
+        with self._lock:
+            self._latest.setdefault(key, value)
+
+    def clear(self, key: Hashable) -> None:
+        with self._lock:
+            self._latest.pop(key, None)
+
+    def subscriber_count(self, key: Hashable) -> int:
+        with self._lock:
+            return len(self._subscribers.get(key, ()))
+
+    async def subscribe(
+        self,
+        key: Hashable,
+        heartbeat: Optional[float] = None,
+    ) -> AsyncIterator[Optional[Any]]:
+        """Yield the current value (if any) and then every update.
+
+        With heartbeat set, yields None after that many idle seconds so callers can
+        send keep-alives.
+        """
+        queue: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=1)
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(subscriber)
+            current = self._latest.get(key)
+        try:
+            if current is not None:
+                _offer(queue, current)
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(key)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._subscribers[key]
@@ -0,0 +1,182 @@
+"""Capture gap report: missed captures of a timelapse, found in SQL from frame timestamps.
+
+LAG() over the (timelapse_id, captured_at) index pairs every frame with the one before it,
+so a report over millions of frames is one scan of that index and never loads the frames.
+A gap is a pair more than `factor` expected intervals apart; the default of 1.5 catches a
+single missed capture. The expected interval is the timelapse's capture interval, or, for
+frames a thinning rule has already thinned, the rule's keep interval, so thinned history
+does not count as missed captures. Frame counts and the expected number of frames come
+from the index without the window pass. Pauses do count: frames are not captured while a
+timelapse is paused.
+
+For a running timelapse the time since its newest frame is included, so an outage still in
+progress shows up as an ongoing gap.
+"""
+
+import datetime
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from sqlalchemy import case, func, literal, select
+from sqlalchemy.orm import Session, aliased
+
+from models.frame import Frame
+from models.thinning import ThinningRule
+from models.timelapse import Timelapse, TimelapseStatus
+
+# Rows fetched per round trip while streaming gaps.
+_STREAM_BATCH_ROWS = 1000
+
+
+@dataclass
+class CaptureGap:
+    start: datetime.datetime                # last frame before the gap
+    end: Optional[datetime.datetime]        # first frame after it; None while ongoing
+    duration_seconds: float
+    missed_frames: int
+    ongoing: bool = False
+
+
+@dataclass
+class GapReport:
+    timelapse_id: int
+    interval_seconds: int
+    factor: float
+    frame_count: int = 0
+    first_captured_at: Optional[datetime.datetime] = None
+    last_captured_at: Optional[datetime.datetime] = None
+    expected_frames: int = 0
+    achieved_ratio: Optional[float] = None            # frame_count / expected_frames
+    achieved_interval_seconds: Optional[float] = None
+    gap_count: int = 0
+    missed_frames: int = 0
+    gap_seconds: float = 0.0
+    longest_gap: Optional[CaptureGap] = None
+    gaps: List[CaptureGap] = field(default_factory=list)   # chronological, at most `limit`
+    gaps_truncated: bool = False
+
+
+def _thinned_intervals(db: Session, timelapse: Timelapse) -> List[Tuple[datetime.datetime, int]]:
+    """(applied_until, keep interval) of the thinning rules that thinned frames before then, coarsest first."""
+    rules = db.scalars(
+        select(ThinningRule)
+        .where(ThinningRule.timelapse_id == timelapse.id, ThinningRule.applied_until.isnot(None))
+        .order_by(ThinningRule.keep_interval_seconds.desc())
+    ).all()
+    return [
+        (rule.applied_until, rule.keep_interval_seconds)
+        for rule in rules
+        if rule.keep_interval_seconds > timelapse.interval_seconds
+    ]
+
+
+def _interval_at(thinned: List[Tuple[datetime.datetime, int]], base: int, moment: datetime.datetime) -> int:
+    return next((interval for until, interval in thinned if moment < until), base)
+
+
+def _interval_column(thinned: List[Tuple[datetime.datetime, int]], base: int, day):
+    """SQL expression of _interval_at for a julianday() column."""
+    if not thinned:
+        return literal(base)
+    return case(*((day < _julian_day(until), interval) for until, interval in thinned), else_=base)
+
+
+def _julian_day(moment: datetime.datetime) -> float:
+    return moment.timestamp() / 86400 + 2440587.5
+
+
+def _expected_frames(
+    thinned: List[Tuple[datetime.datetime, int]],
+    base: int,
+    first: datetime.datetime,
+    last: datetime.datetime,
+) -> float:
+    """Captures expected from first to last, both included."""
+    bounds = sorted({first, last, *(until for until, _ in thinned if first < until < last)})
+    return 1 + sum(
+        (high - low).total_seconds() / _interval_at(thinned, base, low)
+        for low, high in zip(bounds, bounds[1:])
+    )
+
+
+def report(
+    db: Session,
+    timelapse: Timelapse,
+    factor: float = 1.5,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    limit: int = 500,
+    now: Optional[datetime.datetime] = None,
+) -> GapReport:
+    """Gaps and capture rate of a timelapse's frames captured in [start, end]."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    result = GapReport(timelapse.id, timelapse.interval_seconds, factor)
+
+    filters = [Frame.timelapse_id == timelapse.id]
+    if start is not None:
+        filters.append(Frame.captured_at >= start)
+    if end is not None:
+        filters.append(Frame.captured_at <= end)
+    count, first, last = db.execute(
+        select(func.count(), func.min(Frame.captured_at), func.max(Frame.captured_at))  # pylint: disable=not-callable
+        .where(*filters)
+    ).one()
+    if not count:
+        return result
+    result.frame_count = count
+    result.first_captured_at, result.last_captured_at = first, last
+    thinned = _thinned_intervals(db, timelapse)
+    expected_frames = _expected_frames(thinned, timelapse.interval_seconds, first, last)
+
+    # Each timestamp is parsed once and only the number is carried to the next row.
+    stamps = select(Frame.captured_at, func.julianday(Frame.captured_at).label("day")).where(*filters).subquery()
+    windowed = select(
+        stamps.c.captured_at,
+        stamps.c.day,
+        func.lag(stamps.c.day).over(order_by=stamps.c.captured_at).label("previous_day"),
+    ).subquery()
+    seconds = (windowed.c.day - windowed.c.previous_day) * 86400
+    # A pair is expected as far apart as the interval in force at its first frame.
+    expected = _interval_column(thinned, timelapse.interval_seconds, windowed.c.previous_day)
+    # The frame before a gap, found through the index for the few rows that are gaps.
+    before = aliased(Frame)
+    previous = (
+        select(func.max(before.captured_at))
+        .where(before.timelapse_id == timelapse.id, before.captured_at < windowed.c.captured_at)
+        .scalar_subquery()
+    )
+    rows = db.execute(
+        select(previous, windowed.c.captured_at, seconds, expected)
+        .where(seconds > expected * factor)
+        .order_by(windowed.c.captured_at)
+        .execution_options(yield_per=_STREAM_BATCH_ROWS)
+    )
+    for previous_at, captured_at, gap_seconds, expected in rows:
+        missed = max(round(gap_seconds / expected) - 1, 1)
+        _add_gap(result, CaptureGap(previous_at, captured_at, round(gap_seconds, 3), missed), limit)
+
+    if timelapse.status == TimelapseStatus.running and (end is None or end > now):
+        since_last = (now - last).total_seconds()
+        due = int(since_last // timelapse.interval_seconds)
+        expected_frames += due
+        if since_last > timelapse.interval_seconds * factor:
+            _add_gap(result, CaptureGap(last, None, round(since_last, 3), due, ongoing=True), limit)
+
+    result.expected_frames = round(expected_frames)
+    result.achieved_ratio = round(count / expected_frames, 4)
+    if count > 1:
+        result.achieved_interval_seconds = round((last - first).total_seconds() / (count - 1), 3)
+    result.gap_seconds = round(result.gap_seconds, 3)
+    return result
+
+
+def _add_gap(result: GapReport, gap: CaptureGap, limit: int) -> None:
+    result.gap_count += 1
+    result.missed_frames += gap.missed_frames
+    result.gap_seconds += gap.duration_seconds
+    if result.longest_gap is None or gap.duration_seconds > result.longest_gap.duration_seconds:
+        result.longest_gap = gap
+    if len(result.gaps) < limit:
+        result.gaps.append(gap)
+    else:
+        result.gaps_truncated = True
@@ -3,11 +3,16 @@ import datetime
 import logging
 import os
 import shutil
+import zlib
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.date import DateTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 
+import export_governor
+import exposure
+import live_preview
+import thumbnails
 from capture import CaptureError, _FORMAT_EXT, capture_hardware_bytes, capture_network_bytes
 from database import SessionLocal
 from models.camera import ConnectionType
@@ -144,15 +149,17 @@ def _do_sync_capture(timelapse_id: int) -> bool:
             return False
 
         fmt = settings.capture_image_format
-        if camera.connection_type == ConnectionType.network:
-            data = capture_network_bytes(
-                camera.rtsp_url,
-                image_format=fmt,
-                rtsp_transport=settings.ffmpeg_rtsp_transport,
-                timeout_seconds=settings.ffmpeg_timeout_seconds,
-            )
-        else:
-            data = capture_hardware_bytes(camera.device_index, image_format=fmt)
+        # Exports are held back while a capture is at risk of missing its timeout.
+        with export_governor.capture(settings.ffmpeg_timeout_seconds):
+            if camera.connection_type == ConnectionType.network:
+                data = capture_network_bytes(
+                    camera.rtsp_url,
+                    image_format=fmt,
+                    rtsp_transport=settings.ffmpeg_rtsp_transport,
+                    timeout_seconds=settings.ffmpeg_timeout_seconds,
+                )
+            else:
+                data = capture_hardware_bytes(camera.device_index, image_format=fmt)
 
         ext = _FORMAT_EXT.get(fmt, "webp")
         frame_dir = os.path.join(settings.storage_path, f"timelapse_{timelapse_id}")
@@ -173,9 +180,17 @@ def _do_sync_capture(timelapse_id: int) -> bool:
             fh.write(data)
 
         timelapse.size_bytes += len(data)
-        frame = Frame(timelapse_id=timelapse_id, file_path=file_path)
+        frame = Frame(timelapse_id=timelapse_id, file_path=file_path, crc32=zlib.crc32(data))
+        stats = exposure.measure_bytes(data)
+        if stats is not None:
+            frame.red_mean, frame.green_mean, frame.blue_mean = stats
         db.add(frame)
         db.commit()
+        live_preview.publish_frame(frame, fmt, data)
+        thumbnails.warm_from_bytes(
+            settings.storage_path, timelapse_id, frame.id, data,
+            settings.thumbnail_cache_mb * 1024 * 1024,
+        )
         logger.debug("Captured frame for timelapse %d (%d bytes)", timelapse_id, len(data))
         return False
     finally:
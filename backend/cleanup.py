@@ -1,15 +1,25 @@
 import logging
 import os
 import shutil
+from typing import Sequence, Tuple
+from sqlalchemy import delete, func, update
 from sqlalchemy.orm import Session
+import export_manager
+import export_progress
+import proxy_frames
+import sprites
+import stabilization
+import thumbnails
 from models.export import ExportJob
 from models.frame import Frame
+from models.settings import AppSettings
+from models.timelapse import Timelapse
 
 logger = logging.getLogger(__name__)
 
 
 def delete_timelapse_files(timelapse_id: int, db: Session) -> None:
-    """Delete the frame directory and all export files for a timelapse."""
+    """Delete the frame directory, cached thumbnails/sprites and all export files for a timelapse."""
     # Delete export files
     export_jobs = db.query(ExportJob).filter(ExportJob.timelapse_id == timelapse_id).all()
     export_files = [j for j in export_jobs if j.output_path and os.path.isfile(j.output_path)]
@@ -21,6 +31,8 @@ def delete_timelapse_files(timelapse_id: int, db: Session) -> None:
                 os.remove(job.output_path)
             except OSError as exc:
                 logger.warning("Failed to remove export file %s: %s", job.output_path, exc)
+        export_manager.remove_checkpoints(job)
+        export_progress.clear(job.id)
 
     # Delete the frame directory (derived from first frame's path)
     first_frame = db.query(Frame).filter(Frame.timelapse_id == timelapse_id).first()
@@ -32,3 +44,42 @@ def delete_timelapse_files(timelapse_id: int, db: Session) -> None:
                 shutil.rmtree(frame_dir)
             except OSError as exc:
                 logger.warning("Failed to remove frame directory %s: %s", frame_dir, exc)
+
+    settings = db.get(AppSettings, 1)
+    if settings is not None:
+        thumbnails.remove_timelapse(settings.storage_path, timelapse_id)
+        sprites.remove_timelapse(settings.storage_path, timelapse_id)
+        export_manager.remove_increments(settings.storage_path, timelapse_id)
+        proxy_frames.remove_timelapse(settings.storage_path, timelapse_id)
+        stabilization.remove_timelapse(settings.storage_path, timelapse_id)
+
+
+def remove_frames(timelapse_id: int, frames: Sequence[Tuple[int, str]], db: Session) -> int:
+    """Delete (frame_id, file_path) pairs from disk and the index in one bulk statement.
+
+    Adjusts the timelapse's size_bytes by the bytes actually freed. Caller commits.
+    Returns the number of bytes freed.
+    """
+    if not frames:
+        return 0
+    freed = 0
+    for _, file_path in frames:
+        try:
+            freed += os.path.getsize(file_path)
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+        except OSError as exc:
+            logger.warning("Failed to remove frame file %s: %s", file_path, exc)
+    frame_ids = [frame_id for frame_id, _ in frames]
+    db.execute(delete(Frame).where(Frame.id.in_(frame_ids)))
+    db.execute(
+        update(Timelapse)
+        .where(Timelapse.id == timelapse_id)
+        .values(size_bytes=func.max(Timelapse.size_bytes - freed, 0))
+    )
+    settings = db.get(AppSettings, 1)
+    if settings is not None:
+        thumbnails.remove_frames(settings.storage_path, timelapse_id, frame_ids)
+        proxy_frames.remove_frames(settings.storage_path, timelapse_id, frame_ids)
+    return freed
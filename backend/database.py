@@ -1,5 +1,11 @@
+import contextvars
 import datetime
+import logging
 import os
+import sqlite3
+import threading
+import time
+from typing import Optional
 
 from dotenv import load_dotenv
 from sqlalchemy import DateTime, create_engine, event
@@ -9,11 +15,68 @@ from sqlalchemy.types import TypeDecorator
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./chronicle.db")
+# Opt-in query instrumentation, see QueryStats and request_timing.
+QUERY_TIMING = os.getenv("REQUEST_TIMING", "").strip().lower() in ("1", "true", "yes", "on")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-)
+logger = logging.getLogger(__name__)
+
+
+class _TimedCursor(sqlite3.Cursor):
+    """A cursor that adds the time spent fetching rows to the statement that produced them.
+
+    SQLite runs a query step by step as its rows are fetched, so for a SELECT most of the
+    work, e.g. correlated subqueries, happens in fetch calls rather than in execute. The
+    statement is recorded once its rows are exhausted or the cursor is closed.
+    """
+
+    pending = None  # [stats, statement, parameters, executemany, seconds] until recorded
+
+    def _timed(self, fetch, *args):
+        started = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            if self.pending is not None:
+                self.pending[4] += time.perf_counter() - started
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self.finish_query()
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if not rows:
+            self.finish_query()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self.finish_query()
+        return rows
+
+    def close(self):
+        self.finish_query()
+        super().close()
+
+    def finish_query(self) -> None:
+        if self.pending is not None:
+            pending, self.pending = self.pending, None
+            _record_query(pending[0], self, *pending[1:])
+
+
+class _TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+
+_connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+if QUERY_TIMING and DATABASE_URL.startswith("sqlite"):
+    _connect_args["factory"] = _TimedConnection
+
+engine = create_engine(DATABASE_URL, connect_args=_connect_args)
 
 
 @event.listens_for(engine, "connect")
@@ -26,6 +89,89 @@ def set_sqlite_pragma(dbapi_connection, connection_record):
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+class QueryStats:
+    """SQL statements executed on behalf of one unit of work, e.g. an API request."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def add(self, statement: str, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            if seconds > self.slowest_seconds:
+                self.slowest_seconds = seconds
+                self.slowest_statement = statement
+
+
+# The QueryStats statements executed in this context count towards. Threadpool workers run
+# with a copy of the request's context, so they share its QueryStats object.
+query_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar("query_stats", default=None)
+
+
+def _query_plan(cursor, statement: str, parameters, executemany: bool) -> Optional[str]:
+    """SQLite's EXPLAIN QUERY PLAN of a statement, as an indented tree."""
+    if engine.dialect.name != "sqlite":
+        return None
+    if executemany:
+        parameters = parameters[0] if parameters else ()
+    try:
+        plan_cursor = cursor.connection.cursor()
+        try:
+            rows = plan_cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+        finally:
+            plan_cursor.close()
+    except Exception:  # pylint: disable=broad-except
+        return None  # not explainable, e.g. a PRAGMA
+    depths = {0: -1}
+    lines = []
+    for node_id, parent_id, _, detail in rows:
+        depths[node_id] = depths.get(parent_id, -1) + 1
+        lines.append("  " * depths[node_id] + detail)
+    return "\n".join(lines)
+
+
+def _record_query(stats: Optional[QueryStats], cursor, statement: str, parameters, executemany: bool,
+                  seconds: float) -> None:
+    if stats is not None:
+        stats.add(statement, seconds)
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        plan = _query_plan(cursor, statement, parameters, executemany)
+        logger.warning(
+            "Slow query (%.1f ms): %s%s",
+            seconds * 1000, statement, f"\nQuery plan:\n{plan}" if plan else "",
+        )
+
+
+if QUERY_TIMING:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        if isinstance(cursor, _TimedCursor):
+            cursor.finish_query()
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_started"].pop()
+        if isinstance(cursor, _TimedCursor) and cursor.description is not None:
+            # Rows follow: timed on until they are fetched.
+            cursor.pending = [query_stats.get(), statement, parameters, executemany, seconds]
+        else:
+            _record_query(query_stats.get(), cursor, statement, parameters, executemany, seconds)
+
+    @event.listens_for(engine, "handle_error")
+    def _drop_query_timer(exception_context):
+        # The statement failed, so after_cursor_execute will not pop its start time.
+        if exception_context.connection is not None:
+            started = exception_context.connection.info.get("query_started")
+            if started:
+                started.pop()
+
+
 # Thank you mike! https://mike.depalatis.net/blog/sqlalchemy-timestamps.html
 class UTCDateTime(TypeDecorator):
     """DateTime that always stores and returns UTC-aware datetimes.
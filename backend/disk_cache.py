@@ -0,0 +1,171 @@
+"""Byte-bounded LRU bookkeeping for derived files (thumbnails, etc.) kept under storage_path."""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DiskLRUCache:
+    """Tracks files under <storage_path>/<name> and evicts the least recently used past a byte limit.
+
+    The index lives in memory and is rebuilt from the directory (oldest mtime first)
+    the first time a storage path is seen, so the cache survives restarts.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._root: Optional[str] = None
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        # Directories in use by a reader (e.g. a running export); eviction skips their files.
+        self._pinned: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def root(self, storage_path: str) -> str:
+        root = os.path.abspath(os.path.join(storage_path, self.name))
+        with self._lock:
+            if root != self._root:
+                self._load(root)
+        return root
+
+    def path_for(self, storage_path: str, *parts: str) -> str:
+        return os.path.join(self.root(storage_path), *parts)
+
+    def lookup(self, path: str) -> bool:
+        """Return True (and mark as recently used) if path is cached and still on disk."""
+        with self._lock:
+            if path not in self._entries:
+                return False
+            if not os.path.isfile(path):
+                self._total -= self._entries.pop(path)
+                return False
+            self._entries.move_to_end(path)
+            return True
+
+    def store(self, path: str, data: bytes, max_bytes: int) -> None:
+        """Atomically write data to path, then evict old entries until under max_bytes."""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        with self._lock:
+            self._total -= self._entries.pop(path, 0)
+            self._entries[path] = len(data)
+            self._total += len(data)
+            evicted = self._evict(max_bytes)
+        for victim in evicted:
+            try:
+                os.remove(victim)
+            except OSError:
+                pass
+
+    def remove(self, paths: Iterable[str]) -> None:
+        for path in paths:
+            with self._lock:
+                self._total -= self._entries.pop(path, 0)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as exc:
+                logger.warning("Failed to remove cached file %s: %s", path, exc)
+
+    def remove_tree(self, storage_path: str, *parts: str) -> None:
+        """Delete a whole sub-directory of the cache (e.g. one timelapse's entries)."""
+        directory = self.path_for(storage_path, *parts)
+        prefix = directory + os.sep
+        with self._lock:
+            for path in [p for p in self._entries if p.startswith(prefix)]:
+                self._total -= self._entries.pop(path)
+        if os.path.isdir(directory):
+            logger.info("Removing %s cache directory %s", self.name, directory)
+            try:
+                shutil.rmtree(directory)
+            except OSError as exc:
+                logger.warning("Failed to remove cache directory %s: %s", directory, exc)
+
+    def remove_subtrees(self, storage_path: str, parent: str, names: Iterable[str]) -> None:
+        """Delete the sub-directories `names` of `parent` (e.g. one timelapse's frames) in one pass."""
+        names = set(names)
+        directory = self.path_for(storage_path, parent)
+        prefix = directory + os.sep
+        with self._lock:
+            for path in [
+                p for p in self._entries
+                if p.startswith(prefix) and p[len(prefix):].split(os.sep, 1)[0] in names
+            ]:
+                self._total -= self._entries.pop(path)
+        removed = 0
+        for name in names:
+            subtree = os.path.join(directory, name)
+            if not os.path.isdir(subtree):
+                continue
+            try:
+                shutil.rmtree(subtree)
+                removed += 1
+            except OSError as exc:
+                logger.warning("Failed to remove cache directory %s: %s", subtree, exc)
+        if removed:
+            logger.info("Removed %d %s cache directories under %s", removed, self.name, directory)
+
+    @contextmanager
+    def pinned(self, directory: str) -> Iterator[None]:
+        """Keep the files in directory from being evicted while the block runs (explicit removal still works)."""
+        with self._lock:
+            self._pinned[directory] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pinned[directory] -= 1
+                self._pinned += Counter()  # drop zero counts
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._total
+
+    def _load(self, root: str) -> None:
+        found = []
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.startswith(".tmp_"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, path, st.st_size))
+        found.sort()
+        self._root = root
+        self._entries = OrderedDict((path, size) for _, path, size in found)
+        self._total = sum(size for _, _, size in found)
+        if found:
+            logger.info("Loaded %s cache: %d file(s), %d bytes", self.name, len(found), self._total)
+
+    def _evict(self, max_bytes: int) -> list[str]:
+        evicted = []
+        if self._total <= max_bytes:
+            return evicted
+        for path in list(self._entries):
+            if self._total <= max_bytes or len(self._entries) <= 1:
+                break
+            if os.path.dirname(path) in self._pinned:
+                continue
+            self._total -= self._entries.pop(path)
+            evicted.append(path)
+        return evicted
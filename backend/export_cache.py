@@ -0,0 +1,86 @@
+"""Reuse of export results, so identical exports share one encode.
+
+An export's fingerprint covers its timelapse, the frame set it renders (count, last id and
+the sum of ids of the selected frames, pinned when the export is requested) and every
+request parameter that changes the output. A request matching a pending or running job is folded into that job.
+A request matching a completed job gets its own output file at once, hard-linked to the
+existing one where the filesystem allows it.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from typing import Optional, Tuple
+
+from sqlalchemy import Select, select
+from sqlalchemy.orm import Session
+
+import frame_selection
+from models.export import ExportJob, ExportStatus
+from schemas.export import ExportRequest
+
+logger = logging.getLogger(__name__)
+
+# Scheduling knobs that do not change the encoded video.
+_NON_RENDER_FIELDS = {"priority", "parallel_segments", "target_duration"}
+_REUSABLE_STATUSES = (ExportStatus.pending, ExportStatus.running, ExportStatus.completed)
+
+# Held from fingerprint lookup until the new job is committed, so concurrent duplicate
+# requests coalesce instead of both queueing an encode.
+request_lock = threading.Lock()
+
+
+def frame_set(db: Session, frames: Select) -> Tuple[int, Optional[int], int]:
+    """(frame count, last frame id, sum of frame ids) of the frames an export selects right now."""
+    return frame_selection.frame_stats(db, frames)
+
+
+def fingerprint(
+    timelapse_id: int,
+    frames: Tuple[int, Optional[int], int],
+    payload: ExportRequest,
+) -> str:
+    render = payload.model_dump(mode="json", exclude=_NON_RENDER_FIELDS)
+    key = json.dumps([timelapse_id, list(frames), render], sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def find_match(db: Session, fp: str) -> Optional[ExportJob]:
+    """A completed job whose file still exists, else a pending or running one, with this fingerprint."""
+    jobs = db.scalars(
+        select(ExportJob)
+        .where(ExportJob.fingerprint == fp, ExportJob.status.in_(_REUSABLE_STATUSES))
+        .order_by(ExportJob.id.desc())
+    ).all()
+    for job in jobs:
+        if job.status == ExportStatus.completed and job.output_path and os.path.isfile(job.output_path):
+            return job
+    return next((job for job in jobs if job.status != ExportStatus.completed), None)
+
+
+def reuse_output(job: ExportJob, source: ExportJob) -> bool:
+    """Give job its own copy of source's finished file and mark it completed. False if that failed."""
+    try:
+        _link_or_copy(source.output_path, job.output_path)
+    except OSError as exc:
+        logger.warning("Could not reuse export %s for job %d: %s", source.output_path, job.id, exc)
+        return False
+    job.status = ExportStatus.completed
+    job.frames_done = job.total_frames
+    job.file_size_bytes = os.path.getsize(job.output_path)
+    job.completed_at = datetime.datetime.now(datetime.timezone.utc)
+    logger.info("Export job %d reused the output of job %d", job.id, source.id)
+    return True
+
+
+def _link_or_copy(source: str, target: str) -> None:
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        # Each job owns a name, so deleting one export leaves the other intact.
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
@@ -0,0 +1,203 @@
+"""Keeps exports from taking the CPU time frame capture needs.
+
+Export FFmpeg processes run EXPORT_NICENESS steps nicer than the server (and the capture
+FFmpeg it starts), and all running exports together get at most thread_budget() encoder
+and filter threads, leaving CAPTURE_RESERVED_CORES to capture.
+
+Nice levels cannot help once the host is overloaded, so a monitor thread also watches
+two signals: scheduler lag (how late APScheduler starts its jobs, fading while none is
+submitted, and how late the monitor itself wakes up) and capture latency (how much of its FFmpeg timeout recent
+captures used). While a capture is in flight and either signal says it could miss its
+deadline, every export process is stopped with SIGSTOP and continued with SIGCONT once
+the capture is done. When only the scheduler lags, exports are throttled: stopped for
+half of every THROTTLE_PERIOD_SECONDS. Exports are never held for longer than
+MAX_PAUSE_SECONDS at a time.
+"""
+
+import contextlib
+import datetime
+import logging
+import os
+import signal
+import subprocess
+import threading
+import time
+from typing import Iterator, List, Optional, Set
+
+from apscheduler.events import EVENT_JOB_SUBMITTED
+
+logger = logging.getLogger(__name__)
+
+EXPORT_NICENESS = 10
+CAPTURE_RESERVED_CORES = 1
+# A capture that used this much of its timeout puts the next one at risk.
+CAPTURE_RISK_RATIO = 0.5
+LAG_PAUSE_SECONDS = 1.0
+LAG_THROTTLE_SECONDS = 0.25
+THROTTLE_PERIOD_SECONDS = 2.0
+MAX_PAUSE_SECONDS = 30.0
+_TICK_SECONDS = 0.25
+# Weight of the newest sample in the moving averages.
+_SMOOTHING = 0.3
+# Scheduler lag is only sampled when a job is submitted, which may be minutes apart,
+# so the monitor halves it every this many seconds.
+_SCHEDULER_LAG_HALF_LIFE_SECONDS = 5.0
+
+_CAN_PAUSE = hasattr(signal, "SIGSTOP") and hasattr(signal, "SIGCONT")
+
+_lock = threading.Lock()
+_processes: Set[subprocess.Popen] = set()
+_stopped = False
+_stopped_since = 0.0
+_resume_until = 0.0        # after a maximal pause, exports run at least until then
+_captures_in_flight = 0
+_capture_ratio = 0.0       # moving average of capture duration / timeout
+_scheduler_lag = 0.0       # moving average, seconds
+_wakeup_lag = 0.0          # moving average, seconds
+_monitor: Optional[threading.Thread] = None
+_stopping = threading.Event()
+
+
+def thread_budget() -> int:
+    """Encoder/filter threads all running exports may use together."""
+    return max(1, (os.cpu_count() or 1) - CAPTURE_RESERVED_CORES)
+
+
+def threads_per_process(processes: int) -> int:
+    """Threads for each of `processes` export FFmpeg processes running at the same time."""
+    return max(1, thread_budget() // max(1, processes))
+
+
+def adopt(proc: subprocess.Popen) -> None:
+    """Lower a new export process's priority and put it under the governor's control."""
+    try:
+        os.setpriority(os.PRIO_PROCESS, proc.pid, min(19, os.getpriority(os.PRIO_PROCESS, 0) + EXPORT_NICENESS))
+    except (AttributeError, OSError):
+        pass  # not on this platform, or the process already exited
+    with _lock:
+        _processes.add(proc)
+        if _stopped:
+            _signal([proc], signal.SIGSTOP)
+
+
+def release(proc: subprocess.Popen) -> None:
+    """Hand a process back, continuing it if it is stopped (e.g. so it can act on SIGTERM)."""
+    with _lock:
+        _processes.discard(proc)
+        if _stopped:
+            _signal([proc], signal.SIGCONT)
+
+
+def _signal(processes: List[subprocess.Popen], signum: int) -> None:
+    for proc in processes:
+        if proc.poll() is None:
+            try:
+                os.kill(proc.pid, signum)
+            except OSError:
+                pass
+
+
+@contextlib.contextmanager
+def capture(timeout_seconds: float) -> Iterator[None]:
+    """Wrap one frame capture, so exports can be paused while it runs and its latency is tracked.
+
+    Only captures that succeed are tracked: one that fails or times out, e.g. on an
+    unreachable camera, says nothing about CPU contention.
+    """
+    global _captures_in_flight, _capture_ratio  # pylint: disable=global-statement
+    started = time.monotonic()
+    succeeded = False
+    with _lock:
+        _captures_in_flight += 1
+    try:
+        yield
+        succeeded = True
+    finally:
+        ratio = min((time.monotonic() - started) / max(timeout_seconds, 0.001), 1.0)
+        with _lock:
+            _captures_in_flight -= 1
+            if succeeded:
+                _capture_ratio += _SMOOTHING * (ratio - _capture_ratio)
+        _update()
+
+
+def _on_job_submitted(event) -> None:
+    global _scheduler_lag  # pylint: disable=global-statement
+    if not event.scheduled_run_times:
+        return
+    lag = (datetime.datetime.now(datetime.timezone.utc) - max(event.scheduled_run_times)).total_seconds()
+    with _lock:
+        _scheduler_lag += _SMOOTHING * (max(lag, 0.0) - _scheduler_lag)
+    _update()
+
+
+def _update() -> None:
+    """Stop or continue export processes according to the current signals."""
+    global _stopped, _stopped_since, _resume_until  # pylint: disable=global-statement
+    if not _CAN_PAUSE:
+        return
+    now = time.monotonic()
+    with _lock:
+        lag = max(_scheduler_lag, _wakeup_lag)
+        at_risk = _captures_in_flight > 0 and (_capture_ratio >= CAPTURE_RISK_RATIO or lag >= LAG_PAUSE_SECONDS)
+        if at_risk:
+            stop = True
+        elif lag >= LAG_THROTTLE_SECONDS:
+            stop = now % THROTTLE_PERIOD_SECONDS < THROTTLE_PERIOD_SECONDS / 2
+        else:
+            stop = False
+        if stop and _stopped and now - _stopped_since > MAX_PAUSE_SECONDS:
+            logger.warning("Exports were paused for %.0fs; letting them run again", now - _stopped_since)
+            _resume_until = now + MAX_PAUSE_SECONDS
+        if now < _resume_until:
+            stop = False
+        if stop == _stopped:
+            return
+        _stopped = stop
+        if stop:
+            _stopped_since = now
+        if _processes:
+            if at_risk:
+                logger.info(
+                    "%s exports for a capture (capture latency %.0f%% of timeout, scheduler lag %.2fs)",
+                    "Pausing" if stop else "Resuming", _capture_ratio * 100, lag,
+                )
+            _signal(list(_processes), signal.SIGSTOP if stop else signal.SIGCONT)
+
+
+def _run_monitor() -> None:
+    global _wakeup_lag, _scheduler_lag  # pylint: disable=global-statement
+    last = time.monotonic()
+    expected = last + _TICK_SECONDS
+    while not _stopping.wait(max(0.0, expected - time.monotonic())):
+        now = time.monotonic()
+        with _lock:
+            _wakeup_lag += _SMOOTHING * (max(now - expected, 0.0) - _wakeup_lag)
+            _scheduler_lag *= 0.5 ** ((now - last) / _SCHEDULER_LAG_HALF_LIFE_SECONDS)
+        _update()
+        last = now
+        expected = now + _TICK_SECONDS
+
+
+def start(scheduler) -> None:
+    """Listen to the capture scheduler and start the monitor thread."""
+    global _monitor  # pylint: disable=global-statement
+    scheduler.add_listener(_on_job_submitted, EVENT_JOB_SUBMITTED)
+    if not _CAN_PAUSE or _monitor is not None:
+        return
+    _stopping.clear()
+    _monitor = threading.Thread(target=_run_monitor, name="export-governor", daemon=True)
+    _monitor.start()
+
+
+def stop() -> None:
+    """Stop the monitor and continue every export process, e.g. before they are terminated."""
+    global _monitor, _stopped  # pylint: disable=global-statement
+    _stopping.set()
+    if _monitor is not None:
+        _monitor.join()
+        _monitor = None
+    with _lock:
+        if _stopped:
+            _signal(list(_processes), signal.SIGCONT)
+        _stopped = False
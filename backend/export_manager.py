@@ -1,16 +1,33 @@
 """Manages FFmpeg export jobs: progress tracking, concat-file building, and subprocess execution."""
 
-import asyncio
 import datetime
+import hashlib
+import json
 import logging
+import math
 import os
+import shutil
 import subprocess
 import tempfile
 import threading
-from typing import Dict, List, Optional
-
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import delete, select, update
+
+import export_governor
+import export_progress
+import exposure
+import frame_selection
+import proxy_frames
+import stabilization
 from database import SessionLocal
-from models.export import ExportJob, ExportStatus
+from frame_selection import FrameList, FramePaths
+from models.export import ExportJob, ExportSegment, ExportStatus, IncrementalSegment
+from models.settings import AppSettings
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +35,37 @@ logger = logging.getLogger(__name__)
 _active_progress: Dict[int, int] = {}
 _progress_lock = threading.Lock()
 
+# FFmpeg gets this long to exit on SIGTERM before it is killed.
+_TERMINATE_GRACE_SECONDS = 0.5
+# The cancel request waits this long for the runner; the job reports cancelled once it has stopped.
+CANCEL_WAIT_SECONDS = 1.0
+# Segmented exports: each piece owns at least this many frames, and decodes this many
+# extra frames on each side so temporal filters (deshake, hqdn3d, tblend, minterpolate)
+# are warmed up at the cut; vid.stab stabilisation needs stabilization.SMOOTHING of them.
+MIN_SEGMENT_FRAMES = 60
+SEGMENT_OVERLAP_FRAMES = 8
+# Long exports are always encoded in pieces of about this many frames, each recorded in
+# export_segments once finished, so a restart only loses the pieces in progress.
+CHECKPOINT_SEGMENT_FRAMES = 1800
+SHUTDOWN_WAIT_SECONDS = 5.0
+# Export speed profiles → libx264 preset and libvpx-vp9 cpu-used (0 slowest … 5 fastest at
+# -deadline good). "balanced" keeps the x264 preset used before profiles existed.
+_X264_PRESETS = {"fast": "veryfast", "balanced": "medium", "archival": "slow"}
+_VP9_CPU_USED = {"fast": 5, "balanced": 2, "archival": 0}
+DEFAULT_SPEED_PROFILE = "balanced"
+# Previews render this many evenly spaced frames of the selection, at most PREVIEW_HEIGHT
+# lines tall, with the fastest x264 preset.
+PREVIEW_FRAMES = 300
+PREVIEW_HEIGHT = 360
+# Job columns that change the encoded video; incremental pieces are shared between jobs
+# that agree on all of them.
+_RENDER_COLUMNS = (
+    "output_format", "output_fps", "resolution", "custom_resolution", "crf", "speed_profile",
+    "smoothing", "stabilization", "denoising", "deflicker", "color_correction", "brightness", "contrast", "saturation",
+)
+# Selection options that decide which frames lie between a piece's first and last frame.
+_SAMPLING_COLUMNS = ("daily_start", "daily_end", "every_nth", "sample_interval_seconds")
+
 
 def get_live_progress(job_id: int) -> Optional[int]:
     """Return current frames_done for a running job, or None if not tracked."""
@@ -28,6 +76,7 @@ def get_live_progress(job_id: int) -> Optional[int]:
 def _set_progress(job_id: int, frames_done: int) -> None:
     with _progress_lock:
         _active_progress[job_id] = frames_done
+    export_progress.report(job_id, frames_done)
 
 
 def _clear_progress(job_id: int) -> None:
@@ -35,7 +84,148 @@ def _clear_progress(job_id: int) -> None:
         _active_progress.pop(job_id, None)
 
 
-def _build_concat_list(frame_paths: List[str], fps: int) -> str:
+class ExportCancelled(RuntimeError):
+    pass
+
+
+class ExportInterrupted(RuntimeError):
+    """The server is shutting down; the job stays running and resumes from its checkpoints."""
+
+
+class FFmpegError(RuntimeError):
+    """FFmpeg exited with an error; the message is the tail of its stderr."""
+
+
+class _RunningJob:
+    """FFmpeg processes of one running job, so the job can be cancelled from another thread."""
+
+    def __init__(self) -> None:
+        self.processes: List[subprocess.Popen] = []
+        self.cancelled = threading.Event()
+        # Set when one segment failed and the job's other processes are being stopped.
+        self.aborted = threading.Event()
+        self.finished = threading.Event()
+
+
+_running_jobs: Dict[int, _RunningJob] = {}
+_running_jobs_lock = threading.Lock()
+_shutting_down = threading.Event()
+
+
+def track(job_id: int) -> _RunningJob:
+    """Register a job as running in this process before its runner thread starts."""
+    with _running_jobs_lock:
+        return _running_jobs.setdefault(job_id, _RunningJob())
+
+
+def _spawn(job_id: int, cmd: List[str]) -> subprocess.Popen:
+    with _running_jobs_lock:
+        handle = _running_jobs[job_id]
+        if _shutting_down.is_set():
+            raise ExportInterrupted()
+        if handle.cancelled.is_set() or handle.aborted.is_set():
+            raise ExportCancelled()
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        handle.processes.append(proc)
+    export_governor.adopt(proc)
+    return proc
+
+
+def _running_job_count() -> int:
+    with _running_jobs_lock:
+        return len(_running_jobs)
+
+
+def _stop_processes(processes: List[subprocess.Popen]) -> None:
+    """SIGTERM every process, then SIGKILL whatever is still running after the grace period."""
+    for proc in processes:
+        export_governor.release(proc)  # a paused process only acts on SIGTERM once continued
+    alive = [proc for proc in processes if proc.poll() is None]
+    for proc in alive:
+        proc.terminate()
+    deadline = time.monotonic() + _TERMINATE_GRACE_SECONDS
+    for proc in alive:
+        try:
+            proc.wait(timeout=max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def _is_stopping(job_id: int) -> bool:
+    with _running_jobs_lock:
+        handle = _running_jobs[job_id]
+        return handle.cancelled.is_set() or handle.aborted.is_set()
+
+
+def _check_stopping(job_id: int) -> None:
+    """Raise if the job should stop before its next phase: between phases no FFmpeg runs to kill."""
+    if _shutting_down.is_set():
+        raise ExportInterrupted()
+    if _is_stopping(job_id):
+        raise ExportCancelled()
+
+
+def _abort(job_id: int) -> None:
+    """Stop all of a job's processes without marking it cancelled."""
+    with _running_jobs_lock:
+        handle = _running_jobs[job_id]
+        handle.aborted.set()
+        processes = list(handle.processes)
+    _stop_processes(processes)
+
+
+def cancel(job_id: int, timeout: float = CANCEL_WAIT_SECONDS) -> bool:
+    """Stop a job running in this process and wait for its runner to clean up.
+
+    Returns False if the job is not running here.
+    """
+    with _running_jobs_lock:
+        handle = _running_jobs.get(job_id)
+        if handle is None:
+            return False
+        handle.cancelled.set()
+        processes = list(handle.processes)
+    _stop_processes(processes)
+    if not handle.finished.wait(timeout):
+        logger.warning("Export job %d did not finish within %.0fs of being cancelled", job_id, timeout)
+    return True
+
+
+def is_shutting_down() -> bool:
+    return _shutting_down.is_set()
+
+
+def shutdown(timeout: float = SHUTDOWN_WAIT_SECONDS) -> None:
+    """Stop every running export for a server shutdown, keeping checkpoints so the jobs resume."""
+    _shutting_down.set()
+    with _running_jobs_lock:
+        handles = list(_running_jobs.values())
+        processes = [proc for handle in handles for proc in handle.processes]
+    if not handles:
+        return
+    logger.info("Stopping %d running export(s) for shutdown", len(handles))
+    _stop_processes(processes)
+    deadline = time.monotonic() + timeout
+    for handle in handles:
+        handle.finished.wait(max(0.0, deadline - time.monotonic()))
+
+
+def _remove_partial(path: Optional[str]) -> None:
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError as exc:
+            logger.warning("Could not remove partial export %s: %s", path, exc)
+
+
+def _build_concat_list(frame_paths: Iterable[str], fps: int) -> str:
     """Write a temporary ffconcat file and return its path. Caller must delete it."""
     duration = 1.0 / fps
     fd, path = tempfile.mkstemp(prefix="chronicle_concat_", suffix=".txt")
@@ -56,28 +246,92 @@ def _build_concat_list(frame_paths: List[str], fps: int) -> str:
     return path
 
 
-def _build_video_filters(job: ExportJob) -> Optional[str]:
-    """Assemble the composite -vf filter chain. Returns None if no filters are needed."""
+def _target_resolution(job: ExportJob) -> Optional[str]:
+    """The "WxH" the export is scaled and padded to, or None to keep the original size."""
+    if job.resolution == "original":
+        target = None
+    else:
+        target = job.custom_resolution or "1920x1080" if job.resolution == "custom" else job.resolution
+    return _preview_resolution(target) if job.preview else target
+
+
+def _preview_resolution(target: Optional[str]) -> str:
+    """The export's frame shape at PREVIEW_HEIGHT; 16:9 for original-size exports."""
+    if target is None:
+        return f"{PREVIEW_HEIGHT * 16 // 9}x{PREVIEW_HEIGHT}"
+    width, height = (int(v) for v in target.split("x"))
+    if height <= PREVIEW_HEIGHT:
+        return target
+    return f"{round(width * PREVIEW_HEIGHT / height / 2) * 2}x{PREVIEW_HEIGHT}"
+
+
+@dataclass(frozen=True)
+class _FrameAdjustments:
+    """Per-frame inputs of the filter chain, computed once for the whole export."""
+    transforms: Optional[stabilization.Transforms] = None   # cached vid.stab analysis
+    gains: Optional[exposure.Gains] = None                  # deflicker
+
+
+@dataclass(frozen=True)
+class _FilterFiles:
+    """The files one encode's filter chain reads its per-frame adjustments from."""
+    transforms_path: Optional[str] = None
+    commands_path: Optional[str] = None
+
+
+@contextmanager
+def _filter_files(
+    job: ExportJob,
+    adjustments: Optional[_FrameAdjustments],
+    start: int,
+    end: int,
+) -> Iterator[_FilterFiles]:
+    """Write the adjustments of frames start … end-1, deleting the files when the block exits."""
+    transforms_path = commands_path = None
+    try:
+        if adjustments is not None and adjustments.transforms is not None:
+            transforms_path = adjustments.transforms.write_trf(start, end, _target_resolution(job))
+        if adjustments is not None and adjustments.gains is not None:
+            commands_path = adjustments.gains.write_commands(start, end, job.output_fps)
+        yield _FilterFiles(transforms_path, commands_path)
+    finally:
+        _unlink_quietly(transforms_path)
+        _unlink_quietly(commands_path)
+
+
+def _build_video_filters(job: ExportJob, files: _FilterFiles = _FilterFiles()) -> Optional[str]:
+    """Assemble the composite -vf filter chain. Returns None if no filters are needed.
+
+    files holds the per-frame adjustments of the frames being encoded: the vid.stab
+    transforms if the job is stabilised with the cached analysis, the deflicker commands
+    if it is deflickered.
+    """
     parts: List[str] = []
+    transforms_path = files.transforms_path
 
-    # 1. Scale + pad (reduce resolution early)
-    if job.resolution != "original":
-        target = job.custom_resolution or "1920x1080" if job.resolution == "custom" else job.resolution
+    # 1. Scale + pad (reduce resolution early), stabilising the frame before it is padded
+    target = _target_resolution(job)
+    if target is not None:
         w, h = target.split("x")
-        parts.append(
-            f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
-            f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2"
-        )
+        parts.append(f"scale={w}:{h}:force_original_aspect_ratio=decrease")
+    if transforms_path is not None:
+        parts.append(stabilization.transform_filter(transforms_path))
+    if target is not None:
+        parts.append(f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2")
 
-    # 2. Denoise before stabilization for cleaner motion analysis
+    # 2. Denoise before deshake for cleaner motion analysis
     if job.denoising:
         parts.append("hqdn3d=4:3:6:4.5")
 
-    # 3. Stabilization (1-pass deshake, no extra library needed)
-    if job.stabilization:
+    # 3. Stabilization (1-pass deshake when FFmpeg lacks vid.stab)
+    if job.stabilization and transforms_path is None:
         parts.append("deshake")
 
-    # 4. Color correction
+    # 4. Deflicker, before colour correction sees the frame
+    if files.commands_path is not None:
+        parts.append(exposure.deflicker_filter(files.commands_path))
+
+    # 5. Color correction
     if job.color_correction == "auto":
         parts.append("histeq")
     elif job.color_correction == "manual":
@@ -86,7 +340,7 @@ def _build_video_filters(job: ExportJob) -> Optional[str]:
         s = job.saturation or 1.0
         parts.append(f"eq=brightness={b:.4f}:contrast={c:.4f}:saturation={s:.4f}")
 
-    # 5. Smoothing (last, after spatial filters)
+    # 6. Smoothing (last, after spatial filters)
     if job.smoothing == "blend":
         parts.append("tblend=all_mode=average")
     elif job.smoothing == "interpolate":
@@ -95,38 +349,66 @@ def _build_video_filters(job: ExportJob) -> Optional[str]:
     return ",".join(parts) if parts else None
 
 
-def _build_ffmpeg_cmd(job: ExportJob, concat_path: str) -> List[str]:
-    cmd = [
-        "ffmpeg", "-y",
+def _vp9_tile_columns(threads: int) -> int:
+    # log2 of the tile column count; libvpx lowers it further for narrow frames.
+    return min(4, threads.bit_length() - 1)
+
+
+def _encoder_args(job: ExportJob, threads: Optional[int] = None) -> List[str]:
+    """Codec arguments for the job's speed profile, using `threads` threads (default: all cores)."""
+    profile = job.speed_profile or DEFAULT_SPEED_PROFILE
+    if job.preview:
+        args = ["-c:v", "libx264", "-crf", str(job.crf), "-preset", "ultrafast", "-pix_fmt", "yuv420p"]
+        return args + (["-threads", str(threads)] if threads else []) + ["-an"]
+    if job.output_format == "webm":
+        # libvpx only uses several cores with row-based multithreading and tile columns.
+        threads = threads or os.cpu_count() or 1
+        return [
+            "-c:v", "libvpx-vp9", "-crf", str(job.crf), "-b:v", "0",
+            "-deadline", "good", "-cpu-used", str(_VP9_CPU_USED[profile]),
+            "-row-mt", "1", "-tile-columns", str(_vp9_tile_columns(threads)),
+            "-threads", str(threads), "-an",
+        ]
+    args = ["-c:v", "libx264", "-crf", str(job.crf), "-preset", _X264_PRESETS[profile], "-pix_fmt", "yuv420p"]
+    if threads:
+        args += ["-threads", str(threads)]
+    return args + ["-an"]
+
+
+def _container_args(job: ExportJob) -> List[str]:
+    if job.output_format == "webm":
+        return ["-f", "webm"]
+    return ["-movflags", "+faststart", "-f", "mp4"]
+
+
+def _build_ffmpeg_cmd(
+    job: ExportJob,
+    concat_path: str,
+    output_path: Optional[str] = None,
+    *,
+    trim: Optional[str] = None,
+    segment: bool = False,
+    threads: Optional[int] = None,
+    files: _FilterFiles = _FilterFiles(),
+) -> List[str]:
+    """Encode a concat list. With segment=True, writes a Matroska piece for later stream-copying."""
+    cmd = ["ffmpeg", "-y"]
+    if threads:
+        cmd += ["-filter_threads", str(threads)]
+    cmd += [
         "-f", "concat", "-safe", "0",
         "-i", concat_path,
         "-fps_mode", "vfr",
     ]
 
-    vf = _build_video_filters(job)
+    vf = ",".join(part for part in (_build_video_filters(job, files), trim) if part)
     if vf:
         cmd += ["-vf", vf]
 
-    if job.output_format == "webm":
-        cmd += [
-            "-c:v", "libvpx-vp9",
-            "-crf", str(job.crf),
-            "-b:v", "0",
-            "-an",
-            "-f", "webm",
-        ]
-    else:  # mp4
-        cmd += [
-            "-c:v", "libx264",
-            "-crf", str(job.crf),
-            "-preset", "medium",
-            "-pix_fmt", "yuv420p",
-            "-an",
-            "-movflags", "+faststart",
-            "-f", "mp4",
-        ]
+    cmd += _encoder_args(job, threads)
+    cmd += ["-f", "matroska"] if segment else _container_args(job)
 
-    cmd += ["-progress", "pipe:1", "-nostats", job.output_path]
+    cmd += ["-progress", "pipe:1", "-nostats", output_path or job.output_path]
     return cmd
 
 
@@ -141,78 +423,586 @@ def _parse_frame_count(line: str) -> Optional[int]:
     return None
 
 
-def _run_export_sync(
-    job_id: int,
-    frame_paths: List[str],
-    output_path: str,
+def _run_ffmpeg(job_id: int, cmd: List[str], on_frame: Optional[Callable[[int], None]] = None) -> None:
+    """Run one FFmpeg process for a job, reporting progress. Raises FFmpegError or ExportCancelled."""
+    logger.info("Starting FFmpeg for export job %d: %s", job_id, " ".join(cmd))
+    proc = _spawn(job_id, cmd)
+
+    # Drain stderr in a background thread to prevent pipe-buffer deadlock.
+    stderr_chunks: List[str] = []
+
+    def _drain_stderr() -> None:
+        if proc.stderr:
+            for line in proc.stderr:
+                stderr_chunks.append(line)
+
+    stderr_thread = threading.Thread(target=_drain_stderr, daemon=True)
+    stderr_thread.start()
+
+    for line in proc.stdout:  # type: ignore[union-attr]
+        count = _parse_frame_count(line)
+        if count is not None and on_frame is not None:
+            on_frame(count)
+
+    proc.wait()
+    export_governor.release(proc)
+    stderr_thread.join()
+    if _shutting_down.is_set():
+        raise ExportInterrupted()
+    if _is_stopping(job_id):
+        raise ExportCancelled()
+
+    if proc.returncode != 0:
+        stderr_out = "".join(stderr_chunks)
+        logger.error("FFmpeg export job %d failed (rc=%d): %s", job_id, proc.returncode, stderr_out)
+        raise FFmpegError(stderr_out[-2000:] if stderr_out else f"FFmpeg exited with code {proc.returncode}")
+
+
+def _encode_single(
+    job: ExportJob,
+    frame_paths: FramePaths,
+    adjustments: Optional[_FrameAdjustments] = None,
 ) -> None:
-    """Blocking export runner. Opens its own DB session."""
+    concat_path = _build_concat_list(frame_paths.paths(), job.output_fps)
+    try:
+        with _filter_files(job, adjustments, 0, len(frame_paths)) as files:
+            threads = export_governor.threads_per_process(_running_job_count())
+            cmd = _build_ffmpeg_cmd(job, concat_path, threads=threads, files=files)
+            _run_ffmpeg(job.id, cmd, lambda n: _set_progress(job.id, n))
+    finally:
+        _unlink_quietly(concat_path)
+
+
+def _analyse_motion(job: ExportJob, frame_paths: Iterable[str], video_filter: str) -> None:
+    """Run a vid.stab detection pass over frames for the job (see stabilization.analyse)."""
+    concat_path = _build_concat_list(frame_paths, job.output_fps)
+    try:
+        cmd = [
+            "ffmpeg", "-y",
+            "-f", "concat", "-safe", "0",
+            "-i", concat_path,
+            "-vf", video_filter,
+            "-f", "null", "-",
+        ]
+        _run_ffmpeg(job.id, cmd)
+    finally:
+        _unlink_quietly(concat_path)
+
+
+@dataclass(frozen=True)
+class _Segment:
+    index: int
+    first: int      # index of the first frame this segment contributes to the output
+    count: int      # frames contributed
+    lead_in: int    # frames decoded before `first` only to warm up temporal filters
+    lead_out: int   # frames decoded after the segment for look-ahead filters
+
+
+def _has_temporal_filters(job: ExportJob) -> bool:
+    return bool(job.denoising or job.stabilization or job.smoothing)
+
+
+def _segment_count(frame_count: int, parallel: int) -> int:
+    """Enough pieces to checkpoint every CHECKPOINT_SEGMENT_FRAMES, and at least one per worker."""
+    return max(
+        math.ceil(frame_count / CHECKPOINT_SEGMENT_FRAMES),
+        min(parallel, frame_count // MIN_SEGMENT_FRAMES),
+        1,
+    )
+
+
+def _plan_segments(frame_count: int, parts: int, overlap: int) -> List[_Segment]:
+    bounds = [round(i * frame_count / parts) for i in range(parts + 1)]
+    return [
+        _Segment(
+            index=i,
+            first=bounds[i],
+            count=bounds[i + 1] - bounds[i],
+            lead_in=min(overlap, bounds[i]),
+            lead_out=min(overlap, frame_count - bounds[i + 1]),
+        )
+        for i in range(parts)
+    ]
+
+
+def _segment_trim(segment: _Segment, fps: int) -> Optional[str]:
+    """Cut the overlap off again after filtering.
+
+    Time-based, so it also holds when minterpolate changes the frame rate. Cutting half a
+    frame before each boundary makes adjacent segments tile the timeline exactly.
+    """
+    if not segment.lead_in and not segment.lead_out:
+        return None
+    bounds = []
+    if segment.lead_in:
+        bounds.append(f"start={(segment.lead_in - 0.5) / fps:.6f}")
+    if segment.lead_out:
+        bounds.append(f"end={(segment.lead_in + segment.count - 0.5) / fps:.6f}")
+    return f"trim={':'.join(bounds)},setpts=PTS-STARTPTS"
+
+
+def _segment_dir(job: ExportJob) -> str:
+    return os.path.join(os.path.dirname(job.output_path), f".export_{job.id}_segments")
+
+
+def remove_checkpoints(job: ExportJob) -> None:
+    """Delete a job's encoded pieces from disk (their rows go with the job)."""
+    if job.output_path:
+        shutil.rmtree(_segment_dir(job), ignore_errors=True)
+
+
+def _resume_checkpoints(
+    job: ExportJob,
+    segments: List[_Segment],
+    frame_ids: Sequence[int],
+    segment_paths: List[str],
+) -> List[int]:
+    """Return the indexes of pieces already encoded for exactly these frames; drop the rest."""
     db = SessionLocal()
-    concat_path: Optional[str] = None
     try:
-        job = db.get(ExportJob, job_id)
-        if job is None:
-            logger.error("Export job %d not found in DB", job_id)
-            return
+        valid = []
+        for row in db.scalars(select(ExportSegment).where(ExportSegment.job_id == job.id)):
+            segment = segments[row.segment_index] if row.segment_index < len(segments) else None
+            if (
+                segment is not None
+                and row.frame_count == segment.count
+                and row.first_frame_id == frame_ids[segment.first]
+                and row.last_frame_id == frame_ids[segment.first + segment.count - 1]
+                and row.file_path == segment_paths[segment.index]
+                and os.path.isfile(row.file_path)
+            ):
+                valid.append(segment.index)
+            else:
+                # Frames were thinned or deleted since, or the file is gone: encode it again.
+                db.delete(row)
+        db.execute(
+            update(ExportJob)
+            .where(ExportJob.id == job.id)
+            .values(frames_done=sum(segments[index].count for index in valid))
+        )
+        db.commit()
+        return valid
+    finally:
+        db.close()
+
 
-        job.status = ExportStatus.running
+def _record_checkpoint(job_id: int, segment: _Segment, frame_ids: Sequence[int], file_path: str) -> None:
+    db = SessionLocal()
+    try:
+        db.add(ExportSegment(
+            job_id=job_id,
+            segment_index=segment.index,
+            first_frame_id=frame_ids[segment.first],
+            last_frame_id=frame_ids[segment.first + segment.count - 1],
+            frame_count=segment.count,
+            file_path=file_path,
+        ))
+        db.execute(
+            update(ExportJob)
+            .where(ExportJob.id == job_id)
+            .values(frames_done=ExportJob.frames_done + segment.count)
+        )
         db.commit()
+    finally:
+        db.close()
 
-        concat_path = _build_concat_list(frame_paths, job.output_fps)
-        cmd = _build_ffmpeg_cmd(job, concat_path)
 
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+def _delete_checkpoint_rows(job_id: int) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(delete(ExportSegment).where(ExportSegment.job_id == job_id))
+        db.commit()
+    finally:
+        db.close()
 
-        logger.info("Starting FFmpeg export job %d: %s", job_id, " ".join(cmd))
 
-        proc = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1,
-        )
+def _encode_segment(
+    job: ExportJob,
+    frame_paths: FramePaths,
+    segment: _Segment,
+    output_path: str,
+    threads: int,
+    on_frame: Callable[[int], None],
+    on_encoded: Optional[Callable[[_Segment, str], None]] = None,
+    adjustments: Optional[_FrameAdjustments] = None,
+) -> None:
+    """Encode one piece; on_encoded (e.g. recording a checkpoint) runs once it is complete on disk."""
+    start = segment.first - segment.lead_in
+    end = segment.first + segment.count + segment.lead_out
+    concat_path = _build_concat_list(frame_paths.paths(start, end), job.output_fps)
+    partial_path = f"{output_path}.part"
+    try:
+        with _filter_files(job, adjustments, start, end) as files:
+            cmd = _build_ffmpeg_cmd(
+                job, concat_path, partial_path,
+                trim=_segment_trim(segment, job.output_fps), segment=True, threads=threads,
+                files=files,
+            )
+            _run_ffmpeg(job.id, cmd, on_frame)
+        os.replace(partial_path, output_path)
+        if on_encoded is not None:
+            on_encoded(segment, output_path)
+        on_frame(segment.count)
+    finally:
+        _unlink_quietly(concat_path)
+        _unlink_quietly(partial_path)
 
-        # Drain stderr in a background thread to prevent pipe-buffer deadlock.
-        stderr_chunks: List[str] = []
 
-        def _drain_stderr() -> None:
-            if proc.stderr:
-                for line in proc.stderr:
-                    stderr_chunks.append(line)
+def _build_segment_concat_list(segment_paths: List[str], durations: List[float]) -> str:
+    fd, path = tempfile.mkstemp(prefix="chronicle_segments_", suffix=".txt")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write("ffconcat version 1.0\n")
+            for segment_path, duration in zip(segment_paths, durations):
+                safe = os.path.abspath(segment_path).replace("\\", "/")
+                fh.write(f"file '{safe}'\n")
+                # Explicit durations keep the pieces back to back even if a container
+                # rounds the last frame's duration.
+                fh.write(f"duration {duration:.6f}\n")
+    except Exception:
+        os.unlink(path)
+        raise
+    return path
 
-        stderr_thread = threading.Thread(target=_drain_stderr, daemon=True)
-        stderr_thread.start()
 
-        for line in proc.stdout:  # type: ignore[union-attr]
-            count = _parse_frame_count(line)
-            if count is not None:
-                _set_progress(job_id, count)
+def _join_segments(job: ExportJob, segment_paths: List[str], durations: List[float]) -> None:
+    concat_path = _build_segment_concat_list(segment_paths, durations)
+    try:
+        cmd = [
+            "ffmpeg", "-y",
+            "-f", "concat", "-safe", "0",
+            "-i", concat_path,
+            "-c", "copy",
+            *_container_args(job),
+            "-progress", "pipe:1", "-nostats", job.output_path,
+        ]
+        _run_ffmpeg(job.id, cmd)
+    finally:
+        _unlink_quietly(concat_path)
+
+
+def _encode_pieces(
+    job: ExportJob,
+    frame_paths: FramePaths,
+    segments: List[_Segment],
+    segment_paths: List[str],
+    done: List[int],
+    workers: int,
+    on_encoded: Optional[Callable[[_Segment, str], None]] = None,
+    adjustments: Optional[_FrameAdjustments] = None,
+) -> None:
+    """Encode the pieces not yet done on `workers` parallel FFmpeg processes, then join them all."""
+    _set_progress(job.id, sum(done))
+    threads = export_governor.threads_per_process(workers * _running_job_count())
+
+    def reporter(index: int) -> Callable[[int], None]:
+        def report(count: int) -> None:
+            done[index] = count
+            _set_progress(job.id, sum(done))
+        return report
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"export-{job.id}") as pool:
+        futures = [
+            pool.submit(
+                _encode_segment,
+                job, frame_paths, s, segment_paths[s.index], threads, reporter(s.index), on_encoded, adjustments,
+            )
+            for s in segments
+            if not done[s.index]
+        ]
+        try:
+            for future in as_completed(futures):
+                future.result()
+        except BaseException:
+            # One piece failed (or the job was cancelled): stop the others right away.
+            for future in futures:
+                future.cancel()
+            _abort(job.id)
+            raise
+    _join_segments(job, segment_paths, [s.count / job.output_fps for s in segments])
+
+
+def _encode_segmented(
+    job: ExportJob,
+    frame_paths: FramePaths,
+    parts: int,
+    workers: int,
+    frame_ids: Optional[Sequence[int]] = None,
+    adjustments: Optional[_FrameAdjustments] = None,
+) -> None:
+    """Encode `parts` time slices on `workers` parallel FFmpeg processes and stream-copy them together.
+
+    With frame_ids, finished slices are checkpointed and an earlier attempt is resumed.
+    """
+    overlap = SEGMENT_OVERLAP_FRAMES if _has_temporal_filters(job) else 0
+    if adjustments is not None and adjustments.transforms is not None:
+        overlap = max(overlap, stabilization.SMOOTHING)
+    segments = _plan_segments(len(frame_paths), parts, overlap)
+    work_dir = _segment_dir(job)
+    os.makedirs(work_dir, exist_ok=True)
+    segment_paths = [os.path.join(work_dir, f"{s.index:04d}.mkv") for s in segments]
+    done = [0] * len(segments)
+    if frame_ids is not None:
+        for index in _resume_checkpoints(job, segments, frame_ids, segment_paths):
+            done[index] = segments[index].count
+        resumed = sum(1 for count in done if count)
+        if resumed:
+            logger.info("Resuming export job %d: %d of %d segments already encoded", job.id, resumed, len(segments))
+
+    def on_encoded(segment: _Segment, path: str) -> None:
+        if frame_ids is not None:
+            _record_checkpoint(job.id, segment, frame_ids, path)
 
-        proc.wait()
-        stderr_thread.join()
+    try:
+        _encode_pieces(job, frame_paths, segments, segment_paths, done, workers, on_encoded, adjustments)
+    finally:
+        # Pieces are kept only when the server is stopping, so the job can resume.
+        if not _shutting_down.is_set():
+            remove_checkpoints(job)
+            if frame_ids is not None:
+                _delete_checkpoint_rows(job.id)
 
-        # Re-fetch job to avoid stale state.
-        db.expire(job)
-        job = db.get(ExportJob, job_id)
 
-        if proc.returncode != 0:
-            stderr_out = "".join(stderr_chunks)
-            logger.error("FFmpeg export job %d failed (rc=%d): %s", job_id, proc.returncode, stderr_out)
-            job.status = ExportStatus.error
-            job.error_message = stderr_out[-2000:] if stderr_out else f"FFmpeg exited with code {proc.returncode}"
-        else:
-            job.status = ExportStatus.completed
-            job.frames_done = job.total_frames
-            job.completed_at = datetime.datetime.now(datetime.timezone.utc)
-            try:
-                job.file_size_bytes = os.path.getsize(job.output_path)
-            except OSError:
-                job.file_size_bytes = None
-            logger.info("Export job %d completed successfully", job_id)
+def _render_key(job: ExportJob) -> str:
+    """Hash of every setting that changes an encoded piece; pieces only join with matching ones."""
+    values = [getattr(job, column) for column in _RENDER_COLUMNS]
+    sampling = [getattr(job, column) for column in _SAMPLING_COLUMNS]
+    if any(value is not None for value in sampling):
+        # Only appended when set, so keys of unsampled exports stay as they were.
+        values.append([str(value) for value in sampling])
+    return hashlib.sha256(json.dumps(values).encode()).hexdigest()
+
+
+def _incremental_dir(exports_dir: str, timelapse_id: int) -> str:
+    return os.path.join(exports_dir, ".incremental", f"timelapse_{timelapse_id}")
+
+
+def remove_increments(storage_path: str, timelapse_id: int) -> None:
+    """Delete a timelapse's incremental export pieces from disk (their rows go with the timelapse)."""
+    shutil.rmtree(_incremental_dir(os.path.join(storage_path, "exports"), timelapse_id), ignore_errors=True)
+
+
+def _reusable_increments(job: ExportJob, render_key: str, frame_ids: Sequence[int]) -> List[tuple]:
+    """(first frame index, file path, frame count) of stored pieces still valid for frame_ids, in order.
+
+    Stale pieces are deleted.
+    """
+    db = SessionLocal()
+    try:
+        rows = db.scalars(
+            select(IncrementalSegment).where(
+                IncrementalSegment.timelapse_id == job.timelapse_id,
+                IncrementalSegment.render_key == render_key,
+            )
+        ).all()
+        wanted = {row.first_frame_id for row in rows}
+        position = {frame_id: i for i, frame_id in enumerate(frame_ids) if frame_id in wanted}
+        rows.sort(key=lambda row: position.get(row.first_frame_id, len(frame_ids)))
+        reusable, covered = [], 0
+        for row in rows:
+            start = position.get(row.first_frame_id)
+            end = start + row.frame_count if start is not None else 0
+            if (
+                start is not None
+                and start >= covered
+                and end <= len(frame_ids)
+                and frame_ids[end - 1] == row.last_frame_id
+                and os.path.isfile(row.file_path)
+            ):
+                reusable.append((start, row.file_path, row.frame_count))
+                covered = end
+            else:
+                # Frames inside it were thinned or deleted, or the file is gone.
+                _unlink_quietly(row.file_path)
+                db.delete(row)
+        db.commit()
+        return reusable
+    finally:
+        db.close()
+
 
+def _record_increment(job: ExportJob, render_key: str, segment: _Segment, frame_ids: Sequence[int], path: str) -> None:
+    db = SessionLocal()
+    try:
+        db.add(IncrementalSegment(
+            timelapse_id=job.timelapse_id,
+            render_key=render_key,
+            first_frame_id=frame_ids[segment.first],
+            last_frame_id=frame_ids[segment.first + segment.count - 1],
+            frame_count=segment.count,
+            file_path=path,
+        ))
         db.commit()
+    finally:
+        db.close()
+
+
+def _encode_incremental(job: ExportJob, frame_paths: FramePaths, frame_ids: Sequence[int], parallel: int) -> None:
+    """Reuse pieces from earlier incremental exports and encode only the frames they do not cover.
+
+    Usually that is just the frames captured since the last run; thinning or deletes also
+    re-encode the pieces they touched. New pieces are kept for the next run as soon as each
+    finishes, so an interrupted or cancelled run also resumes from them.
+    """
+    render_key = _render_key(job)
+    work_dir = os.path.join(_incremental_dir(os.path.dirname(job.output_path), job.timelapse_id), render_key[:16])
+    os.makedirs(work_dir, exist_ok=True)
+
+    segments: List[_Segment] = []
+    segment_paths: List[str] = []
+    done: List[int] = []
+
+    def add_new(first: int, count: int) -> None:
+        for piece in _plan_segments(count, _segment_count(count, parallel), 0):
+            start = first + piece.first
+            segments.append(_Segment(len(segments), start, piece.count, 0, 0))
+            segment_paths.append(
+                os.path.join(work_dir, f"{frame_ids[start]}_{frame_ids[start + piece.count - 1]}.mkv")
+            )
+            done.append(0)
+
+    reused = _reusable_increments(job, render_key, frame_ids)
+    covered = 0
+    for start, path, count in reused:
+        if start > covered:
+            add_new(covered, start - covered)
+        segments.append(_Segment(len(segments), start, count, 0, 0))
+        segment_paths.append(path)
+        done.append(count)
+        covered = start + count
+    if covered < len(frame_ids):
+        add_new(covered, len(frame_ids) - covered)
+
+    new_pieces = done.count(0)
+    logger.info(
+        "Incremental export job %d: reusing %d frames in %d pieces, encoding %d frames in %d new pieces",
+        job.id, sum(done), len(reused), len(frame_ids) - sum(done), new_pieces,
+    )
+
+    def on_encoded(segment: _Segment, path: str) -> None:
+        _record_increment(job, render_key, segment, frame_ids, path)
+
+    _encode_pieces(job, frame_paths, segments, segment_paths, done, max(1, min(parallel, new_pieces)), on_encoded)
+
+
+def _unlink_quietly(path: Optional[str]) -> None:
+    if path and os.path.exists(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
 
+
+def _load_frames(db, job: ExportJob, timezone: str) -> FrameList:
+    """The frames the export renders, in output order. The caller closes the list."""
+    frame_filter = frame_selection.FrameFilter.of(job, timezone, job.last_frame_id)
+    frames = frame_selection.load(db, frame_selection.select_frames(db, job.timelapse_id, frame_filter))
+    if not job.preview or len(frames) <= PREVIEW_FRAMES:
+        return frames
+    with frames:
+        return frame_selection.evenly_spaced(frames, PREVIEW_FRAMES)
+
+
+def run_export(job_id: int) -> None:
+    """Blocking export runner for a job the queue has marked running. Opens its own DB session."""
+    handle = track(job_id)
+    db = SessionLocal()
+    output_path: Optional[str] = None
+    try:
+        job = db.get(ExportJob, job_id)
+        if job is None:
+            logger.error("Export job %d not found in DB", job_id)
+            return
+        if job.status != ExportStatus.running:
+            return  # cancelled between being claimed and starting
+
+        settings = db.get(AppSettings, 1)
+        with _load_frames(db, job, settings.timezone if settings else "UTC") as frames:
+            if not frames:
+                raise RuntimeError("No frames match the export's frame selection")
+            # Thinning or deletes may have removed frames since the job was queued.
+            job.total_frames = len(frames)
+            job.frames_done = 0
+            db.commit()
+            export_progress.start(job_id, job.total_frames, job.output_fps)
+            output_path = job.output_path
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+            def stopped() -> bool:
+                # The handle outlives the job, so background proxy rendering may keep asking.
+                return _shutting_down.is_set() or handle.cancelled.is_set() or handle.aborted.is_set()
+
+            storage_path = settings.storage_path if settings else "./data"
+            _check_stopping(job_id)
+            if job.stabilization and stabilization.available():
+                motion = stabilization.analyse(
+                    storage_path,
+                    job.timelapse_id,
+                    frames,
+                    settings.stabilization_cache_mb * 1024 * 1024 if settings else 0,
+                    lambda paths, video_filter: _analyse_motion(job, paths, video_filter),
+                )
+            else:
+                motion = nullcontext()
+            parallel = job.parallel_segments or os.cpu_count() or 1
+            parts = 1 if job.preview else _segment_count(len(frames), parallel)
+            with motion as transforms:
+                _check_stopping(job_id)
+                gains = exposure.gains(db, frames, stopped) if job.deflicker else None
+                _check_stopping(job_id)
+                proxies = proxy_frames.export_paths(
+                    storage_path,
+                    job.timelapse_id,
+                    frames,
+                    _target_resolution(job),
+                    settings.proxy_cache_mb * 1024 * 1024 if settings else 0,
+                    stopped,
+                )
+                with proxies as frame_paths:
+                    _check_stopping(job_id)
+                    adjustments = _FrameAdjustments(transforms, gains)
+                    if job.incremental:
+                        _encode_incremental(job, frame_paths, frames.ids, parallel)
+                    elif parts > 1:
+                        _encode_segmented(job, frame_paths, parts, min(parallel, parts), frames.ids, adjustments)
+                    else:
+                        _encode_single(job, frame_paths, adjustments)
+
+        # Re-fetch job to avoid stale state.
+        db.expire(job)
+        job = db.get(ExportJob, job_id)
+        job.status = ExportStatus.completed
+        job.frames_done = job.total_frames
+        job.completed_at = datetime.datetime.now(datetime.timezone.utc)
+        try:
+            job.file_size_bytes = os.path.getsize(job.output_path)
+        except OSError:
+            job.file_size_bytes = None
+        logger.info("Export job %d completed successfully", job_id)
+        db.commit()
+        export_progress.finish(job_id, ExportStatus.completed)
+
+    except ExportInterrupted:
+        _remove_partial(output_path)
+        logger.info("Export job %d interrupted by shutdown; it will resume from its last checkpoint", job_id)
+    except ExportCancelled:
+        _remove_partial(output_path)
+        db.rollback()
+        job = db.get(ExportJob, job_id)
+        if job:
+            job.status = ExportStatus.cancelled
+            job.error_message = None
+            db.commit()
+        export_progress.finish(job_id, ExportStatus.cancelled)
+        logger.info("Export job %d cancelled", job_id)
+    except FFmpegError as exc:
+        db.rollback()
+        job = db.get(ExportJob, job_id)
+        if job:
+            job.status = ExportStatus.error
+            job.error_message = str(exc)
+            db.commit()
+        export_progress.finish(job_id, ExportStatus.error)
     except Exception as exc:  # pylint: disable=broad-except
         logger.exception("Unexpected error in export job %d", job_id)
         try:
@@ -223,20 +1013,10 @@ def _run_export_sync(
                 db.commit()
         except Exception:
             pass
+        export_progress.finish(job_id, ExportStatus.error)
     finally:
         _clear_progress(job_id)
-        if concat_path and os.path.exists(concat_path):
-            try:
-                os.unlink(concat_path)
-            except OSError:
-                pass
+        with _running_jobs_lock:
+            _running_jobs.pop(job_id, None)
+        handle.finished.set()
         db.close()
-
-
-async def start_export(
-    job_id: int,
-    frame_paths: List[str],
-    output_path: str,
-) -> None:
-    """Async wrapper — runs the blocking export in a thread pool."""
-    await asyncio.to_thread(_run_export_sync, job_id, frame_paths, output_path)
@@ -0,0 +1,151 @@
+"""Pushes export progress (frames, throughput, ETA) to any number of watchers.
+
+The export runner reports frame counts from FFmpeg's -progress output. This module
+turns them into a throughput estimate and publishes at most one update per job every
+PUBLISH_INTERVAL_SECONDS, plus every status change. Watchers read only the in-memory
+latest value, so a running export costs no DB reads however many clients follow it.
+"""
+
+import dataclasses
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+
+from broadcast import Broadcaster
+from database import SessionLocal
+from models.export import ExportJob, ExportStatus
+
+PUBLISH_INTERVAL_SECONDS = 0.5
+# Throughput is averaged over this much recent history, so segment joins and
+# filter warm-up do not make the ETA jump around.
+_RATE_WINDOW_SECONDS = 10.0
+_SSE_HEARTBEAT_SECONDS = 15.0
+_FINISHED = {ExportStatus.completed.value, ExportStatus.error.value, ExportStatus.cancelled.value}
+
+
+@dataclass(frozen=True)
+class ExportProgress:
+    job_id: int
+    status: str
+    frames_done: int
+    total_frames: int
+    progress_pct: float
+    fps: Optional[float] = None            # input frames encoded per second
+    speed: Optional[float] = None          # seconds of output video per wall-clock second
+    eta_seconds: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in _FINISHED
+
+
+class _Tracker:
+    def __init__(self, total_frames: int, output_fps: int) -> None:
+        self.total_frames = total_frames
+        self.output_fps = output_fps
+        # (monotonic time, frames_done). The first report is the baseline, so frames restored
+        # from checkpoints or reused pieces do not count towards throughput.
+        self.samples: Deque[Tuple[float, int]] = deque()
+        self.last_publish = 0.0
+
+
+_progress = Broadcaster()
+_trackers: Dict[int, _Tracker] = {}
+_lock = threading.Lock()
+
+
+def _pct(frames_done: int, total_frames: int) -> float:
+    return round(frames_done / (total_frames or 1) * 100, 1)
+
+
+def start(job_id: int, total_frames: int, output_fps: int) -> None:
+    """Called by the export runner once the job's frame count is known."""
+    with _lock:
+        _trackers[job_id] = _Tracker(total_frames, output_fps)
+    _progress.publish(job_id, ExportProgress(job_id, ExportStatus.running.value, 0, total_frames, 0.0))
+
+
+def report(job_id: int, frames_done: int) -> None:
+    """Record a frame count; publishes if the last update is older than the throttle interval."""
+    now = time.monotonic()
+    with _lock:
+        tracker = _trackers.get(job_id)
+        if tracker is None:
+            return
+        samples = tracker.samples
+        samples.append((now, frames_done))
+        while len(samples) > 2 and now - samples[1][0] > _RATE_WINDOW_SECONDS:
+            samples.popleft()
+        if now - tracker.last_publish < PUBLISH_INTERVAL_SECONDS:
+            return
+        tracker.last_publish = now
+        (first_time, first_done), total, output_fps = samples[0], tracker.total_frames, tracker.output_fps
+    fps = speed = eta = None
+    elapsed = now - first_time
+    if elapsed > 0 and frames_done > first_done:
+        fps = (frames_done - first_done) / elapsed
+        speed = round(fps / output_fps, 2)
+        eta = round(max(total - frames_done, 0) / fps, 1)
+        fps = round(fps, 1)
+    _progress.publish(job_id, ExportProgress(
+        job_id, ExportStatus.running.value, frames_done, total, _pct(frames_done, total), fps, speed, eta
+    ))
+
+
+def finish(job_id: int, status: ExportStatus) -> None:
+    """Publish the final status and stop tracking the job."""
+    with _lock:
+        _trackers.pop(job_id, None)
+    latest = _progress.latest(job_id)
+    frames_done = latest.frames_done if latest else 0
+    total = latest.total_frames if latest else 0
+    if status == ExportStatus.completed:
+        frames_done = total
+    _progress.publish(job_id, ExportProgress(job_id, status.value, frames_done, total, _pct(frames_done, total)))
+
+
+def publish_job(job: ExportJob) -> None:
+    """Publish a job's state as stored in the DB, e.g. after it was cancelled while still queued."""
+    _progress.publish(job.id, _from_job(job))
+
+
+def clear(job_id: int) -> None:
+    _progress.clear(job_id)
+
+
+def _from_job(job: ExportJob) -> ExportProgress:
+    return ExportProgress(
+        job.id, job.status.value, job.frames_done, job.total_frames, _pct(job.frames_done, job.total_frames)
+    )
+
+
+def ensure_seeded(job_id: int) -> bool:
+    """Load the job's stored state if nothing has been published for it yet.
+
+    Returns False if the job does not exist.
+    """
+    if _progress.latest(job_id) is not None:
+        return True
+    db = SessionLocal()
+    try:
+        job = db.get(ExportJob, job_id)
+        if job is None:
+            return False
+        _progress.seed(job_id, _from_job(job))
+        return True
+    finally:
+        db.close()
+
+
+async def event_stream(job_id: int) -> AsyncIterator[str]:
+    """Server-sent "progress" events until the job finishes."""
+    async for progress in _progress.subscribe(job_id, heartbeat=_SSE_HEARTBEAT_SECONDS):
+        if progress is None:
+            yield ": keep-alive\n\n"
+            continue
+        yield f"event: progress\ndata: {json.dumps(dataclasses.asdict(progress))}\n\n"
+        if progress.finished:
+            return
@@ -0,0 +1,154 @@
+"""Persistent export queue.
+
+Pending jobs live in the export_jobs table, so they survive restarts. The dispatcher
+starts them by priority (then age), never running more than the configured
+max_concurrent_exports at once. It runs whenever a job is queued or finishes, and
+periodically as a fallback (e.g. after the limit is raised).
+
+Previews are a separate lane with PREVIEW_SLOTS of their own, so a preview starts at
+once even while long exports fill every export slot.
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Dict, List, Set
+
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+import export_manager
+from database import SessionLocal
+from models.export import ExportJob, ExportStatus
+from models.settings import AppSettings
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_JOB_ID = "export_dispatch"
+DISPATCH_INTERVAL_SECONDS = 30
+PREVIEW_SLOTS = 1
+
+# Job ids running in this process, per lane; the DB status alone can't tell a live job
+# from one interrupted by a crash.
+_running: Set[int] = set()
+_running_previews: Set[int] = set()
+_dispatch_lock = threading.Lock()
+
+
+def schedule(scheduler) -> None:
+    """Register the periodic dispatch job on the capture scheduler."""
+    scheduler.add_job(
+        _dispatch_job,
+        trigger=IntervalTrigger(seconds=DISPATCH_INTERVAL_SECONDS),
+        id=DISPATCH_JOB_ID,
+        replace_existing=True,
+        coalesce=True,
+    )
+
+
+async def _dispatch_job() -> None:
+    try:
+        await asyncio.to_thread(dispatch)
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.exception("Unexpected error while dispatching exports: %s", exc)
+
+
+def _queue_order() -> tuple:
+    return ExportJob.priority.desc(), ExportJob.created_at.asc(), ExportJob.id.asc()
+
+
+def dispatch() -> List[int]:
+    """Start as many pending jobs as there are free slots. Returns the started job ids."""
+    if export_manager.is_shutting_down():
+        return []
+    with _dispatch_lock:
+        db = SessionLocal()
+        try:
+            settings = db.get(AppSettings, 1)
+            free = {
+                False: (settings.max_concurrent_exports if settings else 1) - len(_running),
+                True: PREVIEW_SLOTS - len(_running_previews),
+            }
+            candidates = []
+            for preview, slots in free.items():
+                if slots <= 0:
+                    continue
+                candidates += [
+                    (job_id, preview)
+                    for job_id in db.scalars(
+                        select(ExportJob.id)
+                        .where(ExportJob.status == ExportStatus.pending, ExportJob.preview == preview)
+                        .order_by(*_queue_order())
+                        .limit(slots)
+                    )
+                ]
+            if not candidates:
+                return []
+            started = []
+            for job_id, preview in candidates:
+                claimed = db.execute(
+                    update(ExportJob)
+                    .where(ExportJob.id == job_id, ExportJob.status == ExportStatus.pending)
+                    .values(status=ExportStatus.running, error_message=None)
+                )
+                if claimed.rowcount:
+                    # Tracked before the commit, so a cancel never sees it running but untracked.
+                    export_manager.track(job_id)
+                    started.append((job_id, preview))
+            db.commit()
+        finally:
+            db.close()
+        for job_id, preview in started:
+            running = _running_previews if preview else _running
+            running.add(job_id)
+            threading.Thread(target=_run, args=(job_id, running), name=f"export-{job_id}", daemon=True).start()
+    if started:
+        logger.info("Started export job(s) %s", ", ".join(str(job_id) for job_id, _ in started))
+    return [job_id for job_id, _ in started]
+
+
+def _run(job_id: int, running: Set[int]) -> None:
+    try:
+        export_manager.run_export(job_id)
+    finally:
+        with _dispatch_lock:
+            running.discard(job_id)
+        dispatch()
+
+
+def cancel_pending(db: Session, job_id: int) -> bool:
+    """Take a job out of the queue if it has not started yet. Returns False otherwise."""
+    result = db.execute(
+        update(ExportJob)
+        .where(ExportJob.id == job_id, ExportJob.status == ExportStatus.pending)
+        .values(status=ExportStatus.cancelled)
+    )
+    db.commit()
+    return bool(result.rowcount)
+
+
+def queue_positions(db: Session) -> Dict[int, int]:
+    """Map each pending job id to its 1-based position in its lane's queue."""
+    rows = db.execute(
+        select(ExportJob.id, ExportJob.preview).where(ExportJob.status == ExportStatus.pending).order_by(*_queue_order())
+    ).all()
+    positions, lane_lengths = {}, {False: 0, True: 0}
+    for job_id, preview in rows:
+        lane_lengths[bool(preview)] += 1
+        positions[job_id] = lane_lengths[bool(preview)]
+    return positions
+
+
+def requeue_interrupted(db: Session) -> int:
+    """Put jobs left "running" by a previous process back in the queue. Returns how many.
+
+    Segmented jobs keep their finished pieces and resume after them.
+    """
+    result = db.execute(
+        update(ExportJob)
+        .where(ExportJob.status == ExportStatus.running)
+        .values(status=ExportStatus.pending)
+    )
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,184 @@
+"""Deflicker: per-frame exposure correction from colour statistics recorded at capture.
+
+Capture stores the mean red, green and blue of each frame, measured on a 1/8-scale decode,
+in the frames table. A deflickered export reads them for its frames from the index, smooths
+each channel over ±DEFLICKER_RADIUS frames in log space and scales every frame towards the
+smoothed curve: auto-exposure jumps and white-balance hunting are evened out while slow
+changes such as dusk are kept. Frames captured before the statistics were recorded are
+measured from their files the first time an export needs them, and the values are stored.
+
+The gains are applied by a colorchannelmixer whose coefficients a sendcmd filter sets per
+frame, so no analysis pass over the video is needed and segments of a split export are
+corrected exactly as they would be in one piece.
+"""
+
+import logging
+import os
+import tempfile
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from frame_selection import FrameList
+from models.frame import Frame
+from stabilization import filter_path
+
+logger = logging.getLogger(__name__)
+
+DEFLICKER_RADIUS = 12
+# Frames are brightened or darkened by at most this factor.
+MAX_GAIN = 1.5
+# Coefficient changes smaller than this are not sent to the filter.
+_GAIN_STEP = 0.002
+# Frame ids per query when reading or storing statistics.
+_BATCH_ROWS = 500
+_FILTER_NAME = "colorchannelmixer@deflicker"
+
+Stats = Tuple[float, float, float]
+
+
+def measure_bytes(data: bytes) -> Optional[Stats]:
+    """(red, green, blue) means of an encoded image, or None if it cannot be decoded."""
+    # pylint: disable=no-member
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_REDUCED_COLOR_8)
+    return _means(image)
+
+
+def measure_file(path: str) -> Optional[Stats]:
+    image = cv2.imread(path, cv2.IMREAD_REDUCED_COLOR_8)  # pylint: disable=no-member
+    return _means(image)
+
+
+def _means(image) -> Optional[Stats]:
+    if image is None:
+        return None
+    blue, green, red, _ = cv2.mean(image)  # pylint: disable=no-member
+    return red, green, blue
+
+
+def deflicker_filter(commands_path: str) -> str:
+    """The filters applying the gains of a commands file written by Gains.write_commands."""
+    return f"sendcmd=f={filter_path(commands_path)},{_FILTER_NAME}"
+
+
+class Gains:
+    """Per-frame (red, green, blue) multipliers of one export, in output order."""
+
+    def __init__(self, values: np.ndarray) -> None:
+        self._values = values
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def write_commands(self, start: int, end: int, fps: int) -> str:
+        """Write the sendcmd file for frames start … end-1 of an encode at `fps`; caller deletes it."""
+        fd, path = tempfile.mkstemp(prefix="chronicle_deflicker_", suffix=".cmd")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as out:
+                sent = None
+                for number, values in enumerate(self._values[start:end]):
+                    if sent is not None and np.abs(values - sent).max() < _GAIN_STEP:
+                        continue
+                    # Halfway between frames, so the command is in place before the frame arrives.
+                    at = max(0.0, (number - 0.5) / fps)
+                    red, green, blue = (f"{v:.4f}" for v in values)
+                    out.write(
+                        f"{at:.6f} {_FILTER_NAME} rr {red}, {_FILTER_NAME} gg {green}, "
+                        f"{_FILTER_NAME} bb {blue};\n"
+                    )
+                    sent = values
+        except Exception:
+            os.unlink(path)
+            raise
+        return path
+
+
+def gains(db: Session, frames: FrameList, stopped: Optional[Callable[[], bool]] = None) -> Gains:
+    """Deflicker gains for an export's frames, measuring any frame that has no statistics yet.
+
+    Measuring ends early once stopped() returns true; the values measured so far are
+    stored, and the caller must then discard the gains.
+    """
+    stats = np.full((len(frames), 3), np.nan, dtype=np.float32)
+    for batch in _batches(frames.ids):
+        rows = db.execute(
+            select(Frame.id, Frame.red_mean, Frame.green_mean, Frame.blue_mean)
+            .where(Frame.id.in_(batch), Frame.red_mean.isnot(None))
+        ).all()
+        if rows:
+            positions = frames.positions([row[0] for row in rows])
+            stats[positions] = [row[1:] for row in rows]
+
+    missing = np.flatnonzero(np.isnan(stats[:, 0]))
+    if len(missing):
+        logger.info("Measuring exposure of %d of %d frames", len(missing), len(frames))
+        _measure_missing(db, frames, missing, stats, stopped)
+    return Gains(_smooth_gains(stats))
+
+
+def _batches(ids: Iterable[int]) -> Iterable[List[int]]:
+    batch: List[int] = []
+    for frame_id in ids:
+        batch.append(frame_id)
+        if len(batch) == _BATCH_ROWS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _measure_missing(
+    db: Session,
+    frames: FrameList,
+    missing: np.ndarray,
+    stats: np.ndarray,
+    stopped: Optional[Callable[[], bool]],
+) -> None:
+    wanted = set(missing.tolist())
+    measured = []
+    first, last = int(missing[0]), int(missing[-1]) + 1
+    for position, (frame_id, file_path) in enumerate(frames.records(first, last), first):
+        if position not in wanted:
+            continue
+        if stopped is not None and stopped():
+            break
+        values = measure_file(file_path)
+        if values is None:
+            logger.warning("Could not decode %s for deflicker", file_path)
+            continue
+        stats[position] = values
+        measured.append({"id": frame_id, "red_mean": values[0], "green_mean": values[1], "blue_mean": values[2]})
+        if len(measured) == _BATCH_ROWS:
+            _store(db, measured)
+            measured = []
+    if measured:
+        _store(db, measured)
+
+
+def _store(db: Session, measured: List[dict]) -> None:
+    # Bulk UPDATE by primary key: one executemany per batch.
+    db.execute(update(Frame), measured)
+    db.commit()
+
+
+def _smooth_gains(stats: np.ndarray) -> np.ndarray:
+    """Gains moving each frame's channel means onto their centred moving average.
+
+    Frames without statistics (undecodable ones) get a gain of 1 and are left out of
+    their neighbours' averages.
+    """
+    levels = np.log(np.maximum(stats.astype(np.float64), 1.0))
+    known = ~np.isnan(levels)
+    counts = np.concatenate([np.zeros((1, 3)), np.cumsum(known, axis=0)])
+    sums = np.concatenate([np.zeros((1, 3)), np.cumsum(np.where(known, levels, 0.0), axis=0)])
+    positions = np.arange(len(levels))
+    low = np.maximum(positions - DEFLICKER_RADIUS, 0)
+    high = np.minimum(positions + DEFLICKER_RADIUS + 1, len(levels))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        smoothed = (sums[high] - sums[low]) / (counts[high] - counts[low])
+        result = np.exp(smoothed - levels)
+    result = np.where(known, np.clip(result, 1 / MAX_GAIN, MAX_GAIN), 1.0)
+    return result.astype(np.float32)
@@ -0,0 +1,50 @@
+"""File responses that can hand the byte transfer off to nginx via X-Accel-Redirect.
+
+Set ACCEL_REDIRECT_PREFIX (e.g. "/_storage/") to an internal nginx location that
+serves ACCEL_REDIRECT_ROOT. The backend then only authorises the request and resolves
+the path; nginx streams the file with sendfile. Without ACCEL_REDIRECT_ROOT the root is
+the storage path currently configured in settings, which the nginx location must then
+follow. Files outside the root, or any file when the prefix is unset, are streamed by
+the backend as before.
+"""
+
+import os
+from typing import Optional
+from urllib.parse import quote
+
+from fastapi import Response
+from fastapi.responses import FileResponse
+
+ACCEL_REDIRECT_PREFIX = os.getenv("ACCEL_REDIRECT_PREFIX", "").strip()
+ACCEL_REDIRECT_ROOT = os.getenv("ACCEL_REDIRECT_ROOT", "").strip()
+
+
+def _accel_path(path: str, storage_path: Optional[str]) -> Optional[str]:
+    root = ACCEL_REDIRECT_ROOT or storage_path
+    if not ACCEL_REDIRECT_PREFIX or not root:
+        return None
+    root = os.path.realpath(root)
+    target = os.path.realpath(path)
+    if os.path.commonpath([root, target]) != root:
+        return None
+    relative = os.path.relpath(target, root).replace(os.sep, "/")
+    return ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + quote(relative)
+
+
+def file_response(
+    path: str,
+    *,
+    storage_path: Optional[str] = None,
+    media_type: Optional[str] = None,
+    filename: Optional[str] = None,
+    headers: Optional[dict] = None,
+) -> Response:
+    headers = dict(headers or {})
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    accel = _accel_path(path, storage_path)
+    if accel is None:
+        return FileResponse(path, media_type=media_type, headers=headers)
+    headers["X-Accel-Redirect"] = accel
+    # nginx picks the Content-Type from its mime types and handles Range/ETag itself.
+    return Response(status_code=200, media_type=media_type, headers=headers)
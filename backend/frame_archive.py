@@ -0,0 +1,266 @@
+"""Streams a timelapse's raw frames as an uncompressed (stored) ZIP without building it on disk.
+
+Every entry is written with a data descriptor, so its CRC can be computed while the
+file is streamed. Header sizes depend only on file names and sizes. The full archive
+length and every entry offset are known before the first byte goes out. That allows a
+Content-Length and resuming with HTTP Range. The central directory needs the CRC-32 of
+every entry, including the ones a resumed download skips; capture stores it with the
+frame, so skipped entries are not read again. Frames without a stored CRC are read once
+and get theirs stored when the archive finishes.
+
+Rows are read with a server-side cursor twice (local entries, then the central
+directory). Only a 4-byte CRC per entry is kept in memory.
+"""
+
+import datetime
+import logging
+import os
+import struct
+import zlib
+from array import array
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from sqlalchemy import func, select, update
+
+from database import SessionLocal
+from models.frame import Frame
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 1024 * 1024
+_YIELD_PER = 1000
+# Frames per UPDATE when storing computed CRCs.
+_STORE_BATCH_ROWS = 500
+_ZIP64_LIMIT = 0xFFFFFFFF
+_MAX_ENTRIES = 0xFFFF
+_VERSION = 45  # 4.5: ZIP64
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_DATA_DESCRIPTOR = struct.Struct("<IIII")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_ZIP64_OFFSET_EXTRA = struct.Struct("<HHQ")
+_ZIP64_END = struct.Struct("<IQHHIIQQQQ")
+_ZIP64_LOCATOR = struct.Struct("<IIQI")
+_END = struct.Struct("<IHHHHIIH")
+
+
+class ArchiveError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class ArchivePlan:
+    """A fixed snapshot of which frames go into the archive and how large it will be."""
+
+    timelapse_id: int
+    start: Optional[datetime.datetime]
+    end: Optional[datetime.datetime]
+    max_frame_id: int
+    entry_count: int
+    total_size: int
+
+    @property
+    def etag(self) -> str:
+        return f'"z{self.timelapse_id}-{self.max_frame_id}-{self.entry_count}-{self.total_size}"'
+
+
+def _filters(timelapse_id, start, end, max_frame_id=None) -> list:
+    filters = [Frame.timelapse_id == timelapse_id]
+    if start is not None:
+        filters.append(Frame.captured_at >= start)
+    if end is not None:
+        filters.append(Frame.captured_at <= end)
+    if max_frame_id is not None:
+        filters.append(Frame.id <= max_frame_id)
+    return filters
+
+
+def _iter_entries(db, plan: ArchivePlan) -> Iterator[tuple]:
+    """(frame id, entry name, file path, size, stored CRC) per frame in capture order, via a server-side cursor."""
+    rows = db.execute(
+        select(Frame.id, Frame.file_path, Frame.crc32)
+        .where(*_filters(plan.timelapse_id, plan.start, plan.end, plan.max_frame_id))
+        .order_by(Frame.captured_at, Frame.id)
+        .execution_options(yield_per=_YIELD_PER)
+    )
+    for frame_id, file_path, crc in rows:
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            continue  # missing files are left out of the archive entirely
+        yield frame_id, f"{frame_id:08d}_{os.path.basename(file_path)}".encode(), file_path, size, crc
+
+
+def plan_archive(
+    timelapse_id: int,
+    start: Optional[datetime.datetime],
+    end: Optional[datetime.datetime],
+    max_frame_id: Optional[int] = None,
+) -> ArchivePlan:
+    """Pin the frame set (by max id, unless given) and compute the exact archive size."""
+    db = SessionLocal()
+    try:
+        max_frame_id = db.scalar(
+            select(func.max(Frame.id)).where(*_filters(timelapse_id, start, end, max_frame_id))
+        )
+        if max_frame_id is None:
+            raise ArchiveError("No frames in the requested range")
+        plan = ArchivePlan(timelapse_id, start, end, max_frame_id, 0, 0)
+        count, offset, central = 0, 0, 0
+        for _, name, _, size, _ in _iter_entries(db, plan):
+            if size > _ZIP64_LIMIT:
+                raise ArchiveError("Frames larger than 4 GiB are not supported")
+            central += _CENTRAL_HEADER.size + len(name) + (
+                _ZIP64_OFFSET_EXTRA.size if offset >= _ZIP64_LIMIT else 0
+            )
+            offset += _LOCAL_HEADER.size + len(name) + size + _DATA_DESCRIPTOR.size
+            count += 1
+        if count == 0:
+            raise ArchiveError("No frame files found on disk for the requested range")
+        total = offset + central + _end_records_size(count, offset, central)
+        return ArchivePlan(timelapse_id, start, end, max_frame_id, count, total)
+    finally:
+        db.close()
+
+
+def _needs_zip64_end(count: int, cd_offset: int, cd_size: int) -> bool:
+    return count > _MAX_ENTRIES or cd_offset >= _ZIP64_LIMIT or cd_size >= _ZIP64_LIMIT
+
+
+def _end_records_size(count: int, cd_offset: int, cd_size: int) -> int:
+    size = _END.size
+    if _needs_zip64_end(count, cd_offset, cd_size):
+        size += _ZIP64_END.size + _ZIP64_LOCATOR.size
+    return size
+
+
+def _local_header(name: bytes) -> bytes:
+    # CRC and sizes follow the data in the descriptor.
+    return _LOCAL_HEADER.pack(
+        0x04034B50, _VERSION, _FLAG_DATA_DESCRIPTOR | _FLAG_UTF8, 0, 0, 0x21, 0, 0, 0, len(name), 0
+    ) + name
+
+
+def _central_header(name: bytes, crc: int, size: int, offset: int) -> bytes:
+    zip64 = offset >= _ZIP64_LIMIT
+    extra = _ZIP64_OFFSET_EXTRA.pack(0x0001, 8, offset) if zip64 else b""
+    return _CENTRAL_HEADER.pack(
+        0x02014B50, _VERSION, _VERSION, _FLAG_DATA_DESCRIPTOR | _FLAG_UTF8, 0, 0, 0x21,
+        crc, size, size, len(name), len(extra), 0, 0, 0, 0,
+        _ZIP64_LIMIT if zip64 else offset,
+    ) + name + extra
+
+
+def _end_records(count: int, cd_offset: int, cd_size: int) -> bytes:
+    out = b""
+    if _needs_zip64_end(count, cd_offset, cd_size):
+        zip64_end_offset = cd_offset + cd_size
+        out += _ZIP64_END.pack(
+            0x06064B50, _ZIP64_END.size - 12, _VERSION, _VERSION, 0, 0,
+            count, count, cd_size, cd_offset,
+        )
+        out += _ZIP64_LOCATOR.pack(0x07064B50, 0, zip64_end_offset, 1)
+    out += _END.pack(
+        0x06054B50, 0, 0,
+        min(count, _MAX_ENTRIES), min(count, _MAX_ENTRIES),
+        min(cd_size, _ZIP64_LIMIT), min(cd_offset, _ZIP64_LIMIT), 0,
+    )
+    return out
+
+
+def _file_crc(file_path: str) -> int:
+    crc = 0
+    with open(file_path, "rb") as fh:
+        while chunk := fh.read(_CHUNK_SIZE):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def _store_crcs(frame_ids: array, crcs: array) -> None:
+    db = SessionLocal()
+    try:
+        for start in range(0, len(frame_ids), _STORE_BATCH_ROWS):
+            batch = slice(start, start + _STORE_BATCH_ROWS)
+            db.execute(update(Frame), [
+                {"id": frame_id, "crc32": crc} for frame_id, crc in zip(frame_ids[batch], crcs[batch])
+            ])
+            db.commit()
+    except Exception:  # pylint: disable=broad-except
+        # Only a cache: the next archive computes them again.
+        logger.exception("Could not store the CRCs of %d frames", len(frame_ids))
+    finally:
+        db.close()
+
+
+def stream_archive(plan: ArchivePlan, first_byte: int = 0) -> Iterator[bytes]:
+    """Yield the archive bytes from first_byte to the end."""
+    db = SessionLocal()
+    # Computed CRCs of frames that had none stored, saved once the rows are read.
+    computed_ids, computed_crcs = array("q"), array("L")
+    try:
+        crcs = array("L")
+        pos = 0
+
+        def emit(data: bytes) -> Iterator[bytes]:
+            nonlocal pos
+            start = pos
+            pos += len(data)
+            if pos > first_byte:
+                yield data[max(0, first_byte - start):]
+
+        for frame_id, name, file_path, size, stored_crc in _iter_entries(db, plan):
+            header = _local_header(name)
+            entry_end = pos + len(header) + size + _DATA_DESCRIPTOR.size
+            if entry_end <= first_byte:
+                # Entirely before the requested range: only its CRC is needed.
+                if stored_crc is None:
+                    stored_crc = _file_crc(file_path)
+                    computed_ids.append(frame_id)
+                    computed_crcs.append(stored_crc)
+                crcs.append(stored_crc)
+                pos = entry_end
+                continue
+            yield from emit(header)
+            crc, remaining = 0, size
+            with open(file_path, "rb") as fh:
+                while remaining:
+                    chunk = fh.read(min(_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise ArchiveError(f"{file_path} shrank while being archived")
+                    crc = zlib.crc32(chunk, crc)
+                    remaining -= len(chunk)
+                    yield from emit(chunk)
+            crcs.append(crc)
+            if stored_crc is None:
+                computed_ids.append(frame_id)
+                computed_crcs.append(crc)
+            yield from emit(_DATA_DESCRIPTOR.pack(0x08074B50, crc, size, size))
+
+        if len(crcs) != plan.entry_count:
+            raise ArchiveError("Frames changed on disk while the archive was being streamed")
+
+        cd_offset, offset, cd_size, index = pos, 0, 0, 0
+        for index, (_, name, _, size, _) in enumerate(_iter_entries(db, plan), start=1):
+            if index > len(crcs):
+                break
+            record = _central_header(name, crcs[index - 1], size, offset)
+            cd_size += len(record)
+            offset += _LOCAL_HEADER.size + len(name) + size + _DATA_DESCRIPTOR.size
+            yield from emit(record)
+        if index != plan.entry_count:
+            raise ArchiveError("Frames changed on disk while the archive was being streamed")
+        yield from emit(_end_records(plan.entry_count, cd_offset, cd_size))
+
+        if pos != plan.total_size:
+            logger.error("Frame archive for timelapse %d ended at %d, planned %d", plan.timelapse_id, pos, plan.total_size)
+    except ArchiveError as exc:
+        # Headers are already sent, so all we can do is cut the transfer short.
+        logger.error("Aborting frame archive for timelapse %d: %s", plan.timelapse_id, exc)
+        raise
+    finally:
+        db.close()
+        if computed_ids:
+            _store_crcs(computed_ids, computed_crcs)
@@ -0,0 +1,270 @@
+"""Which frames an export renders, selected in SQL and read through a streaming cursor.
+
+The range, daily window and sampling options of an export become WHERE clauses on the
+(timelapse_id, captured_at) index and ROW_NUMBER() windows, so picking one frame per hour
+out of millions never loads the others. The daily window is wall-clock time in the
+configured timezone; SQLite only knows fixed offsets, so the selected period is split at
+the timezone's UTC offset changes and each part is compared at its own offset.
+
+The selected rows are read once into a FrameList, which keeps only the frame ids in memory
+and spools the paths to a temporary file that concat lists are written from.
+"""
+
+import datetime
+import os
+import shutil
+import tempfile
+from array import array
+from dataclasses import dataclass, fields
+from typing import Iterable, Iterator, List, Optional, Protocol, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from sqlalchemy import Integer, Select, and_, cast, func, or_, select
+from sqlalchemy.orm import Session
+
+from models.frame import Frame
+
+# Rows fetched per round trip while streaming a selection.
+STREAM_BATCH_ROWS = 1000
+# A FrameList remembers the spool offset of every _OFFSET_STRIDE-th frame.
+_OFFSET_STRIDE = 256
+
+
+@dataclass(frozen=True)
+class FrameFilter:
+    start_time:              Optional[datetime.datetime] = None   # captured at or after
+    end_time:                Optional[datetime.datetime] = None   # captured before
+    daily_start:             Optional[datetime.time]     = None   # wall-clock window, may wrap midnight
+    daily_end:               Optional[datetime.time]     = None
+    every_nth:               Optional[int]               = None   # keep frames 1, 1+n, 1+2n, … of the rest
+    sample_interval_seconds: Optional[int]               = None   # keep the first frame of each interval
+    last_frame_id:           Optional[int]               = None   # frames captured later are not part of it
+    timezone:                str                         = "UTC"
+
+    @classmethod
+    def of(cls, source, timezone: str = "UTC", last_frame_id: Optional[int] = None) -> "FrameFilter":
+        """Filter from the same-named attributes of an ExportRequest or ExportJob."""
+        values = {
+            f.name: getattr(source, f.name)
+            for f in fields(cls)
+            if f.name not in ("last_frame_id", "timezone")
+        }
+        return cls(**values, last_frame_id=last_frame_id, timezone=timezone)
+
+
+def select_frames(db: Session, timelapse_id: int, frame_filter: FrameFilter) -> Select:
+    """(id, file_path) of the selected frames, in output order."""
+    query = select(Frame.id, Frame.file_path, Frame.captured_at).where(Frame.timelapse_id == timelapse_id)
+    if frame_filter.last_frame_id is not None:
+        query = query.where(Frame.id <= frame_filter.last_frame_id)
+    if frame_filter.start_time is not None:
+        query = query.where(Frame.captured_at >= frame_filter.start_time)
+    if frame_filter.end_time is not None:
+        query = query.where(Frame.captured_at < frame_filter.end_time)
+    if frame_filter.daily_start is not None and frame_filter.daily_end is not None:
+        query = query.where(_daily_window(db, query, frame_filter))
+
+    order = (Frame.captured_at.asc(), Frame.id.asc())
+    if frame_filter.every_nth and frame_filter.every_nth > 1:
+        ranked = query.add_columns(func.row_number().over(order_by=order).label("rank")).subquery()
+        keep = (ranked.c.rank - 1) % frame_filter.every_nth == 0
+    elif frame_filter.sample_interval_seconds:
+        # Intervals are aligned to the Unix epoch, so hourly sampling keeps the first frame of each hour.
+        bucket = cast(func.strftime("%s", Frame.captured_at), Integer) // frame_filter.sample_interval_seconds
+        ranked = query.add_columns(
+            func.row_number().over(partition_by=bucket, order_by=order).label("rank")
+        ).subquery()
+        keep = ranked.c.rank == 1
+    else:
+        return query.with_only_columns(Frame.id, Frame.file_path).order_by(*order)
+    return (
+        select(ranked.c.id, ranked.c.file_path)
+        .where(keep)
+        .order_by(ranked.c.captured_at.asc(), ranked.c.id.asc())
+    )
+
+
+def _daily_window(db: Session, query: Select, frame_filter: FrameFilter):
+    start = frame_filter.daily_start.strftime("%H:%M:%S")
+    end = frame_filter.daily_end.strftime("%H:%M:%S")
+
+    def in_window(offset_seconds: int):
+        local_time = func.time(Frame.captured_at, f"{offset_seconds:+d} seconds")
+        if start < end:
+            return and_(local_time >= start, local_time < end)
+        return or_(local_time >= start, local_time < end)  # e.g. 22:00–02:00
+
+    bounds = query.with_only_columns(func.min(Frame.captured_at), func.max(Frame.captured_at))
+    first, last = db.execute(bounds).one()
+    if first is None:
+        return in_window(0)
+    spans = _offset_spans(ZoneInfo(frame_filter.timezone), first, last)
+    if len(spans) == 1:
+        return in_window(spans[0][2])
+    clauses = []
+    for i, (span_start, span_end, offset) in enumerate(spans):
+        conditions = [in_window(offset)]
+        if i > 0:
+            conditions.append(Frame.captured_at >= span_start)
+        if i < len(spans) - 1:
+            conditions.append(Frame.captured_at < span_end)
+        clauses.append(and_(*conditions))
+    return or_(*clauses)
+
+
+def _utc_offset(zone: ZoneInfo, moment: datetime.datetime) -> int:
+    return int(moment.astimezone(zone).utcoffset().total_seconds())
+
+
+def _offset_spans(
+    zone: ZoneInfo,
+    first: datetime.datetime,
+    last: datetime.datetime,
+) -> List[Tuple[datetime.datetime, datetime.datetime, int]]:
+    """Split [first, last] (UTC) where the zone's UTC offset changes: (start, end, offset seconds)."""
+    first = first.replace(tzinfo=datetime.timezone.utc)
+    last = last.replace(tzinfo=datetime.timezone.utc)
+    spans = []
+    span_start, offset = first, _utc_offset(zone, first)
+    day = first
+    while day < last:
+        next_day = min(day + datetime.timedelta(days=1), last)
+        if _utc_offset(zone, next_day) != offset:
+            low, high = day, next_day
+            while high - low > datetime.timedelta(minutes=1):
+                middle = low + (high - low) / 2
+                if _utc_offset(zone, middle) == offset:
+                    low = middle
+                else:
+                    high = middle
+            # Offsets change on whole minutes.
+            change = high.replace(second=0, microsecond=0)
+            spans.append((span_start, change, offset))
+            span_start, offset = change, _utc_offset(zone, change)
+        day = next_day
+    spans.append((span_start, last, offset))
+    return spans
+
+
+def frame_stats(db: Session, query: Select) -> Tuple[int, Optional[int], int]:
+    """(frame count, last frame id, sum of frame ids) of a selection."""
+    selected = query.order_by(None).subquery()
+    count, last_id, id_sum = db.execute(
+        select(func.count(), func.max(selected.c.id), func.sum(selected.c.id))  # pylint: disable=not-callable
+    ).one()
+    return count, last_id, id_sum or 0
+
+
+class FramePaths(Protocol):
+    """The input frames of an encode, read by position."""
+
+    def __len__(self) -> int: ...
+
+    def paths(self, start: int = 0, end: Optional[int] = None) -> Iterator[str]: ...
+
+
+class FrameList:
+    """The (id, file_path) rows of an export, read once.
+
+    Ids stay in memory as an int64 array; paths are spooled to a temporary file and read
+    back by position, so a long export costs 8 bytes of memory per frame.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[int, str]]) -> None:
+        self.ids = array("q")
+        self._offsets = array("q")
+        # (permutation, sorted ids) for positions(); (None, None) while the ids ascend.
+        self._sorted: Optional[Tuple[Optional[np.ndarray], Optional[np.ndarray]]] = None
+        fd, self._spool = tempfile.mkstemp(prefix="chronicle_frames_", suffix=".txt")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                for frame_id, file_path in rows:
+                    if len(self.ids) % _OFFSET_STRIDE == 0:
+                        self._offsets.append(fh.tell())
+                    self.ids.append(frame_id)
+                    fh.write(f"{frame_id}\t{file_path}\n".encode("utf-8"))
+        except BaseException:
+            os.unlink(self._spool)
+            raise
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __enter__(self) -> "FrameList":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def records(self, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        """(frame id, file path) of frames start … end-1."""
+        end = len(self.ids) if end is None else min(end, len(self.ids))
+        if start >= end:
+            return
+        with open(self._spool, "rb") as fh:
+            fh.seek(self._offsets[start // _OFFSET_STRIDE])
+            for _ in range(start % _OFFSET_STRIDE):
+                fh.readline()
+            for _ in range(end - start):
+                frame_id, file_path = fh.readline().decode("utf-8").rstrip("\n").split("\t", 1)
+                yield int(frame_id), file_path
+
+    def paths(self, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+        for _, file_path in self.records(start, end):
+            yield file_path
+
+    def positions(self, frame_ids: Sequence[int]) -> np.ndarray:
+        """Positions of frame_ids in this list, -1 for ids it does not hold, by binary search."""
+        ids = np.frombuffer(self.ids, dtype=np.int64)
+        wanted = np.asarray(frame_ids, dtype=np.int64)
+        if not len(ids):
+            return np.full(len(wanted), -1, dtype=np.int64)
+        if self._sorted is None:
+            # Ids follow capture order unless frames were added out of order through the
+            # API; only then are a sorted copy and its permutation kept.
+            if np.all(ids[1:] > ids[:-1]):
+                self._sorted = (None, None)
+            else:
+                order = np.argsort(ids, kind="stable")
+                self._sorted = (order, ids[order])
+        order, sorted_ids = self._sorted
+        if order is None:
+            sorted_ids = ids
+        index = np.minimum(np.searchsorted(sorted_ids, wanted), len(ids) - 1)
+        return np.where(sorted_ids[index] == wanted, index if order is None else order[index], -1)
+
+    def copy(self) -> "FrameList":
+        """An independent FrameList of the same frames, e.g. for work that outlives this one."""
+        clone = FrameList.__new__(FrameList)
+        clone.ids = array("q", self.ids)
+        clone._offsets = array("q", self._offsets)
+        clone._sorted = self._sorted
+        fd, clone._spool = tempfile.mkstemp(prefix="chronicle_frames_", suffix=".txt")
+        os.close(fd)
+        try:
+            os.unlink(clone._spool)
+            os.link(self._spool, clone._spool)
+        except OSError:
+            shutil.copyfile(self._spool, clone._spool)
+        return clone
+
+    def close(self) -> None:
+        try:
+            os.unlink(self._spool)
+        except FileNotFoundError:
+            pass
+
+
+def evenly_spaced(frames: FrameList, count: int) -> FrameList:
+    """`count` frames spread evenly over `frames`, the first and last included. The caller closes both."""
+    if len(frames) <= count:
+        return frames.copy()
+    picks = {round(i * (len(frames) - 1) / (count - 1)) for i in range(count)}
+    return FrameList(record for index, record in enumerate(frames.records()) if index in picks)
+
+
+def load(db: Session, query: Select) -> FrameList:
+    """Stream a selection into a FrameList. The caller closes it."""
+    rows = db.execute(query.execution_options(yield_per=STREAM_BATCH_ROWS))
+    return FrameList((frame_id, file_path) for frame_id, file_path in rows)
@@ -0,0 +1,123 @@
+"""Pushes each newly captured frame to live viewers from an in-memory latest-frame buffer."""
+
+import datetime
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+from sqlalchemy import select
+
+from broadcast import Broadcaster
+from capture import _FORMAT_EXT, _FORMAT_MEDIA_TYPE
+from database import SessionLocal
+from models.frame import Frame
+from models.timelapse import Timelapse
+
+logger = logging.getLogger(__name__)
+
+MJPEG_BOUNDARY = "chronicle-frame"
+_SSE_HEARTBEAT_SECONDS = 15.0
+_EXT_MEDIA_TYPE = {ext: _FORMAT_MEDIA_TYPE[fmt] for fmt, ext in _FORMAT_EXT.items()}
+
+
+@dataclass(frozen=True)
+class LiveFrame:
+    frame_id: int
+    timelapse_id: int
+    file_path: str
+    captured_at: datetime.datetime
+    media_type: str
+    data: bytes
+
+
+_frames = Broadcaster()
+
+
+def publish_frame(frame: Frame, image_format: str, data: bytes) -> None:
+    """Called by the capture loop (from a worker thread) after a frame is committed."""
+    _frames.publish(
+        frame.timelapse_id,
+        LiveFrame(
+            frame_id=frame.id,
+            timelapse_id=frame.timelapse_id,
+            file_path=frame.file_path,
+            captured_at=frame.captured_at,
+            media_type=_FORMAT_MEDIA_TYPE.get(image_format, "image/webp"),
+            data=data,
+        ),
+    )
+
+
+def clear(timelapse_id: int) -> None:
+    _frames.clear(timelapse_id)
+
+
+def ensure_seeded(timelapse_id: int) -> bool:
+    """Load the newest frame from disk into the buffer if nothing has been captured since startup.
+
+    Runs once per timelapse per process; later viewers are served from memory.
+    Returns False if the timelapse does not exist.
+    """
+    if _frames.latest(timelapse_id) is not None:
+        return True
+    db = SessionLocal()
+    try:
+        if db.get(Timelapse, timelapse_id) is None:
+            return False
+        frame = db.scalars(
+            select(Frame)
+            .where(Frame.timelapse_id == timelapse_id)
+            .order_by(Frame.captured_at.desc())
+            .limit(1)
+        ).first()
+        if frame is None:
+            return True
+        try:
+            with open(frame.file_path, "rb") as fh:
+                data = fh.read()
+        except OSError as exc:
+            logger.warning("Could not seed live preview for timelapse %d: %s", timelapse_id, exc)
+            return True
+        ext = os.path.splitext(frame.file_path)[1].lstrip(".").lower()
+        _frames.seed(
+            timelapse_id,
+            LiveFrame(
+                frame_id=frame.id,
+                timelapse_id=timelapse_id,
+                file_path=frame.file_path,
+                captured_at=frame.captured_at,
+                media_type=_EXT_MEDIA_TYPE.get(ext, "application/octet-stream"),
+                data=data,
+            ),
+        )
+        return True
+    finally:
+        db.close()
+
+
+async def mjpeg_stream(timelapse_id: int) -> AsyncIterator[bytes]:
+    """multipart/x-mixed-replace body: one part per captured frame."""
+    async for frame in _frames.subscribe(timelapse_id):
+        header = (
+            f"--{MJPEG_BOUNDARY}\r\n"
+            f"Content-Type: {frame.media_type}\r\n"
+            f"Content-Length: {len(frame.data)}\r\n\r\n"
+        )
+        yield header.encode() + frame.data + b"\r\n"
+
+
+async def event_stream(timelapse_id: int) -> AsyncIterator[str]:
+    """Server-sent events announcing each new frame (the image itself is fetched by id)."""
+    async for frame in _frames.subscribe(timelapse_id, heartbeat=_SSE_HEARTBEAT_SECONDS):
+        if frame is None:
+            yield ": keep-alive\n\n"
+            continue
+        payload = {
+            "id": frame.frame_id,
+            "timelapse_id": frame.timelapse_id,
+            "file_path": frame.file_path,
+            "captured_at": frame.captured_at.isoformat(),
+        }
+        yield f"event: frame\nid: {frame.frame_id}\ndata: {json.dumps(payload)}\n\n"
@@ -13,9 +13,14 @@ from fastapi.staticfiles import StaticFiles
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 import capture_manager
+import export_governor
+import export_manager
+import export_queue
+import proxy_frames
+import request_timing
+import thinning
 import models  # noqa: F401 — ensures all models are registered with Base.metadata
 from database import SessionLocal, get_db
-from models.export import ExportJob as ExportJobModel, ExportStatus as ExportStatusEnum
 from models.timelapse import Timelapse as TimelapseModel, TimelapseStatus
 from routers import cameras, frames, timelapses, settings, exports, version
 from routers.settings import _ensure_settings_row
@@ -54,6 +59,9 @@ async def lifespan(app: FastAPI):
         capture_manager.scheduler.configure(timezone=settings.timezone)
         capture_manager.scheduler.start()
         logger.info("Scheduler started (timezone: %s)", settings.timezone)
+        thinning.schedule(capture_manager.scheduler)
+        export_queue.schedule(capture_manager.scheduler)
+        export_governor.start(capture_manager.scheduler)
         # Re-start any timelapses that were running when the server last shut down.
         running = db.query(TimelapseModel).filter(
             TimelapseModel.status == TimelapseStatus.running
@@ -70,20 +78,18 @@ async def lifespan(app: FastAPI):
         for t in pending:
             capture_manager.schedule_start(t.id, t.started_at, t.interval_seconds)
         logger.info("Scheduled %d auto-start job(s)", len(pending))
-        # Reset any export jobs that were left in "running" state from a previous session.
-        stuck_exports = db.query(ExportJobModel).filter(
-            ExportJobModel.status == ExportStatusEnum.running
-        ).all()
-        for job in stuck_exports:
-            job.status = ExportStatusEnum.error
-            job.error_message = "Export interrupted by server restart."
-        if stuck_exports:
-            db.commit()
-            logger.warning("Reset %d stuck export job(s) to error", len(stuck_exports))
+        # Exports that were running when the server stopped go back into the queue.
+        requeued = export_queue.requeue_interrupted(db)
+        if requeued:
+            logger.warning("Re-queued %d interrupted export job(s)", requeued)
+        export_queue.dispatch()
     finally:
         db.close()
     yield
     logger.info("Chronicle API shutting down...")
+    export_governor.stop()
+    export_manager.shutdown()
+    proxy_frames.shutdown()
     capture_manager.scheduler.shutdown(wait=False)
 
 
@@ -99,6 +105,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if request_timing.ENABLED:
+    app.add_middleware(request_timing.RequestTimingMiddleware)
+
 app.include_router(cameras.router, prefix="/api/v1")
 app.include_router(timelapses.router, prefix="/api/v1")
 app.include_router(frames.router, prefix="/api/v1")
@@ -0,0 +1,30 @@
+"""frames_autoincrement
+
+Revision ID: 5b1e0c9a7d42
+Revises: 49ebf92f688b
+Create Date: 2026-10-19 11:02:13.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1e0c9a7d42'
+down_revision: Union[str, Sequence[str], None] = '49ebf92f688b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQLite can only switch a table to AUTOINCREMENT by rebuilding it.
+    with op.batch_alter_table('frames', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+        pass
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('frames', recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+        pass
@@ -2,7 +2,8 @@ from models.camera import Camera, ConnectionType
 from models.timelapse import Timelapse, TimelapseStatus
 from models.frame import Frame
 from models.settings import AppSettings, RtspTransport, CaptureImageFormat
-from models.export import ExportJob, ExportStatus
+from models.export import ExportJob, ExportSegment, ExportStatus, IncrementalSegment
+from models.thinning import ThinningRule
 
 from sqlalchemy import func, select
 from sqlalchemy.orm import column_property
@@ -29,4 +30,4 @@ Timelapse.__mapper__.add_property(
 
 __all__ = ["Camera", "ConnectionType", "Timelapse", "TimelapseStatus", "Frame",
            "AppSettings", "RtspTransport", "CaptureImageFormat",
-           "ExportJob", "ExportStatus"]
+           "ExportJob", "ExportSegment", "ExportStatus", "IncrementalSegment", "ThinningRule"]
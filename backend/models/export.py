@@ -1,7 +1,7 @@
 import datetime
 import enum
 
-from sqlalchemy import Enum, ForeignKey, Integer, String, func
+from sqlalchemy import Enum, ForeignKey, Integer, String, Time, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from database import Base, UTCDateTime
@@ -12,6 +12,7 @@ class ExportStatus(str, enum.Enum):
     running   = "running"
     completed = "completed"
     error     = "error"
+    cancelled = "cancelled"
 
 
 class ExportJob(Base):
@@ -28,6 +29,7 @@ class ExportJob(Base):
     smoothing:         Mapped[str | None]               = mapped_column(String, nullable=True)
     stabilization:     Mapped[bool]                     = mapped_column(Integer, nullable=False, default=False, server_default="0")
     denoising:         Mapped[bool]                     = mapped_column(Integer, nullable=False, default=False, server_default="0")
+    deflicker:         Mapped[bool]                     = mapped_column(Integer, nullable=False, default=False, server_default="0")
     color_correction:  Mapped[str | None]               = mapped_column(String, nullable=True)
     brightness:        Mapped[float | None]             = mapped_column(nullable=True)
     contrast:          Mapped[float | None]             = mapped_column(nullable=True)
@@ -37,5 +39,54 @@ class ExportJob(Base):
     output_path:       Mapped[str | None]               = mapped_column(String, nullable=True)
     file_size_bytes:   Mapped[int | None]               = mapped_column(Integer, nullable=True)
     error_message:     Mapped[str | None]               = mapped_column(String, nullable=True)
+    priority:          Mapped[int]                      = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    last_frame_id:     Mapped[int | None]               = mapped_column(Integer, nullable=True)   # frames captured later are not part of the export
+    parallel_segments: Mapped[int]                      = mapped_column(Integer, nullable=False, default=1, server_default="1")
+    speed_profile:     Mapped[str]                      = mapped_column(String, nullable=False, default="balanced", server_default="balanced")   # "fast" | "balanced" | "archival"
+    incremental:       Mapped[bool]                     = mapped_column(Integer, nullable=False, default=False, server_default="0")
+    preview:           Mapped[bool]                     = mapped_column(Integer, nullable=False, default=False, server_default="0")   # sampled low-resolution clip, see export_manager.PREVIEW_FRAMES
+    fingerprint:       Mapped[str | None]               = mapped_column(String, nullable=True, index=True)   # frame set + render parameters, see export_cache
+    # Frame selection, see frame_selection.FrameFilter
+    start_time:        Mapped[datetime.datetime | None] = mapped_column(UTCDateTime, nullable=True)
+    end_time:          Mapped[datetime.datetime | None] = mapped_column(UTCDateTime, nullable=True)
+    daily_start:       Mapped[datetime.time | None]     = mapped_column(Time, nullable=True)
+    daily_end:         Mapped[datetime.time | None]     = mapped_column(Time, nullable=True)
+    every_nth:         Mapped[int | None]               = mapped_column(Integer, nullable=True)
+    sample_interval_seconds: Mapped[int | None]         = mapped_column(Integer, nullable=True)
     created_at:        Mapped[datetime.datetime]        = mapped_column(UTCDateTime, server_default=func.now(), nullable=False)  # pylint: disable=not-callable
     completed_at:      Mapped[datetime.datetime | None] = mapped_column(UTCDateTime, nullable=True)
+
+
+class ExportSegment(Base):
+    """A finished, encoded piece of a segmented export; an interrupted job resumes after these."""
+
+    __tablename__ = "export_segments"
+    __table_args__ = (UniqueConstraint("job_id", "segment_index", name="uq_export_segments_job_segment"),)
+
+    id:             Mapped[int]               = mapped_column(primary_key=True)
+    job_id:         Mapped[int]               = mapped_column(ForeignKey("export_jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    segment_index:  Mapped[int]               = mapped_column(Integer, nullable=False)
+    first_frame_id: Mapped[int]               = mapped_column(Integer, nullable=False)   # ids of the first and last frame the piece
+    last_frame_id:  Mapped[int]               = mapped_column(Integer, nullable=False)   # covers; a changed frame set invalidates it
+    frame_count:    Mapped[int]               = mapped_column(Integer, nullable=False)
+    file_path:      Mapped[str]               = mapped_column(String, nullable=False)
+    completed_at:   Mapped[datetime.datetime] = mapped_column(UTCDateTime, server_default=func.now(), nullable=False)  # pylint: disable=not-callable
+
+
+class IncrementalSegment(Base):
+    """An encoded run of frames kept for later incremental exports with the same render settings.
+
+    Unlike ExportSegment it belongs to the timelapse, not to a job, so it outlives the export
+    that produced it.
+    """
+
+    __tablename__ = "incremental_segments"
+
+    id:             Mapped[int]               = mapped_column(primary_key=True)
+    timelapse_id:   Mapped[int]               = mapped_column(ForeignKey("timelapses.id", ondelete="CASCADE"), nullable=False, index=True)
+    render_key:     Mapped[str]               = mapped_column(String, nullable=False, index=True)   # hash of the job's render settings
+    first_frame_id: Mapped[int]               = mapped_column(Integer, nullable=False)
+    last_frame_id:  Mapped[int]               = mapped_column(Integer, nullable=False)
+    frame_count:    Mapped[int]               = mapped_column(Integer, nullable=False)
+    file_path:      Mapped[str]               = mapped_column(String, nullable=False)
+    created_at:     Mapped[datetime.datetime] = mapped_column(UTCDateTime, server_default=func.now(), nullable=False)  # pylint: disable=not-callable
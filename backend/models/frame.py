@@ -1,6 +1,6 @@
 import datetime
 
-from sqlalchemy import ForeignKey, String, func
+from sqlalchemy import Float, ForeignKey, Index, Integer, String, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from database import Base, UTCDateTime
@@ -8,6 +8,11 @@ from database import Base, UTCDateTime
 
 class Frame(Base):
     __tablename__ = "frames"
+    __table_args__ = (
+        Index("ix_frames_timelapse_id_captured_at", "timelapse_id", "captured_at"),
+        # Never reuse ids: frame image URLs are served as immutable and cached by id.
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     timelapse_id: Mapped[int] = mapped_column(
@@ -17,5 +22,13 @@ class Frame(Base):
     captured_at: Mapped[datetime.datetime] = mapped_column(
         UTCDateTime, server_default=func.now(), nullable=False # pylint: disable=not-callable
     )
+    # Mean channel values (0–255) of the downsampled frame, see exposure.measure_bytes.
+    # NULL until measured: frames added before capture recorded them are measured by the first deflickered export.
+    red_mean: Mapped[float | None] = mapped_column(Float, nullable=True)
+    green_mean: Mapped[float | None] = mapped_column(Float, nullable=True)
+    blue_mean: Mapped[float | None] = mapped_column(Float, nullable=True)
+    # CRC-32 of the file, for the central directory of frame archives. NULL until computed:
+    # frames added before capture recorded it get it from the first archive that reads them.
+    crc32: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
     timelapse: Mapped["Timelapse"] = relationship("Timelapse", back_populates="frames")  # noqa: F821
@@ -33,3 +33,7 @@ class AppSettings(Base):
     default_capture_interval_seconds: Mapped[int] = mapped_column(Integer, nullable=False, default=60)
     max_frames_per_timelapse: Mapped[int | None] = mapped_column(Integer, nullable=True, default=None)
     retention_days: Mapped[int | None] = mapped_column(Integer, nullable=True, default=None)
+    thumbnail_cache_mb: Mapped[int] = mapped_column(Integer, nullable=False, default=1024, server_default="1024")
+    max_concurrent_exports: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
+    proxy_cache_mb: Mapped[int] = mapped_column(Integer, nullable=False, default=4096, server_default="4096")
+    stabilization_cache_mb: Mapped[int] = mapped_column(Integer, nullable=False, default=1024, server_default="1024")
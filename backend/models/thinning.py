@@ -0,0 +1,23 @@
+import datetime
+
+from sqlalchemy import ForeignKey, Integer
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from database import Base, UTCDateTime
+
+
+class ThinningRule(Base):
+    """Keep at most one frame per keep_interval_seconds for frames older than min_age_seconds."""
+
+    __tablename__ = "thinning_rules"
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    timelapse_id: Mapped[int] = mapped_column(
+        ForeignKey("timelapses.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    min_age_seconds: Mapped[int] = mapped_column(Integer, nullable=False)
+    keep_interval_seconds: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Everything captured before this instant has already been thinned by this rule.
+    applied_until: Mapped[datetime.datetime | None] = mapped_column(UTCDateTime, nullable=True)
+
+    timelapse: Mapped["Timelapse"] = relationship("Timelapse", back_populates="thinning_rules")  # noqa: F821
@@ -37,3 +37,6 @@ class Timelapse(Base):
     frames: Mapped[list["Frame"]] = relationship(  # noqa: F821
         "Frame", back_populates="timelapse", cascade="all, delete-orphan"
     )
+    thinning_rules: Mapped[list["ThinningRule"]] = relationship(  # noqa: F821
+        "ThinningRule", back_populates="timelapse", cascade="all, delete-orphan"
+    )
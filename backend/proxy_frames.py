@@ -0,0 +1,240 @@
+"""Export proxies: frames pre-scaled to an export resolution, so later exports skip decoding
+the full-size originals.
+
+Each proxy is a JPEG sized exactly as the scale filter in export_manager would size the
+frame, so FFmpeg passes it through unscaled. Proxies live in a byte-bounded disk cache
+under <storage_path>/proxies/timelapse_<id>/<WxH>/<frame_id>.jpg.
+
+The concat demuxer needs one codec for every input, so an export uses proxies only if
+all its frames have one. If only a few are missing, they are rendered first. Otherwise the
+export reads the originals and the missing proxies are rendered in the background for the
+next export at that resolution.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from array import array
+from typing import Callable, Iterable, Iterator, Optional, Sequence, Set, Tuple
+
+import cv2
+
+from disk_cache import DiskLRUCache
+from frame_selection import FrameList, FramePaths
+
+logger = logging.getLogger(__name__)
+
+PROXY_QUALITY = 95
+# Missing proxies are rendered inline when at most this fraction of the export lacks one.
+_INLINE_FILL_FRACTION = 0.1
+
+_cache = DiskLRUCache("proxies")
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="proxy")
+# (timelapse_id, resolution) pairs with a background fill queued or running.
+_filling: Set[Tuple[int, str]] = set()
+_filling_lock = threading.Lock()
+_stopping = threading.Event()
+
+
+def fit_size(width: int, height: int, target_width: int, target_height: int) -> Tuple[int, int]:
+    """Size FFmpeg's scale=W:H:force_original_aspect_ratio=decrease gives a width x height frame."""
+    scaled_width = min(target_width, _round_half_up(target_height * width, height))
+    scaled_height = min(target_height, _round_half_up(target_width * height, width))
+    return scaled_width, scaled_height
+
+
+def _round_half_up(numerator: int, denominator: int) -> int:
+    # av_rescale rounds to nearest, halves away from zero
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+def _proxy_dir(storage_path: str, timelapse_id: int, resolution: str) -> str:
+    return _cache.path_for(storage_path, f"timelapse_{timelapse_id}", resolution)
+
+
+def _parse_resolution(resolution: str) -> Tuple[int, int]:
+    width, height = resolution.split("x")
+    return int(width), int(height)
+
+
+class _ProxyPaths:
+    """FramePaths of an export's proxies, derived from the frame ids."""
+
+    def __init__(self, directory: str, frame_ids: Sequence[int]) -> None:
+        self._directory = directory
+        self._frame_ids = frame_ids
+
+    def __len__(self) -> int:
+        return len(self._frame_ids)
+
+    def paths(self, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+        for frame_id in self._frame_ids[start:end]:
+            yield os.path.join(self._directory, f"{frame_id}.jpg")
+
+
+@contextmanager
+def export_paths(
+    storage_path: str,
+    timelapse_id: int,
+    frames: FrameList,
+    resolution: Optional[str],
+    max_bytes: int,
+    stopped: Optional[Callable[[], bool]] = None,
+) -> Iterator[FramePaths]:
+    """Yield the frame paths an export should read.
+
+    These are proxies, kept from eviction until the block exits, when every frame has a
+    proxy for `resolution`. Otherwise they are the originals. Rendering, inline or in the
+    background, ends once stopped() returns true.
+    """
+    if not resolution or max_bytes <= 0 or not frames:
+        yield frames
+        return
+    directory = _proxy_dir(storage_path, timelapse_id, resolution)
+    # Pinned before the lookups, so nothing found can be evicted before FFmpeg reads it.
+    with _cache.pinned(directory):
+        if _proxies_ready(storage_path, timelapse_id, frames, resolution, directory, max_bytes, stopped):
+            yield _ProxyPaths(directory, frames.ids)
+        else:
+            yield frames
+
+
+def _proxies_ready(
+    storage_path: str,
+    timelapse_id: int,
+    frames: FrameList,
+    resolution: str,
+    directory: str,
+    max_bytes: int,
+    stopped: Optional[Callable[[], bool]],
+) -> bool:
+    target = _parse_resolution(resolution)
+    _, last_path = next(frames.records(len(frames) - 1))
+    image = cv2.imread(last_path, cv2.IMREAD_COLOR)  # pylint: disable=no-member
+    if image is None:
+        return False
+    height, width = image.shape[:2]
+    size = fit_size(width, height, *target)
+    if size == (width, height):
+        return False  # not a downscale: proxies would only add a JPEG generation
+    estimate = len(frames) * len(_encode(image, size))
+    if estimate > max_bytes:
+        # The set would evict itself while being rendered and never be complete.
+        logger.info(
+            "Not using %s proxies for %d frames of timelapse %d: about %d MB, over the %d MB cache",
+            resolution, len(frames), timelapse_id, estimate // (1024 * 1024), max_bytes // (1024 * 1024),
+        )
+        return False
+
+    limit = len(frames) * _INLINE_FILL_FRACTION
+    missing = array("q")
+    for index, frame_id in enumerate(frames.ids):
+        if not _cache.lookup(os.path.join(directory, f"{frame_id}.jpg")):
+            missing.append(index)
+            if len(missing) > limit:
+                _fill_in_background(storage_path, timelapse_id, frames.copy(), resolution, max_bytes, stopped)
+                return False
+    if not missing:
+        return True
+    wanted = iter(missing)
+    next_index = next(wanted)
+    for index, (frame_id, file_path) in enumerate(frames.records(missing[0], missing[-1] + 1), missing[0]):
+        if index != next_index:
+            continue
+        if stopped is not None and stopped():
+            return False
+        if not _render(file_path, os.path.join(directory, f"{frame_id}.jpg"), target, max_bytes):
+            return False
+        next_index = next(wanted, None)
+    logger.info("Rendered %d missing %s proxies for timelapse %d", len(missing), resolution, timelapse_id)
+    return True
+
+
+def _fill_in_background(
+    storage_path: str,
+    timelapse_id: int,
+    frames: FrameList,
+    resolution: str,
+    max_bytes: int,
+    stopped: Optional[Callable[[], bool]],
+) -> None:
+    """Render the proxies frames lack on the proxy worker; takes ownership of frames."""
+    key = (timelapse_id, resolution)
+    with _filling_lock:
+        if key in _filling:
+            frames.close()
+            return
+        _filling.add(key)
+    logger.info("Queued %s proxies for %d frames of timelapse %d", resolution, len(frames), timelapse_id)
+    _executor.submit(_fill, storage_path, timelapse_id, frames, resolution, max_bytes, stopped)
+
+
+def _fill(
+    storage_path: str,
+    timelapse_id: int,
+    frames: FrameList,
+    resolution: str,
+    max_bytes: int,
+    stopped: Optional[Callable[[], bool]],
+) -> None:
+    try:
+        target = _parse_resolution(resolution)
+        directory = _proxy_dir(storage_path, timelapse_id, resolution)
+        rendered = 0
+        for frame_id, file_path in frames.records():
+            if _stopping.is_set() or (stopped is not None and stopped()):
+                logger.info("Stopped rendering %s proxies for timelapse %d", resolution, timelapse_id)
+                return
+            path = os.path.join(directory, f"{frame_id}.jpg")
+            if not _cache.lookup(path) and _render(file_path, path, target, max_bytes):
+                rendered += 1
+        logger.info("Rendered %d %s proxies for timelapse %d", rendered, resolution, timelapse_id)
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.exception("Proxy rendering failed for timelapse %d: %s", timelapse_id, exc)
+    finally:
+        frames.close()
+        with _filling_lock:
+            _filling.discard((timelapse_id, resolution))
+
+
+def _render(source_path: str, path: str, target: Tuple[int, int], max_bytes: int) -> bool:
+    image = cv2.imread(source_path, cv2.IMREAD_COLOR)  # pylint: disable=no-member
+    if image is None:
+        logger.warning("Could not decode %s for an export proxy", source_path)
+        return False
+    height, width = image.shape[:2]
+    data = _encode(image, fit_size(width, height, *target))
+    if not data:
+        return False
+    _cache.store(path, data, max_bytes)
+    return True
+
+
+def _encode(image, size: Tuple[int, int]) -> bytes:
+    """The proxy JPEG of a decoded frame, or b"" if encoding fails."""
+    if size != (image.shape[1], image.shape[0]):
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)  # pylint: disable=no-member
+    ok, buf = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, PROXY_QUALITY])  # pylint: disable=no-member
+    return buf.tobytes() if ok else b""
+
+
+def remove_frames(storage_path: str, timelapse_id: int, frame_ids: Iterable[int]) -> None:
+    root = _cache.path_for(storage_path, f"timelapse_{timelapse_id}")
+    if not os.path.isdir(root):
+        return
+    frame_ids = list(frame_ids)
+    for resolution in os.listdir(root):
+        directory = os.path.join(root, resolution)
+        _cache.remove(os.path.join(directory, f"{frame_id}.jpg") for frame_id in frame_ids)
+
+
+def remove_timelapse(storage_path: str, timelapse_id: int) -> None:
+    _cache.remove_tree(storage_path, f"timelapse_{timelapse_id}")
+
+
+def shutdown() -> None:
+    """Stop background proxy rendering so it does not hold up process exit."""
+    _stopping.set()
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,89 @@
+"""Opt-in per-request timing of the API: total time, time in the database, SQL statement
+count and the slowest statement.
+
+Enabled with REQUEST_TIMING=1. Every /api request is then logged with those figures and
+answered with a Server-Timing header (db, app and total durations in ms), which browser
+developer tools show next to the request. Statements slower than SLOW_QUERY_MS are logged
+with their query plan by the engine hooks in database.py, whatever runs them.
+
+The header is sent with the response headers, so for streamed responses it covers the time
+until the body starts; the log line covers the whole response.
+"""
+
+import logging
+import re
+import time
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import database
+from database import QueryStats
+
+logger = logging.getLogger(__name__)
+
+ENABLED = database.QUERY_TIMING
+_STATEMENT_LOG_CHARS = 200
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _server_timing(stats: QueryStats, seconds: float) -> str:
+    db_ms = stats.seconds * 1000
+    total_ms = seconds * 1000
+    return (
+        f'db;dur={db_ms:.1f};desc="{_statements(stats.count)}", '
+        f"app;dur={max(total_ms - db_ms, 0.0):.1f}, "
+        f"total;dur={total_ms:.1f}"
+    )
+
+
+def _statements(count: int) -> str:
+    return f"{count} statement" if count == 1 else f"{count} statements"
+
+
+def _shorten(statement: Optional[str]) -> str:
+    statement = _WHITESPACE.sub(" ", statement or "").strip()
+    if len(statement) > _STATEMENT_LOG_CHARS:
+        return statement[:_STATEMENT_LOG_CHARS] + "…"
+    return statement
+
+
+class RequestTimingMiddleware:
+    """ASGI middleware measuring every /api request, see the module docstring."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = database.query_stats.set(stats)
+        started = time.perf_counter()
+        status: Optional[int] = None
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", _server_timing(stats, time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            database.query_stats.reset(token)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            slowest = (
+                f", slowest {stats.slowest_seconds * 1000:.1f} ms: {_shorten(stats.slowest_statement)}"
+                if stats.count else ""
+            )
+            logger.info(
+                "%s %s %s %.1f ms, db %.1f ms in %s%s",
+                scope["method"], scope["path"], status or "-", elapsed_ms,
+                stats.seconds * 1000, _statements(stats.count), slowest,
+            )
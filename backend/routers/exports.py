@@ -1,22 +1,32 @@
+import asyncio
 import datetime
 import logging
 import os
+from typing import Optional
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+import export_cache
 import export_manager
+import export_progress
+import export_queue
+import frame_selection
 from database import get_db
+from file_serving import file_response
 from models.export import ExportJob, ExportStatus
-from models.frame import Frame
 from models.settings import AppSettings
 from models.timelapse import Timelapse
-from schemas.export import ExportJobResponse, ExportRequest
+from schemas.export import ExportJobResponse, ExportRequest, FrameSelectionResponse
 
 router = APIRouter(prefix="/exports", tags=["exports"])
 logger = logging.getLogger(__name__)
 
+# Finished previews kept per timelapse; older ones are deleted when a new one is requested.
+PREVIEWS_KEPT = 5
+
 
 @router.post(
     "/timelapses/{timelapse_id}",
@@ -26,60 +36,136 @@ logger = logging.getLogger(__name__)
 def start_export(
     timelapse_id: int,
     payload: ExportRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
 ):
     timelapse = db.get(Timelapse, timelapse_id)
     if timelapse is None:
         raise HTTPException(status_code=404, detail="Timelapse not found")
 
-    frames = (
-        db.query(Frame)
-        .filter(Frame.timelapse_id == timelapse_id)
-        .order_by(Frame.captured_at.asc())
-        .all()
-    )
-    if not frames:
-        raise HTTPException(status_code=422, detail="Timelapse has no frames to export")
-
     settings = db.get(AppSettings, 1)
     storage_path = settings.storage_path if settings else "./data"
+    selection = _frame_selection(db, timelapse_id, payload, settings)
 
-    timestamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S")
-    filename = f"timelapse_{timelapse_id}_{timestamp}.{payload.output_format}"
-    output_path = os.path.join(storage_path, "exports", filename)
-
-    job = ExportJob(
-        timelapse_id=timelapse_id,
-        status=ExportStatus.pending,
-        output_format=payload.output_format,
-        output_fps=payload.output_fps,
-        resolution=payload.resolution,
-        custom_resolution=payload.custom_resolution,
-        crf=payload.crf,
-        smoothing=payload.smoothing,
-        stabilization=payload.stabilization,
-        denoising=payload.denoising,
-        color_correction=payload.color_correction,
-        brightness=payload.brightness,
-        contrast=payload.contrast,
-        saturation=payload.saturation,
-        total_frames=len(frames),
-        frames_done=0,
-        output_path=output_path,
-    )
-    db.add(job)
-    db.commit()
-    db.refresh(job)
+    with export_cache.request_lock:
+        frames = export_cache.frame_set(db, selection)
+        frame_count, last_frame_id, _ = frames
+        if not frame_count:
+            raise HTTPException(status_code=422, detail="No frames match the export's frame selection")
+
+        fingerprint = export_cache.fingerprint(timelapse_id, frames, payload)
+        match = export_cache.find_match(db, fingerprint)
+        if match is not None and match.status != ExportStatus.completed:
+            # Same frames and settings already queued or encoding: share that job.
+            match.priority = max(match.priority, payload.priority)
+            db.commit()
+            logger.info("Export request for timelapse %d joined identical job %d", timelapse_id, match.id)
+            return _job_response(db, match)
+
+        job = ExportJob(
+            timelapse_id=timelapse_id,
+            status=ExportStatus.pending,
+            output_format="mp4" if payload.preview else payload.output_format,
+            output_fps=payload.output_fps,
+            resolution=payload.resolution,
+            custom_resolution=payload.custom_resolution,
+            crf=payload.crf,
+            smoothing=payload.smoothing,
+            stabilization=payload.stabilization,
+            denoising=payload.denoising,
+            deflicker=payload.deflicker,
+            color_correction=payload.color_correction,
+            brightness=payload.brightness,
+            contrast=payload.contrast,
+            saturation=payload.saturation,
+            total_frames=min(frame_count, export_manager.PREVIEW_FRAMES) if payload.preview else frame_count,
+            frames_done=0,
+            priority=payload.priority,
+            parallel_segments=payload.parallel_segments,
+            speed_profile=payload.speed_profile,
+            incremental=payload.incremental,
+            preview=payload.preview,
+            last_frame_id=last_frame_id,
+            fingerprint=fingerprint,
+            start_time=payload.start_time,
+            end_time=payload.end_time,
+            daily_start=payload.daily_start,
+            daily_end=payload.daily_end,
+            every_nth=payload.every_nth,
+            sample_interval_seconds=payload.sample_interval_seconds,
+        )
+        db.add(job)
+        db.flush()
+        # Queued jobs can be created within the same second, so the id keeps names unique.
+        timestamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S")
+        kind = "preview" if payload.preview else "timelapse"
+        filename = f"{kind}_{timelapse_id}_{timestamp}_{job.id}.{job.output_format}"
+        job.output_path = os.path.join(storage_path, "exports", filename)
+        reused = match is not None and export_cache.reuse_output(job, match)
+        db.commit()
+
+    if payload.preview:
+        _prune_previews(db, timelapse_id)
+    if reused:
+        return _job_response(db, job)
 
     logger.info(
-        "Queued export job %d for timelapse %d (%d frames, %s %s)",
-        job.id, timelapse_id, len(frames), payload.resolution, payload.output_format,
+        "Queued %s job %d for timelapse %d (%d frames, %s %s, priority %d)",
+        "preview" if payload.preview else "export",
+        job.id, timelapse_id, job.total_frames, payload.resolution, job.output_format, payload.priority,
     )
-    frame_paths = [f.file_path for f in frames]
-    background_tasks.add_task(export_manager.start_export, job.id, frame_paths, output_path)
+    export_queue.dispatch()
+    return _job_response(db, job)
+
+
+@router.post("/timelapses/{timelapse_id}/selection", response_model=FrameSelectionResponse)
+def count_selected_frames(
+    timelapse_id: int,
+    payload: ExportRequest,
+    db: Session = Depends(get_db),
+):
+    """Number of frames an export with these options would render, for duration estimates."""
+    if db.get(Timelapse, timelapse_id) is None:
+        raise HTTPException(status_code=404, detail="Timelapse not found")
+    selection = _frame_selection(db, timelapse_id, payload, db.get(AppSettings, 1))
+    frame_count, _, _ = export_cache.frame_set(db, selection)
+    return FrameSelectionResponse(frame_count=frame_count)
+
+
+def _frame_selection(db: Session, timelapse_id: int, payload: ExportRequest, settings: Optional[AppSettings]):
+    frame_filter = frame_selection.FrameFilter.of(payload, settings.timezone if settings else "UTC")
+    return frame_selection.select_frames(db, timelapse_id, frame_filter)
+
+
+def _prune_previews(db: Session, timelapse_id: int) -> None:
+    finished = db.scalars(
+        select(ExportJob)
+        .where(
+            ExportJob.timelapse_id == timelapse_id,
+            ExportJob.preview == True,  # noqa: E712
+            ExportJob.status.not_in((ExportStatus.pending, ExportStatus.running)),
+        )
+        .order_by(ExportJob.id.desc())
+        .offset(PREVIEWS_KEPT)
+    ).all()
+    for job in finished:
+        _remove_export(db, job)
+    if finished:
+        db.commit()
+        logger.info("Removed %d old preview(s) of timelapse %d", len(finished), timelapse_id)
+
+
+def _remove_export(db: Session, job: ExportJob) -> None:
+    if job.output_path and os.path.isfile(job.output_path):
+        logger.info("Removed export file %s", job.output_path)
+        os.remove(job.output_path)
+    export_manager.remove_checkpoints(job)
+    export_progress.clear(job.id)
+    db.delete(job)
 
-    return ExportJobResponse.from_job(job)
+
+def _job_response(db: Session, job: ExportJob) -> ExportJobResponse:
+    db.refresh(job)
+    return ExportJobResponse.from_job(job, queue_position=export_queue.queue_positions(db).get(job.id))
 
 
 @router.get("/{job_id}/status", response_model=ExportJobResponse)
@@ -94,7 +180,22 @@ def get_export_status(job_id: int, db: Session = Depends(get_db)):
         if live is not None:
             frames_done_override = live
 
-    return ExportJobResponse.from_job(job, frames_done_override)
+    return ExportJobResponse.from_job(
+        job, frames_done_override, export_queue.queue_positions(db).get(job_id)
+    )
+
+
+@router.get("/{job_id}/events")
+async def stream_export_progress(job_id: int):
+    """Server-sent "progress" events (frames, fps, speed, ETA) until the export finishes."""
+    if not await asyncio.to_thread(export_progress.ensure_seeded, job_id):
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return StreamingResponse(
+        export_progress.event_stream(job_id),
+        media_type="text/event-stream",
+        # Stop nginx and intermediaries from buffering the stream.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/{job_id}/download")
@@ -109,14 +210,36 @@ def download_export(job_id: int, db: Session = Depends(get_db)):
 
     media_type = "video/webm" if job.output_format == "webm" else "video/mp4"
     filename = os.path.basename(job.output_path)
-    return FileResponse(
-        path=job.output_path,
+    settings = db.get(AppSettings, 1)
+    return file_response(
+        job.output_path,
+        storage_path=settings.storage_path if settings else None,
         media_type=media_type,
         filename=filename,
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 
+@router.post("/{job_id}/cancel", response_model=ExportJobResponse)
+def cancel_export(job_id: int, db: Session = Depends(get_db)):
+    job = db.get(ExportJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job.status not in (ExportStatus.pending, ExportStatus.running):
+        raise HTTPException(status_code=409, detail="Export has already finished")
+
+    if not export_queue.cancel_pending(db, job_id) and not export_manager.cancel(job_id):
+        # Marked running but not running in this process; nothing left to stop.
+        job.status = ExportStatus.cancelled
+        db.commit()
+    logger.info("Cancelled export job %d", job_id)
+
+    db.refresh(job)
+    if job.status == ExportStatus.cancelled:
+        # A running job publishes its own cancellation once FFmpeg has stopped.
+        export_progress.publish_job(job)
+    return ExportJobResponse.from_job(job)
+
+
 @router.delete("/{job_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_export(job_id: int, db: Session = Depends(get_db)):
     job = db.get(ExportJob, job_id)
@@ -124,11 +247,8 @@ def delete_export(job_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Export job not found")
     if job.status == ExportStatus.running:
         raise HTTPException(status_code=409, detail="Cannot delete a running export")
-    if job.output_path and os.path.isfile(job.output_path):
-        logger.info("Removed export file %s", job.output_path)
-        os.remove(job.output_path)
+    _remove_export(db, job)
     logger.info("Deleted export job %d", job_id)
-    db.delete(job)
     db.commit()
 
 
@@ -139,4 +259,5 @@ def list_exports_for_timelapse(timelapse_id: int, db: Session = Depends(get_db))
         raise HTTPException(status_code=404, detail="Timelapse not found")
 
     jobs = db.query(ExportJob).filter(ExportJob.timelapse_id == timelapse_id).order_by(ExportJob.created_at.desc()).all()
-    return [ExportJobResponse.from_job(job) for job in jobs]
+    positions = export_queue.queue_positions(db)
+    return [ExportJobResponse.from_job(job, queue_position=positions.get(job.id)) for job in jobs]
@@ -1,17 +1,47 @@
 import os
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 
+import proxy_frames
+import thumbnails
+from capture import _FORMAT_EXT
 from database import get_db
+from file_serving import file_response
 from models.frame import Frame as FrameModel
+from models.settings import AppSettings as AppSettingsModel
+from models.settings import CaptureImageFormat
 from models.timelapse import Timelapse as TimelapseModel
+from routers.settings import get_settings
 from schemas.frame import Frame, FrameCreate, FrameListResponse, FrameUpdate
 
 router = APIRouter(prefix="/frames", tags=["frames"])
 
+# Frame files are never rewritten after capture, update_frame refuses to point a frame at
+# another file and ids are never reused, so any response for a given URL can be cached forever.
+_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _frame_etag(frame: FrameModel, *variant: object) -> str:
+    stamp = int(frame.captured_at.timestamp() * 1_000_000)
+    return '"' + "-".join([f"f{frame.id}", str(stamp), *map(str, variant)]) + '"'
+
+
+def _stored_format(frame: FrameModel) -> Optional[str]:
+    """Image format of the frame's file, from its extension; None if it is not one we encode."""
+    ext = os.path.splitext(frame.file_path)[1].lstrip(".").lower()
+    if ext == "jpeg":
+        return "jpeg"
+    return next((fmt for fmt, fmt_ext in _FORMAT_EXT.items() if fmt_ext == ext), None)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
 
 @router.get("", response_model=FrameListResponse)
 def list_frames(
@@ -30,13 +60,71 @@ def list_frames(
     return FrameListResponse(frames=frames, total=total, offset=offset, limit=limit)
 
 @router.get("/{frame_id}/image")
-def get_frame_image(frame_id: int, db: Session = Depends(get_db)):
+def get_frame_image(
+    frame_id: int,
+    size: Optional[int] = Query(None, description="Thumbnail width in pixels"),
+    image_format: Optional[CaptureImageFormat] = Query(
+        None,
+        alias="format",
+        description="Transcode to this format (defaults to webp for thumbnails, else the stored format)",
+    ),
+    quality: Optional[int] = Query(None, ge=1, le=100, description="Encoder quality for webp/jpeg"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    settings: AppSettingsModel = Depends(get_settings),
+):
+    if size is not None and size not in thumbnails.THUMBNAIL_SIZES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"size must be one of {', '.join(map(str, thumbnails.THUMBNAIL_SIZES))}",
+        )
     frame = db.get(FrameModel, frame_id)
     if frame is None:
         raise HTTPException(status_code=404, detail="Frame not found")
+
+    variant = None
+    if size is not None or image_format is not None or quality is not None:
+        if image_format is not None:
+            target_format = image_format.value
+        elif size is None:
+            # Quality only: re-encode in the format the client already gets for this frame.
+            target_format = _stored_format(frame) or "webp"
+        else:
+            target_format = "webp"
+        variant = thumbnails.Variant(
+            size=size,
+            image_format=target_format,
+            quality=quality if quality is not None else thumbnails.DEFAULT_QUALITY,
+        )
+        if variant.size is None and quality is None and _stored_format(frame) == variant.image_format:
+            variant = None  # already in the requested format: serve the original untouched
+
+    etag_variant = ("orig",) if variant is None else (variant.size or "full", variant.image_format, variant.quality)
+    cache_headers = {"ETag": _frame_etag(frame, *etag_variant), "Cache-Control": _IMMUTABLE_CACHE_CONTROL}
+    if _etag_matches(if_none_match, cache_headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+    if variant is not None:
+        data = thumbnails.cached_bytes(frame.timelapse_id, frame.id, variant)
+        if data is not None:
+            return Response(content=data, media_type=variant.media_type, headers=cache_headers)
     if not os.path.isfile(frame.file_path):
         raise HTTPException(status_code=404, detail="Frame image file not found on disk")
-    return FileResponse(frame.file_path)
+    if variant is None:
+        return file_response(frame.file_path, storage_path=settings.storage_path, headers=cache_headers)
+    try:
+        path = thumbnails.get_variant(
+            settings.storage_path,
+            frame.timelapse_id,
+            frame.id,
+            frame.file_path,
+            variant,
+            settings.thumbnail_cache_mb * 1024 * 1024,
+        )
+    except thumbnails.ThumbnailError as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+    return file_response(
+        path, storage_path=settings.storage_path, media_type=variant.media_type, headers=cache_headers
+    )
 
 
 @router.get("/{frame_id}", response_model=Frame)
@@ -66,6 +154,12 @@ def update_frame(frame_id: int, payload: FrameUpdate, db: Session = Depends(get_
     frame = db.get(FrameModel, frame_id)
     if frame is None:
         raise HTTPException(status_code=404, detail="Frame not found")
+    # Frame images are served as immutable, so the file behind a frame id never changes.
+    if payload.file_path is not None and payload.file_path != frame.file_path:
+        raise HTTPException(
+            status_code=409,
+            detail="The file of a captured frame cannot be changed; delete the frame and create a new one",
+        )
     for field, value in payload.model_dump(exclude_unset=True).items():
         setattr(frame, field, value)
     db.commit()
@@ -74,11 +168,17 @@ def update_frame(frame_id: int, payload: FrameUpdate, db: Session = Depends(get_
 
 
 @router.delete("/{frame_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_frame(frame_id: int, db: Session = Depends(get_db)):
+def delete_frame(
+    frame_id: int,
+    db: Session = Depends(get_db),
+    settings: AppSettingsModel = Depends(get_settings),
+):
     frame = db.get(FrameModel, frame_id)
     if frame is None:
         raise HTTPException(status_code=404, detail="Frame not found")
     if frame.file_path and os.path.isfile(frame.file_path):
         os.remove(frame.file_path)
+    thumbnails.remove_frames(settings.storage_path, frame.timelapse_id, [frame.id])
+    proxy_frames.remove_frames(settings.storage_path, frame.timelapse_id, [frame.id])
     db.delete(frame)
     db.commit()
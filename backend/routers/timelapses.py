@@ -1,16 +1,30 @@
+import asyncio
 import datetime
 import logging
-from typing import List, Optional
+import re
+from typing import Iterator, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import RedirectResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
+import capture_gaps
 import capture_manager as cm
+import frame_archive
+import live_preview
+import sprites
+import thinning
 from cleanup import delete_timelapse_files
 from database import get_db
+from file_serving import file_response
 from models.camera import Camera as CameraModel
+from models.settings import AppSettings as AppSettingsModel
+from models.thinning import ThinningRule as ThinningRuleModel
 from models.timelapse import Timelapse as TimelapseModel, TimelapseStatus
-from schemas.timelapse import Timelapse, TimelapseCreate, TimelapseUpdate
+from routers.settings import get_settings
+from schemas.sprite import SpriteGeometry
+from schemas.thinning import ThinningRule, ThinningRuleCreate, ThinningRunResult
+from schemas.timelapse import CaptureGapReport, Timelapse, TimelapseCreate, TimelapseUpdate
 
 router = APIRouter(prefix="/timelapses", tags=["timelapses"])
 logger = logging.getLogger(__name__)
@@ -96,6 +110,232 @@ def delete_timelapse(timelapse_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Timelapse not found")
     logger.info("Deleting timelapse %d (%s)", timelapse_id, timelapse.name)
     cm.stop(timelapse_id)
+    live_preview.clear(timelapse_id)
     delete_timelapse_files(timelapse_id, db)
     db.delete(timelapse)
     db.commit()
+
+
+@router.get("/{timelapse_id}/thinning", response_model=List[ThinningRule])
+def list_thinning_rules(timelapse_id: int, db: Session = Depends(get_db)):
+    timelapse = db.get(TimelapseModel, timelapse_id)
+    if timelapse is None:
+        raise HTTPException(status_code=404, detail="Timelapse not found")
+    return sorted(timelapse.thinning_rules, key=lambda r: r.min_age_seconds)
+
+
+@router.put("/{timelapse_id}/thinning", response_model=List[ThinningRule])
+def replace_thinning_rules(
+    timelapse_id: int, payload: List[ThinningRuleCreate], db: Session = Depends(get_db)
+):
+    timelapse = db.get(TimelapseModel, timelapse_id)
+    if timelapse is None:
+        raise HTTPException(status_code=404, detail="Timelapse not found")
+    ages = [r.min_age_seconds for r in payload]
+    if len(set(ages)) != len(ages):
+        raise HTTPException(status_code=422, detail="Each thinning rule needs a distinct min_age_seconds")
+    # Replacing the rules resets their progress so the next pass re-evaluates all old frames.
+    timelapse.thinning_rules = [ThinningRuleModel(**r.model_dump()) for r in payload]
+    db.commit()
+    db.refresh(timelapse)
+    logger.info("Timelapse %d now has %d thinning rule(s)", timelapse_id, len(payload))
+    return sorted(timelapse.thinning_rules, key=lambda r: r.min_age_seconds)
+
+
+@router.post("/{timelapse_id}/thinning/run", response_model=ThinningRunResult)
+def run_thinning(timelapse_id: int, db: Session = Depends(get_db)):
+    if db.get(TimelapseModel, timelapse_id) is None:
+        raise HTTPException(status_code=404, detail="Timelapse not found")
+    return ThinningRunResult(frames_deleted=thinning.thin_timelapse(timelapse_id, db))
+
+
+@router.get("/{timelapse_id}/gaps", response_model=CaptureGapReport)
+def get_capture_gaps(
+    timelapse_id: int,
+    factor: float = Query(1.5, gt=1.0, le=1000.0),
+    start: Optional[datetime.datetime] = Query(None),
+    end: Optional[datetime.datetime] = Query(None),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db),
+):
+    """Missed captures: gaps longer than `factor` capture intervals, and the achieved capture rate."""
+    timelapse = db.get(TimelapseModel, timelapse_id)
+    if timelapse is None:
+        raise HTTPException(status_code=404, detail="Timelapse not found")
+    # Naive values are UTC, as UTCDateTime stores them.
+    start, end = (
+        value.replace(tzinfo=datetime.timezone.utc) if value and value.tzinfo is None else value
+        for value in (start, end)
+    )
+    if start and end and start >= end:
+        raise HTTPException(status_code=422, detail="start must be before end")
+    return capture_gaps.report(db, timelapse, factor, start, end, limit)
+
+
+def _load_sprite(
+    timelapse_id: int,
+    count: int,
+    tile_width: int,
+    start: Optional[datetime.datetime],
+    end: Optional[datetime.datetime],
+    db: Session,
+    settings: AppSettingsModel,
+) -> sprites.Sprite:
+    if db.get(TimelapseModel, timelapse_id) is None:
+        raise HTTPException(status_code=404, detail="Timelapse not found")
+    try:
+        return sprites.get_sprite(
+            db, settings.storage_path, timelapse_id, count, tile_width, start, end,
+            settings.thumbnail_cache_mb * 1024 * 1024,
+        )
+    except sprites.SpriteError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+
+
+@router.get("/{timelapse_id}/sprite")
+def get_sprite_image(
+    timelapse_id: int,
+    count: int = Query(100, ge=1, le=400),
+    tile_width: int = Query(160, ge=32, le=640),
+    start: Optional[datetime.datetime] = Query(None),
+    end: Optional[datetime.datetime] = Query(None),
+    version: Optional[str] = Query(
+        None, pattern=r"^\d+_\d+$", description="The version of a geometry response, pinning the image to its tiles"
+    ),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    settings: AppSettingsModel = Depends(get_settings),
+):
+    """Evenly sampled frames tiled into one image; see /sprite/geometry for tile positions.
+
+    Clients scrubbing a running timelapse should pass the version of the geometry they
+    map tiles with, so both describe the same frames.
+    """
+    if version is None:
+        sprite = _load_sprite(timelapse_id, count, tile_width, start, end, db, settings)
+        # The URL stays the same as frames are appended, so clients must revalidate.
+        headers = {"ETag": sprite.etag, "Cache-Control": "no-cache"}
+    else:
+        sprite = sprites.get_sprite_version(
+            settings.storage_path, timelapse_id, count, tile_width, start, end, version
+        )
+        if sprite is None:
+            raise HTTPException(
+                status_code=404, detail="This sprite version has been replaced; fetch the geometry again"
+            )
+        headers = {"ETag": sprite.etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if if_none_match and sprite.etag in [c.strip() for c in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return file_response(
+        sprite.image_path, storage_path=settings.storage_path, media_type=sprites.SPRITE_MEDIA_TYPE, headers=headers
+    )
+
+
+@router.get("/{timelapse_id}/sprite/geometry", response_model=SpriteGeometry)
+def get_sprite_geometry(
+    timelapse_id: int,
+    count: int = Query(100, ge=1, le=400),
+    tile_width: int = Query(160, ge=32, le=640),
+    start: Optional[datetime.datetime] = Query(None),
+    end: Optional[datetime.datetime] = Query(None),
+    db: Session = Depends(get_db),
+    settings: AppSettingsModel = Depends(get_settings),
+):
+    return _load_sprite(timelapse_id, count, tile_width, start, end, db, settings).geometry
+
+
+# Streaming headers: stop nginx and intermediaries from buffering live updates.
+_LIVE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+@router.get("/{timelapse_id}/live")
+async def stream_live_frames(timelapse_id: int):
+    """MJPEG-style multipart stream that pushes every newly captured frame (usable as an <img> src)."""
+    if not await asyncio.to_thread(live_preview.ensure_seeded, timelapse_id):
+        raise HTTPException(status_code=404, detail="Timelapse not found")
+    return StreamingResponse(
+        live_preview.mjpeg_stream(timelapse_id),
+        media_type=f"multipart/x-mixed-replace; boundary={live_preview.MJPEG_BOUNDARY}",
+        headers=_LIVE_HEADERS,
+    )
+
+
+@router.get("/{timelapse_id}/live/events")
+async def stream_live_events(timelapse_id: int):
+    """Server-sent events with the id and timestamp of every newly captured frame."""
+    if not await asyncio.to_thread(live_preview.ensure_seeded, timelapse_id):
+        raise HTTPException(status_code=404, detail="Timelapse not found")
+    return StreamingResponse(
+        live_preview.event_stream(timelapse_id),
+        media_type="text/event-stream",
+        headers=_LIVE_HEADERS,
+    )
+
+
+_RANGE_RE = re.compile(r"^bytes=(\d+)-(\d*)$")
+
+
+def _take(chunks: Iterator[bytes], length: int) -> Iterator[bytes]:
+    for chunk in chunks:
+        if length <= 0:
+            break
+        yield chunk[:length]
+        length -= len(chunk)
+
+
+@router.get("/{timelapse_id}/archive")
+def download_frame_archive(
+    timelapse_id: int,
+    request: Request,
+    start: Optional[datetime.datetime] = Query(None),
+    end: Optional[datetime.datetime] = Query(None),
+    max_frame_id: Optional[int] = Query(None, description="Pins the frame set; filled in by redirect"),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """Stream the raw frames of a timelapse (optionally a time range) as a stored ZIP.
+
+    The first request is redirected to a URL pinned to the newest frame id, so frames
+    captured later cannot change the archive and interrupted downloads can resume
+    with a Range request.
+    """
+    if db.get(TimelapseModel, timelapse_id) is None:
+        raise HTTPException(status_code=404, detail="Timelapse not found")
+    try:
+        plan = frame_archive.plan_archive(timelapse_id, start, end, max_frame_id)
+    except frame_archive.ArchiveError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    if max_frame_id is None:
+        pinned = request.url.include_query_params(max_frame_id=plan.max_frame_id)
+        return RedirectResponse(str(pinned), status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+
+    filename = f"timelapse_{timelapse_id}_frames.zip"
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": plan.etag,
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+    first, last = 0, plan.total_size - 1
+    match = _RANGE_RE.match(range_header or "")
+    if match and (if_range is None or if_range == plan.etag):
+        first = int(match.group(1))
+        if match.group(2):
+            last = min(int(match.group(2)), last)
+        if first > last:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={"Content-Range": f"bytes */{plan.total_size}"},
+            )
+        headers["Content-Range"] = f"bytes {first}-{last}/{plan.total_size}"
+    headers["Content-Length"] = str(last - first + 1)
+    logger.info(
+        "Streaming %d frame(s) of timelapse %d as ZIP (bytes %d-%d of %d)",
+        plan.entry_count, timelapse_id, first, last, plan.total_size,
+    )
+    return StreamingResponse(
+        _take(frame_archive.stream_archive(plan, first), last - first + 1),
+        status_code=status.HTTP_206_PARTIAL_CONTENT if "Content-Range" in headers else status.HTTP_200_OK,
+        media_type="application/zip",
+        headers=headers,
+    )
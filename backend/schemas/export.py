@@ -7,6 +7,7 @@ from pydantic import BaseModel, Field, model_validator
 
 OutputFormat = Literal["webm", "mp4"]
 Resolution   = Literal["original", "1920x1080", "1280x720", "640x360", "custom"]
+SpeedProfile = Literal["fast", "balanced", "archival"]
 
 
 class ExportRequest(BaseModel):
@@ -19,10 +20,23 @@ class ExportRequest(BaseModel):
     target_duration:   Optional[float] = None  # informational; FPS already computed client-side
     stabilization:     bool = False
     denoising:         bool = False
+    deflicker:         bool = False   # smooth frame-to-frame exposure changes using the colour statistics taken at capture
     color_correction:  Optional[Literal["auto", "manual"]] = None
     brightness:        Optional[float] = Field(default=None, ge=-1.0, le=1.0)
     contrast:          Optional[float] = Field(default=None, ge=0.5, le=2.0)
     saturation:        Optional[float] = Field(default=None, ge=0.0, le=2.0)
+    priority:          int          = Field(default=0, ge=-100, le=100)  # higher runs first
+    parallel_segments: int          = Field(default=1, ge=0, le=64)      # >1 encodes time slices in parallel, 0 = one per CPU core
+    speed_profile:     SpeedProfile = "balanced"                         # encoder speed vs. size trade-off
+    incremental:       bool = False   # reuse pieces encoded by earlier incremental exports, encode only newer frames
+    preview:           bool = False   # short, low-resolution sampled clip on the preview lane (always mp4)
+    # Frame selection. The daily window is wall-clock time in the configured timezone.
+    start_time:        Optional[datetime.datetime] = None   # captured at or after
+    end_time:          Optional[datetime.datetime] = None   # captured before
+    daily_start:       Optional[datetime.time]     = None   # e.g. 10:00 with daily_end 14:00; may wrap midnight
+    daily_end:         Optional[datetime.time]     = None
+    every_nth:         Optional[int] = Field(default=None, ge=1)               # keep every Nth selected frame
+    sample_interval_seconds: Optional[int] = Field(default=None, ge=1)         # keep the first frame of each interval
 
     @model_validator(mode="after")
     def validate_custom_resolution(self) -> "ExportRequest":
@@ -33,6 +47,24 @@ class ExportRequest(BaseModel):
             missing = [f for f in ("brightness", "contrast", "saturation") if getattr(self, f) is None]
             if missing:
                 raise ValueError(f"color_correction='manual' requires: {', '.join(missing)}")
+        if self.start_time and self.end_time and self.start_time >= self.end_time:
+            raise ValueError("start_time must be before end_time")
+        if (self.daily_start is None) != (self.daily_end is None):
+            raise ValueError("daily_start and daily_end must be given together")
+        if self.daily_start is not None and self.daily_start == self.daily_end:
+            raise ValueError("daily_start and daily_end must differ")
+        if self.every_nth and self.sample_interval_seconds:
+            raise ValueError("every_nth and sample_interval_seconds cannot be combined")
+        if self.preview and self.incremental:
+            raise ValueError("a preview cannot be incremental")
+        if self.incremental:
+            # Separately encoded pieces only join seamlessly if no filter carries state across frames.
+            temporal = [f for f in ("smoothing", "stabilization", "denoising", "deflicker") if getattr(self, f)]
+            if temporal:
+                raise ValueError(
+                    f"incremental export cannot be combined with {', '.join(temporal)}: "
+                    "these filters depend on neighbouring frames"
+                )
         return self
 
 
@@ -55,13 +87,31 @@ class ExportJobResponse(BaseModel):
     smoothing:        Optional[str]   = None
     stabilization:    bool            = False
     denoising:        bool            = False
+    deflicker:        bool            = False
     color_correction: Optional[str]   = None
     brightness:       Optional[float] = None
     contrast:         Optional[float] = None
     saturation:       Optional[float] = None
+    priority:         int             = 0
+    parallel_segments: int            = 1
+    speed_profile:    SpeedProfile    = "balanced"
+    incremental:      bool            = False
+    preview:          bool            = False
+    start_time:       Optional[datetime.datetime] = None
+    end_time:         Optional[datetime.datetime] = None
+    daily_start:      Optional[datetime.time]     = None
+    daily_end:        Optional[datetime.time]     = None
+    every_nth:        Optional[int]   = None
+    sample_interval_seconds: Optional[int] = None
+    queue_position:   Optional[int]   = None   # 1-based, only while pending
 
     @classmethod
-    def from_job(cls, job, frames_done_override: Optional[int] = None) -> "ExportJobResponse":
+    def from_job(
+        cls,
+        job,
+        frames_done_override: Optional[int] = None,
+        queue_position: Optional[int] = None,
+    ) -> "ExportJobResponse":
         frames_done = frames_done_override if frames_done_override is not None else job.frames_done
         total = job.total_frames or 1
         progress_pct = round(frames_done / total * 100, 1)
@@ -85,8 +135,25 @@ class ExportJobResponse(BaseModel):
             smoothing=job.smoothing,
             stabilization=job.stabilization,
             denoising=job.denoising,
+            deflicker=job.deflicker,
             color_correction=job.color_correction,
             brightness=job.brightness,
             contrast=job.contrast,
             saturation=job.saturation,
+            priority=job.priority,
+            parallel_segments=job.parallel_segments,
+            speed_profile=job.speed_profile,
+            incremental=job.incremental,
+            preview=job.preview,
+            start_time=job.start_time,
+            end_time=job.end_time,
+            daily_start=job.daily_start,
+            daily_end=job.daily_end,
+            every_nth=job.every_nth,
+            sample_interval_seconds=job.sample_interval_seconds,
+            queue_position=queue_position,
         )
+
+
+class FrameSelectionResponse(BaseModel):
+    frame_count: int   # frames an export with these selection options would render
@@ -17,6 +17,10 @@ class AppSettingsBase(BaseModel):
     default_capture_interval_seconds: Annotated[int, Field(gt=0)] = 60
     max_frames_per_timelapse: Optional[Annotated[int, Field(gt=0)]] = None
     retention_days: Optional[Annotated[int, Field(gt=0)]] = None
+    thumbnail_cache_mb: Annotated[int, Field(gt=0)] = 1024
+    max_concurrent_exports: Annotated[int, Field(ge=1, le=32)] = 1
+    proxy_cache_mb: Annotated[int, Field(ge=0)] = 4096   # 0 disables export proxies
+    stabilization_cache_mb: Annotated[int, Field(gt=0)] = 1024
 
     @field_validator("timezone")
     @classmethod
@@ -46,6 +50,10 @@ class AppSettingsUpdate(BaseModel):
     default_capture_interval_seconds: Optional[Annotated[int, Field(gt=0)]] = None
     max_frames_per_timelapse: Optional[Annotated[int, Field(gt=0)]] = None
     retention_days: Optional[Annotated[int, Field(gt=0)]] = None
+    thumbnail_cache_mb: Optional[Annotated[int, Field(gt=0)]] = None
+    max_concurrent_exports: Optional[Annotated[int, Field(ge=1, le=32)]] = None
+    proxy_cache_mb: Optional[Annotated[int, Field(ge=0)]] = None
+    stabilization_cache_mb: Optional[Annotated[int, Field(gt=0)]] = None
 
     @field_validator("timezone")
     @classmethod
@@ -0,0 +1,23 @@
+import datetime
+
+from pydantic import BaseModel
+
+
+class SpriteTile(BaseModel):
+    frame_id: int
+    captured_at: datetime.datetime
+    x: int
+    y: int
+
+
+class SpriteGeometry(BaseModel):
+    timelapse_id: int
+    version: str                  # pins /sprite?version=… to exactly these tiles
+    count: int
+    columns: int
+    rows: int
+    tile_width: int
+    tile_height: int
+    width: int
+    height: int
+    tiles: list[SpriteTile]
@@ -0,0 +1,25 @@
+import datetime
+from typing import Annotated, Optional
+
+from pydantic import BaseModel, Field
+
+
+class ThinningRuleBase(BaseModel):
+    min_age_seconds: Annotated[int, Field(gt=0)]
+    keep_interval_seconds: Annotated[int, Field(gt=0)]
+
+
+class ThinningRuleCreate(ThinningRuleBase):
+    pass
+
+
+class ThinningRule(ThinningRuleBase):
+    id: int
+    timelapse_id: int
+    applied_until: Optional[datetime.datetime] = None
+
+    model_config = {"from_attributes": True}
+
+
+class ThinningRunResult(BaseModel):
+    frames_deleted: int
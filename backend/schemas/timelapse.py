@@ -35,3 +35,33 @@ class Timelapse(TimelapseBase):
     size_bytes: int = 0
 
     model_config = {"from_attributes": True}
+
+
+class CaptureGap(BaseModel):
+    start: datetime.datetime                 # last frame before the gap
+    end: Optional[datetime.datetime] = None  # first frame after it; None while ongoing
+    duration_seconds: float
+    missed_frames: int
+    ongoing: bool = False
+
+    model_config = {"from_attributes": True}
+
+
+class CaptureGapReport(BaseModel):
+    timelapse_id: int
+    interval_seconds: int
+    factor: float                            # gaps are longer than factor × the expected interval
+    frame_count: int
+    first_captured_at: Optional[datetime.datetime] = None
+    last_captured_at: Optional[datetime.datetime] = None
+    expected_frames: int
+    achieved_ratio: Optional[float] = None   # frame_count / expected_frames
+    achieved_interval_seconds: Optional[float] = None
+    gap_count: int
+    missed_frames: int
+    gap_seconds: float
+    longest_gap: Optional[CaptureGap] = None
+    gaps: list[CaptureGap]                   # chronological, at most `limit`
+    gaps_truncated: bool = False
+
+    model_config = {"from_attributes": True}
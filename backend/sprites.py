@@ -0,0 +1,249 @@
+"""Contact sheets of evenly sampled frames for timeline scrubbing, cached per sampling parameters."""
+
+import datetime
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+import cv2
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import thumbnails
+from disk_cache import DiskLRUCache
+from models.frame import Frame
+
+logger = logging.getLogger(__name__)
+
+SPRITE_MEDIA_TYPE = "image/webp"
+_SPRITE_QUALITY = 75
+_MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+_cache = DiskLRUCache("sprites")
+# One lock per sprite so concurrent scrubbers of the same range render it once, with the
+# number of requests holding or waiting for it; dropped when that reaches zero.
+_build_locks: Dict[str, list] = {}
+_build_locks_guard = threading.Lock()
+
+
+class SpriteError(RuntimeError):
+    pass
+
+
+@dataclass
+class Sprite:
+    image_path: str
+    geometry: dict
+    etag: str
+
+
+def get_sprite(
+    db: Session,
+    storage_path: str,
+    timelapse_id: int,
+    count: int,
+    tile_width: int,
+    start: Optional[datetime.datetime],
+    end: Optional[datetime.datetime],
+    thumbnail_max_bytes: int,
+) -> Sprite:
+    """Return the cached sprite for these parameters, rendering it if frames changed since."""
+    filters = [Frame.timelapse_id == timelapse_id]
+    if start is not None:
+        filters.append(Frame.captured_at >= start)
+    if end is not None:
+        filters.append(Frame.captured_at <= end)
+
+    total, last_id = db.execute(
+        select(func.count(Frame.id), func.max(Frame.id)).where(*filters)  # pylint: disable=not-callable
+    ).one()
+    if not total:
+        raise SpriteError("No frames in the requested range")
+
+    param_key = _param_key(count, tile_width, start, end)
+    # Appending (or thinning) frames changes total/last_id, which naturally invalidates the entry.
+    version = f"{last_id}_{total}"
+    stem = _stem(storage_path, timelapse_id, param_key, version)
+    image_path, geometry_path = f"{stem}.webp", f"{stem}.json"
+    etag = _etag(timelapse_id, param_key, version)
+
+    with _locked(stem):
+        cached = _cached(stem, etag)
+        if cached is not None:
+            return cached
+
+        frames = _sample_frames(db, filters, total, count)
+        image, geometry = _render(
+            frames, storage_path, timelapse_id, tile_width, thumbnail_max_bytes
+        )
+        ok, buf = cv2.imencode(  # pylint: disable=no-member
+            ".webp", image, [cv2.IMWRITE_WEBP_QUALITY, _SPRITE_QUALITY]  # pylint: disable=no-member
+        )
+        if not ok:
+            raise SpriteError("Failed to encode sprite sheet")
+        geometry["timelapse_id"] = timelapse_id
+        geometry["version"] = version
+        _remove_stale(os.path.dirname(stem), param_key, version)
+        _cache.store(image_path, buf.tobytes(), _MAX_CACHE_BYTES)
+        _cache.store(geometry_path, json.dumps(geometry).encode(), _MAX_CACHE_BYTES)
+        logger.debug("Rendered %d-tile sprite for timelapse %d", len(frames), timelapse_id)
+        return Sprite(image_path, geometry, etag)
+
+
+def get_sprite_version(
+    storage_path: str,
+    timelapse_id: int,
+    count: int,
+    tile_width: int,
+    start: Optional[datetime.datetime],
+    end: Optional[datetime.datetime],
+    version: str,
+) -> Optional[Sprite]:
+    """The sprite of a version named in an earlier geometry, or None once it has been replaced."""
+    param_key = _param_key(count, tile_width, start, end)
+    stem = _stem(storage_path, timelapse_id, param_key, version)
+    with _locked(stem):
+        return _cached(stem, _etag(timelapse_id, param_key, version))
+
+
+def _param_key(
+    count: int, tile_width: int, start: Optional[datetime.datetime], end: Optional[datetime.datetime]
+) -> str:
+    params = f"{start.isoformat() if start else ''}|{end.isoformat() if end else ''}|{count}|{tile_width}"
+    return hashlib.sha1(params.encode()).hexdigest()[:16]
+
+
+def _stem(storage_path: str, timelapse_id: int, param_key: str, version: str) -> str:
+    return _cache.path_for(storage_path, f"timelapse_{timelapse_id}", f"{param_key}_{version}")
+
+
+def _etag(timelapse_id: int, param_key: str, version: str) -> str:
+    return f'"s{timelapse_id}-{param_key}-{version}"'
+
+
+def _cached(stem: str, etag: str) -> Optional[Sprite]:
+    image_path, geometry_path = f"{stem}.webp", f"{stem}.json"
+    if not (_cache.lookup(image_path) and _cache.lookup(geometry_path)):
+        return None
+    with open(geometry_path, encoding="utf-8") as fh:
+        geometry = json.load(fh)
+    return Sprite(image_path, geometry, etag)
+
+
+def remove_timelapse(storage_path: str, timelapse_id: int) -> None:
+    _cache.remove_tree(storage_path, f"timelapse_{timelapse_id}")
+
+
+@contextmanager
+def _locked(key: str) -> Iterator[None]:
+    with _build_locks_guard:
+        entry = _build_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _build_locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _build_locks[key]
+
+
+def _remove_stale(directory: str, param_key: str, version: str) -> None:
+    if not os.path.isdir(directory):
+        return
+    current = f"{param_key}_{version}."
+    stale = [
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.startswith(f"{param_key}_") and not name.startswith(current)
+    ]
+    _cache.remove(stale)
+
+
+def _sample_frames(db: Session, filters: list, total: int, count: int) -> List[tuple]:
+    """Pick `count` evenly spaced frames (by position) using a row_number() window."""
+    if count >= total:
+        positions = list(range(1, total + 1))
+    elif count == 1:
+        positions = [1]
+    else:
+        positions = sorted({round(i * (total - 1) / (count - 1)) + 1 for i in range(count)})
+    ranked = (
+        select(
+            Frame.id,
+            Frame.captured_at,
+            Frame.file_path,
+            func.row_number().over(order_by=(Frame.captured_at, Frame.id)).label("rn"),
+        )
+        .where(*filters)
+        .subquery()
+    )
+    return db.execute(
+        select(ranked.c.id, ranked.c.captured_at, ranked.c.file_path)
+        .where(ranked.c.rn.in_(positions))
+        .order_by(ranked.c.rn)
+    ).all()
+
+
+def _render(
+    frames: List[tuple],
+    storage_path: str,
+    timelapse_id: int,
+    tile_width: int,
+    thumbnail_max_bytes: int,
+) -> tuple:
+    # Tiles come from the thumbnail cache, so scrubbing also warms the frame browser.
+    source_size = next((s for s in thumbnails.THUMBNAIL_SIZES if s >= tile_width), thumbnails.THUMBNAIL_SIZES[-1])
+    futures = [
+        thumbnails.request_variant(
+            storage_path, timelapse_id, frame_id, file_path, thumbnails.Variant(source_size), thumbnail_max_bytes
+        )
+        for frame_id, _, file_path in frames
+    ]
+
+    tiles: List[Optional[np.ndarray]] = []
+    for future in futures:
+        try:
+            tiles.append(cv2.imread(future.result(), cv2.IMREAD_COLOR))  # pylint: disable=no-member
+        except thumbnails.ThumbnailError as exc:
+            logger.warning("Skipping sprite tile: %s", exc)
+            tiles.append(None)
+
+    first = next((t for t in tiles if t is not None), None)
+    if first is None:
+        raise SpriteError("None of the sampled frames could be decoded")
+    tile_height = max(1, round(first.shape[0] * tile_width / first.shape[1]))
+    columns = max(1, min(len(frames), round(math.sqrt(len(frames) * tile_height / tile_width)) or 1))
+    rows = math.ceil(len(frames) / columns)
+
+    sheet = np.zeros((rows * tile_height, columns * tile_width, 3), dtype=np.uint8)
+    geometry_tiles = []
+    for index, ((frame_id, captured_at, _), tile) in enumerate(zip(frames, tiles)):
+        x, y = (index % columns) * tile_width, (index // columns) * tile_height
+        if tile is not None:
+            sheet[y:y + tile_height, x:x + tile_width] = cv2.resize(  # pylint: disable=no-member
+                tile, (tile_width, tile_height), interpolation=cv2.INTER_AREA  # pylint: disable=no-member
+            )
+        geometry_tiles.append(
+            {"frame_id": frame_id, "captured_at": captured_at.isoformat(), "x": x, "y": y}
+        )
+
+    geometry = {
+        "count": len(frames),
+        "columns": columns,
+        "rows": rows,
+        "tile_width": tile_width,
+        "tile_height": tile_height,
+        "width": columns * tile_width,
+        "height": rows * tile_height,
+        "tiles": geometry_tiles,
+    }
+    return sheet, geometry
@@ -0,0 +1,272 @@
+"""Two-pass vid.stab stabilisation, with the motion analysis kept per timelapse.
+
+vidstabdetect measures how each frame moved against the one before it. The measurements
+are stored under <storage_path>/stabilization/timelapse_<id>/, keyed by the pair of frame
+ids they were taken between, so later exports over the same frames skip the analysis
+whatever their resolution, CRF or colour settings, and an export that reaches newer frames
+only analyses those. Frames are analysed at most ANALYSIS_WIDTH wide, and the measured
+pixel values are scaled to the export's frame size when a transforms file is written.
+
+The transform pass smooths the camera path with a gaussian of ±SMOOTHING frames, so a
+segment of a split export decoded with that many extra frames on each side comes out as
+it would in one piece.
+"""
+
+import functools
+import gzip
+import hashlib
+import logging
+import os
+import re
+import subprocess
+import tempfile
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import cv2
+
+from disk_cache import DiskLRUCache
+from frame_selection import FrameList
+from proxy_frames import fit_size
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_WIDTH = 960
+SMOOTHING = 15
+# Frames are analysed by one FFmpeg process per this many, each stored as one cache file,
+# so a cancelled export keeps what it has analysed so far.
+_CHUNK_FRAMES = 1000
+_NO_MOTION = "List 0 []"
+# (LM vx vy fx fy fsize contrast match): the five leading values are pixels.
+_LOCAL_MOTION = re.compile(r"\(LM (-?\d+) (-?\d+) (-?\d+) (-?\d+) (-?\d+) ")
+_FRAME_LINE = re.compile(r"Frame (\d+) \((.*)\)$")
+
+_cache = DiskLRUCache("stabilization")
+
+
+@functools.lru_cache(maxsize=1)
+def available() -> bool:
+    """Whether the installed FFmpeg was built with libvidstab."""
+    try:
+        result = subprocess.run(["ffmpeg", "-hide_banner", "-filters"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return "vidstabdetect" in result.stdout and "vidstabtransform" in result.stdout
+
+
+def filter_path(path: str) -> str:
+    """A file path as a filter option value inside -vf."""
+    return "'" + os.path.abspath(path).replace("\\", "/").replace(":", "\\:") + "'"
+
+
+def transform_filter(trf_path: str) -> str:
+    # A gaussian path filter and no automatic zoom only look at nearby frames, so the
+    # pieces of a segmented export match.
+    return (
+        f"vidstabtransform=input={filter_path(trf_path)}:smoothing={SMOOTHING}"
+        ":optalgo=gauss:optzoom=0:crop=keep"
+    )
+
+
+class Transforms:
+    """The measured motion of every frame of one export, in output order.
+
+    Spooled to a temporary file; segments write their transforms files from it.
+    """
+
+    def __init__(self, frame_count: int) -> None:
+        self._offsets = array("q", [-1]) * frame_count
+        fd, self._spool = tempfile.mkstemp(prefix="chronicle_motions_", suffix=".txt")
+        self._fh = os.fdopen(fd, "w+b")
+
+    def __enter__(self) -> "Transforms":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _add(self, position: int, size: str, motion: str) -> None:
+        self._offsets[position] = self._fh.tell()
+        self._fh.write(f"{size} {motion}\n".encode("utf-8"))
+
+    def _missing(self) -> Iterator[int]:
+        # Position 0 has no predecessor and never needs analysis.
+        return (position for position in range(1, len(self._offsets)) if self._offsets[position] < 0)
+
+    def _finish(self) -> None:
+        self._fh.close()
+
+    def write_trf(self, start: int, end: int, resolution: Optional[str]) -> str:
+        """Write the transforms file for frames start … end-1 scaled to `resolution`; caller deletes it."""
+        target = tuple(int(v) for v in resolution.split("x")) if resolution else None
+        fd, path = tempfile.mkstemp(prefix="chronicle_transforms_", suffix=".trf")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as out, open(self._spool, "rb") as spool:
+                out.write("VID.STAB 1\n")
+                for number, position in enumerate(range(start, end), 1):
+                    motion = _NO_MOTION
+                    if self._offsets[position] >= 0:
+                        spool.seek(self._offsets[position])
+                        width, height, analysed_width, motion = (
+                            spool.readline().decode("utf-8").rstrip("\n").split(" ", 3)
+                        )
+                        width, height = int(width), int(height)
+                        scaled_width = fit_size(width, height, *target)[0] if target else width
+                        motion = _scale(motion, scaled_width / int(analysed_width))
+                    out.write(f"Frame {number} ({motion})\n")
+        except Exception:
+            os.unlink(path)
+            raise
+        return path
+
+    def close(self) -> None:
+        if not self._fh.closed:
+            self._fh.close()
+        try:
+            os.unlink(self._spool)
+        except FileNotFoundError:
+            pass
+
+
+def _scale(motion: str, factor: float) -> str:
+    if factor == 1:
+        return motion
+    return _LOCAL_MOTION.sub(
+        lambda m: "(LM " + " ".join(str(round(int(value) * factor)) for value in m.groups()) + " ",
+        motion,
+    )
+
+
+def _timelapse_dir(storage_path: str, timelapse_id: int) -> str:
+    return _cache.path_for(storage_path, f"timelapse_{timelapse_id}")
+
+
+def analyse(
+    storage_path: str,
+    timelapse_id: int,
+    frames: FrameList,
+    max_bytes: int,
+    detect: Callable[[Iterable[str], str], None],
+) -> Transforms:
+    """Collect the motion of every frame pair of an export, analysing the pairs not yet stored.
+
+    detect(frame_paths, video_filter) runs FFmpeg over the given frames with the filter.
+    The caller closes the returned Transforms.
+    """
+    transforms = Transforms(len(frames))
+    try:
+        directory = _timelapse_dir(storage_path, timelapse_id)
+        with _cache.pinned(directory):
+            _read_stored(directory, frames, transforms)
+            missing = list(transforms._missing())
+            if missing:
+                logger.info(
+                    "Analysing motion of %d of %d frames of timelapse %d",
+                    len(missing), len(frames), timelapse_id,
+                )
+            for start, end in _chunks(missing):
+                _detect_chunk(directory, frames, start, end, transforms, max_bytes, detect)
+        transforms._finish()
+        return transforms
+    except BaseException:
+        transforms.close()
+        raise
+
+
+def _read_stored(directory: str, frames: FrameList, transforms: Transforms) -> None:
+    if not os.path.isdir(directory) or len(frames) < 2:
+        return
+    ids = frames.ids
+    lowest, highest = min(ids), max(ids)
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        try:
+            low, high = (int(v) for v in name.split("_")[:2])
+        except ValueError:
+            continue
+        if high < lowest or low > highest or not _cache.lookup(path):
+            continue
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as fh:
+                size = fh.readline()[2:].rstrip("\n")
+                pairs = [line.rstrip("\n").split(" ", 2) for line in fh]
+            prev_ids = [int(prev_id) for prev_id, _, _ in pairs]
+            positions = frames.positions([int(frame_id) for _, frame_id, _ in pairs])
+        except (OSError, EOFError, ValueError) as exc:
+            logger.warning("Ignoring unreadable stabilisation data %s: %s", path, exc)
+            continue
+        for prev_id, position, (_, _, motion) in zip(prev_ids, positions.tolist(), pairs):
+            # Only the pair the export has: the frame after the same predecessor.
+            if position > 0 and ids[position - 1] == prev_id and transforms._offsets[position] < 0:
+                transforms._add(position, size, motion)
+
+
+def _chunks(positions: List[int]) -> Iterator[Tuple[int, int]]:
+    """Split the positions into runs of consecutive ones, at most _CHUNK_FRAMES long: (start, end)."""
+    i = 0
+    while i < len(positions):
+        start = positions[i]
+        j = i
+        while j + 1 < len(positions) and positions[j + 1] == positions[j] + 1 and j + 1 - i < _CHUNK_FRAMES:
+            j += 1
+        yield start, positions[j] + 1
+        i = j + 1
+
+
+def _detect_chunk(
+    directory: str,
+    frames: FrameList,
+    start: int,
+    end: int,
+    transforms: Transforms,
+    max_bytes: int,
+    detect: Callable[[Iterable[str], str], None],
+) -> None:
+    """Analyse frames start … end-1 against their predecessors and store the result."""
+    _, first_path = next(frames.records(start - 1))
+    image = cv2.imread(first_path, cv2.IMREAD_COLOR)  # pylint: disable=no-member
+    if image is None:
+        logger.warning("Could not decode %s for motion analysis", first_path)
+        return
+    height, width = image.shape[:2]
+    size = f"{width} {height} {min(width, ANALYSIS_WIDTH)}"
+
+    fd, result_path = tempfile.mkstemp(prefix="chronicle_detect_", suffix=".trf")
+    os.close(fd)
+    try:
+        detect(
+            frames.paths(start - 1, end),
+            f"scale=w='min(iw,{ANALYSIS_WIDTH})':h=-2,"
+            f"vidstabdetect=fileformat=ascii:result={filter_path(result_path)}",
+        )
+        with open(result_path, encoding="utf-8") as fh:
+            measured = _parse_trf(fh)
+    finally:
+        os.unlink(result_path)
+
+    ids = frames.ids
+    lines = [f"# {size}\n"]
+    for position in range(start, end):
+        # Frame 1 of the analysis is the predecessor of `start`.
+        motion = measured.get(position - start + 2, _NO_MOTION)
+        transforms._add(position, size, motion)
+        lines.append(f"{ids[position - 1]} {ids[position]} {motion}\n")
+
+    pairs = ids[start - 1:end]
+    digest = hashlib.sha1(pairs.tobytes()).hexdigest()[:12]
+    path = os.path.join(directory, f"{min(pairs)}_{max(pairs)}_{digest}.trf.gz")
+    _cache.store(path, gzip.compress("".join(lines).encode("utf-8"), compresslevel=6), max_bytes)
+
+
+def _parse_trf(lines: Iterable[str]) -> Dict[int, str]:
+    """{frame number: "List n [...]"} of an ASCII vidstabdetect result."""
+    measured = {}
+    for line in lines:
+        match = _FRAME_LINE.match(line.rstrip("\n"))
+        if match:
+            measured[int(match.group(1))] = match.group(2)
+    return measured
+
+
+def remove_timelapse(storage_path: str, timelapse_id: int) -> None:
+    _cache.remove_tree(storage_path, f"timelapse_{timelapse_id}")
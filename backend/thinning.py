@@ -0,0 +1,129 @@
+"""Tiered frame thinning: keeps full density for recent frames and progressively fewer for older ones."""
+
+import asyncio
+import datetime
+import logging
+from typing import Optional
+
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.orm import Session
+
+from cleanup import remove_frames
+from database import SessionLocal
+from models.frame import Frame
+from models.thinning import ThinningRule
+
+logger = logging.getLogger(__name__)
+
+THINNING_JOB_ID = "frame_thinning"
+THINNING_INTERVAL_MINUTES = 15
+# Each pass covers this many keep-intervals, so a first run over months of
+# backlog is split into short transactions and resumes where it left off.
+_WINDOW_BUCKETS = 256
+
+
+def schedule(scheduler) -> None:
+    """Register the periodic thinning job on the capture scheduler."""
+    scheduler.add_job(
+        _thinning_job,
+        trigger=IntervalTrigger(minutes=THINNING_INTERVAL_MINUTES),
+        id=THINNING_JOB_ID,
+        replace_existing=True,
+        coalesce=True,
+    )
+
+
+async def _thinning_job() -> None:
+    try:
+        await asyncio.to_thread(run_all)
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.exception("Unexpected error during frame thinning: %s", exc)
+
+
+def run_all() -> int:
+    """Apply every timelapse's thinning rules. Returns the number of frames deleted."""
+    db = SessionLocal()
+    try:
+        timelapse_ids = db.scalars(select(ThinningRule.timelapse_id).distinct()).all()
+        return sum(thin_timelapse(timelapse_id, db) for timelapse_id in timelapse_ids)
+    finally:
+        db.close()
+
+
+def thin_timelapse(timelapse_id: int, db: Session, now: Optional[datetime.datetime] = None) -> int:
+    """Apply all rules for one timelapse incrementally. Returns the number of frames deleted."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    rules = (
+        db.query(ThinningRule)
+        .filter(ThinningRule.timelapse_id == timelapse_id)
+        .order_by(ThinningRule.min_age_seconds.asc())
+        .all()
+    )
+    deleted = 0
+    for rule in rules:
+        deleted += _apply_rule(rule, db, now)
+    if deleted:
+        logger.info("Thinned %d frame(s) from timelapse %d", deleted, timelapse_id)
+    return deleted
+
+
+def _align(ts: datetime.datetime, interval: int) -> datetime.datetime:
+    epoch = int(ts.timestamp())
+    return datetime.datetime.fromtimestamp(epoch - epoch % interval, datetime.timezone.utc)
+
+
+def _apply_rule(rule: ThinningRule, db: Session, now: datetime.datetime) -> int:
+    interval = rule.keep_interval_seconds
+    # Only thin whole buckets, so the first frame kept in a bucket never changes.
+    cutoff = _align(now - datetime.timedelta(seconds=rule.min_age_seconds), interval)
+
+    if rule.applied_until is not None:
+        window_start = _align(rule.applied_until, interval)
+    else:
+        first = db.scalar(
+            select(func.min(Frame.captured_at)).where(Frame.timelapse_id == rule.timelapse_id)
+        )
+        if first is None:
+            return 0
+        window_start = _align(first, interval)
+
+    deleted = 0
+    step = datetime.timedelta(seconds=interval * _WINDOW_BUCKETS)
+    while window_start < cutoff:
+        window_end = min(window_start + step, cutoff)
+        surplus = _surplus_frames(rule.timelapse_id, interval, window_start, window_end, db)
+        remove_frames(rule.timelapse_id, surplus, db)
+        rule.applied_until = window_end
+        db.commit()
+        deleted += len(surplus)
+        window_start = window_end
+    return deleted
+
+
+def _surplus_frames(
+    timelapse_id: int,
+    interval: int,
+    start: datetime.datetime,
+    end: datetime.datetime,
+    db: Session,
+) -> list[tuple[int, str]]:
+    """Every frame in [start, end) except the earliest one of each interval-sized bucket."""
+    bucket = cast(func.strftime("%s", Frame.captured_at), Integer) // interval
+    ranked = (
+        select(
+            Frame.id,
+            Frame.file_path,
+            func.row_number().over(
+                partition_by=bucket, order_by=(Frame.captured_at, Frame.id)
+            ).label("rn"),
+        )
+        .where(
+            Frame.timelapse_id == timelapse_id,
+            Frame.captured_at >= start,
+            Frame.captured_at < end,
+        )
+        .subquery()
+    )
+    rows = db.execute(select(ranked.c.id, ranked.c.file_path).where(ranked.c.rn > 1)).all()
+    return [(r[0], r[1]) for r in rows]
@@ -0,0 +1,221 @@
+"""Resized and transcoded frame variants, rendered on a small worker pool.
+
+Variants are kept in a byte-bounded disk cache, and recently rendered ones also in a
+byte-bounded in-memory LRU. Concurrent requests for the same variant share one render.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from capture import _FORMAT_EXT, _FORMAT_MEDIA_TYPE
+from disk_cache import DiskLRUCache
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES = (160, 320, 640, 1280)
+# Size pre-rendered at capture time; matches the frame explorer grid tiles.
+CAPTURE_WARM_SIZE = 320
+DEFAULT_QUALITY = 80
+_MAX_WORKERS = 2
+_MEMORY_CACHE_BYTES = 64 * 1024 * 1024
+
+_cache = DiskLRUCache("thumbnails")
+_executor = ThreadPoolExecutor(max_workers=_MAX_WORKERS, thread_name_prefix="thumbnail")
+# Cache path → pending render, so concurrent requests for one variant decode it once.
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+class ThumbnailError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class Variant:
+    """Target width (None keeps the original size), output format and encoder quality."""
+
+    size: Optional[int] = None
+    image_format: str = "webp"
+    quality: int = DEFAULT_QUALITY
+
+    @property
+    def media_type(self) -> str:
+        return _FORMAT_MEDIA_TYPE[self.image_format]
+
+    @property
+    def file_name(self) -> str:
+        # PNG is lossless, so quality does not change the output.
+        quality = "" if self.image_format == "png" else f"_q{self.quality}"
+        return f"{self.size or 'full'}{quality}.{_FORMAT_EXT[self.image_format]}"
+
+    def encode_params(self) -> list:
+        if self.image_format == "jpeg":
+            return [cv2.IMWRITE_JPEG_QUALITY, self.quality]  # pylint: disable=no-member
+        if self.image_format == "webp":
+            return [cv2.IMWRITE_WEBP_QUALITY, self.quality]  # pylint: disable=no-member
+        return []
+
+
+_MemoryKey = Tuple[int, int, Variant]
+
+
+class _MemoryLRU:
+    """Byte-bounded LRU of encoded variants keyed by (timelapse_id, frame_id, variant)."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[_MemoryKey, bytes]" = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: _MemoryKey) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key: _MemoryKey, data: bytes) -> None:
+        if len(data) > self._max_bytes // 8:
+            return  # one full-size PNG should not flush every thumbnail
+        with self._lock:
+            old = self._entries.pop(key, None)
+            self._total += len(data) - (len(old) if old is not None else 0)
+            self._entries[key] = data
+            while self._total > self._max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._total -= len(evicted)
+
+    def discard(self, match: Callable[[_MemoryKey], bool]) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if match(k)]:
+                self._total -= len(self._entries.pop(key))
+
+
+_memory = _MemoryLRU(_MEMORY_CACHE_BYTES)
+
+
+def _variant_path(storage_path: str, timelapse_id: int, frame_id: int, variant: Variant) -> str:
+    return _cache.path_for(storage_path, f"timelapse_{timelapse_id}", str(frame_id), variant.file_name)
+
+
+def cached_bytes(timelapse_id: int, frame_id: int, variant: Variant) -> Optional[bytes]:
+    """Return the encoded variant if it is in the in-memory cache."""
+    return _memory.get((timelapse_id, frame_id, variant))
+
+
+def get_variant(
+    storage_path: str,
+    timelapse_id: int,
+    frame_id: int,
+    source_path: str,
+    variant: Variant,
+    max_bytes: int,
+) -> str:
+    """Return the path of a cached variant, rendering it first if needed. Blocks until ready."""
+    return request_variant(storage_path, timelapse_id, frame_id, source_path, variant, max_bytes).result()
+
+
+def request_variant(
+    storage_path: str,
+    timelapse_id: int,
+    frame_id: int,
+    source_path: str,
+    variant: Variant,
+    max_bytes: int,
+) -> Future:
+    """Like get_variant, but returns a Future so callers can queue many renders at once."""
+    path = _variant_path(storage_path, timelapse_id, frame_id, variant)
+    if _cache.lookup(path):
+        done: Future = Future()
+        done.set_result(path)
+        return done
+    key = (timelapse_id, frame_id, variant)
+    return _submit(path, key, lambda: _read_image(source_path), variant, max_bytes)
+
+
+def warm_from_bytes(
+    storage_path: str,
+    timelapse_id: int,
+    frame_id: int,
+    data: bytes,
+    max_bytes: int,
+) -> None:
+    """Queue a render of the grid-size thumbnail from freshly captured bytes (non-blocking)."""
+    variant = Variant(CAPTURE_WARM_SIZE)
+    path = _variant_path(storage_path, timelapse_id, frame_id, variant)
+    future = _submit(path, (timelapse_id, frame_id, variant), lambda: _decode_image(data), variant, max_bytes)
+    future.add_done_callback(_log_failure)
+
+
+def remove_frames(storage_path: str, timelapse_id: int, frame_ids: Iterable[int]) -> None:
+    frame_ids = set(frame_ids)
+    _memory.discard(lambda key: key[0] == timelapse_id and key[1] in frame_ids)
+    _cache.remove_subtrees(storage_path, f"timelapse_{timelapse_id}", map(str, frame_ids))
+
+
+def remove_timelapse(storage_path: str, timelapse_id: int) -> None:
+    _memory.discard(lambda key: key[0] == timelapse_id)
+    _cache.remove_tree(storage_path, f"timelapse_{timelapse_id}")
+
+
+def _submit(path: str, key: _MemoryKey, load, variant: Variant, max_bytes: int) -> Future:
+    with _inflight_lock:
+        future = _inflight.get(path)
+        if future is None:
+            future = _executor.submit(_render, path, key, load, variant, max_bytes)
+            _inflight[path] = future
+    return future
+
+
+def _log_failure(future: Future) -> None:
+    exc = future.exception()
+    if exc is not None:
+        logger.warning("Thumbnail pre-render failed: %s", exc)
+
+
+def _render(path: str, key: _MemoryKey, load, variant: Variant, max_bytes: int) -> str:
+    try:
+        if _cache.lookup(path):
+            return path
+        image = load()
+        height, width = image.shape[:2]
+        if variant.size is not None and width > variant.size:
+            target = (variant.size, max(1, round(height * variant.size / width)))
+            image = cv2.resize(image, target, interpolation=cv2.INTER_AREA)  # pylint: disable=no-member
+        ok, buf = cv2.imencode(  # pylint: disable=no-member
+            f".{_FORMAT_EXT[variant.image_format]}", image, variant.encode_params()
+        )
+        if not ok:
+            raise ThumbnailError(f"Failed to encode frame as {variant.image_format}")
+        data = buf.tobytes()
+        _cache.store(path, data, max_bytes)
+        _memory.put(key, data)
+        return path
+    finally:
+        with _inflight_lock:
+            _inflight.pop(path, None)
+
+
+def _read_image(source_path: str) -> np.ndarray:
+    if not os.path.isfile(source_path):
+        raise ThumbnailError("Frame image file not found on disk")
+    image = cv2.imread(source_path, cv2.IMREAD_COLOR)  # pylint: disable=no-member
+    if image is None:
+        raise ThumbnailError("Frame image could not be decoded")
+    return image
+
+
+def _decode_image(data: bytes) -> np.ndarray:
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)  # pylint: disable=no-member
+    if image is None:
+        raise ThumbnailError("Frame image could not be decoded")
+    return image
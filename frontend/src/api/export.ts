@@ -1,5 +1,5 @@
 import { apiRequest } from "./client"
-import type { ExportJobResponse, ExportRequest } from "@/types"
+import type { ExportJobResponse, ExportRequest, FrameSelectionResponse } from "@/types"
 
 export const startExport = (id: number, data: ExportRequest) =>
 	apiRequest<ExportJobResponse>(`/api/v1/exports/timelapses/${id}`, {
@@ -7,6 +7,12 @@ export const startExport = (id: number, data: ExportRequest) =>
 		body: JSON.stringify(data),
 	})
 
+export const countSelectedFrames = (id: number, data: Partial<ExportRequest>) =>
+	apiRequest<FrameSelectionResponse>(`/api/v1/exports/timelapses/${id}/selection`, {
+		method: "POST",
+		body: JSON.stringify(data),
+	})
+
 export const getExportsForTimelapse = (timelapseId: number) =>
 	apiRequest<ExportJobResponse[]>(`/api/v1/exports/list/${timelapseId}`)
 
@@ -16,5 +22,8 @@ export const getExportStatus = (jobId: number) =>
 export const downloadExport = (jobId: number) =>
 	apiRequest<Blob>(`/api/v1/exports/${jobId}/download`)
 
+export const cancelExport = (jobId: number) =>
+	apiRequest<ExportJobResponse>(`/api/v1/exports/${jobId}/cancel`, { method: 'POST' })
+
 export const deleteExport = (jobId: number) =>
 	apiRequest<void>(`/api/v1/exports/${jobId}`, { method: 'DELETE' })
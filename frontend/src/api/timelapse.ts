@@ -1,4 +1,4 @@
-import type { TimelapseCreateRequest, TimelapseResponse, TimelapseUpdateRequest } from "@/types"
+import type { CaptureGapReport, TimelapseCreateRequest, TimelapseResponse, TimelapseUpdateRequest } from "@/types"
 import { apiRequest } from "./client"
 
 export const getTimelapses = (): Promise<TimelapseResponse[]> =>
@@ -22,4 +22,7 @@ export const updateTimelapse = (id: number, data: TimelapseUpdateRequest): Promi
 export const deleteTimelapse = (id: number): Promise<void> =>
 	apiRequest<void>(`/api/v1/timelapses/${id}`, {
 		method: "DELETE",
-	})
\ No newline at end of file
+	})
+
+export const getCaptureGaps = (id: number, factor = 1.5): Promise<CaptureGapReport> =>
+	apiRequest<CaptureGapReport>(`/api/v1/timelapses/${id}/gaps?factor=${factor}`)
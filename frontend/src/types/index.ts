@@ -74,6 +74,32 @@ export interface TimelapseUpdateRequest {
 	ended_at?: string | null;
 }
 
+export interface CaptureGap {
+	start: string;
+	end: string | null;
+	duration_seconds: number;
+	missed_frames: number;
+	ongoing: boolean;
+}
+
+export interface CaptureGapReport {
+	timelapse_id: number;
+	interval_seconds: number;
+	factor: number;
+	frame_count: number;
+	first_captured_at: string | null;
+	last_captured_at: string | null;
+	expected_frames: number;
+	achieved_ratio: number | null;
+	achieved_interval_seconds: number | null;
+	gap_count: number;
+	missed_frames: number;
+	gap_seconds: number;
+	longest_gap: CaptureGap | null;
+	gaps: CaptureGap[];
+	gaps_truncated: boolean;
+}
+
 // ── Frame ─────────────────────────────────────────────────────────────────────
 
 export interface FrameResponse {
@@ -132,6 +158,10 @@ export interface AppSettingsResponse {
 	default_capture_interval_seconds: number;
 	max_frames_per_timelapse: number | null;
 	retention_days: number | null;
+	thumbnail_cache_mb: number;
+	max_concurrent_exports: number;
+	proxy_cache_mb: number;
+	stabilization_cache_mb: number;
 }
 
 export interface AppSettingsUpdateRequest {
@@ -145,13 +175,18 @@ export interface AppSettingsUpdateRequest {
 	default_capture_interval_seconds?: number;
 	max_frames_per_timelapse?: number | null;
 	retention_days?: number | null;
+	thumbnail_cache_mb?: number;
+	max_concurrent_exports?: number;
+	proxy_cache_mb?: number;
+	stabilization_cache_mb?: number;
 }
 
 // ── Export ─────────────────────────────────────────────────────────────────────
 
-export type ExportStatus     = "pending" | "running" | "completed" | "error"
+export type ExportStatus     = "pending" | "running" | "completed" | "error" | "cancelled"
 export type OutputFormat     = "webm" | "mp4"
 export type ExportResolution = "original" | "1920x1080" | "1280x720" | "640x360" | "custom"
+export type SpeedProfile     = "fast" | "balanced" | "archival"
 
 export interface ExportRequest {
 	output_format:      OutputFormat
@@ -163,10 +198,27 @@ export interface ExportRequest {
 	target_duration?:   number
 	stabilization?:     boolean
 	denoising?:         boolean
+	deflicker?:         boolean
 	color_correction?:  'auto' | 'manual'
 	brightness?:        number   // -1.0 to 1.0
 	contrast?:          number   // 0.5 to 2.0
 	saturation?:        number   // 0.0 to 2.0
+	priority?:          number   // higher runs first
+	parallel_segments?: number  // 0 = one per server CPU core
+	speed_profile?:     SpeedProfile
+	incremental?:       boolean  // reuse pieces of earlier incremental exports
+	preview?:           boolean  // short sampled low-resolution clip, rendered on its own lane
+	// Frame selection; the daily window is wall-clock time in the server's timezone setting
+	start_time?:        string   // ISO 8601, captured at or after
+	end_time?:          string   // ISO 8601, captured before
+	daily_start?:       string   // "HH:MM", may wrap midnight together with daily_end
+	daily_end?:         string
+	every_nth?:         number
+	sample_interval_seconds?: number
+}
+
+export interface FrameSelectionResponse {
+	frame_count: number
 }
 
 export interface ExportJobResponse {
@@ -188,8 +240,33 @@ export interface ExportJobResponse {
 	smoothing?:        'blend' | 'interpolate' | null
 	stabilization?:    boolean
 	denoising?:        boolean
+	deflicker?:        boolean
 	color_correction?: 'auto' | 'manual' | null
 	brightness?:       number | null
 	contrast?:         number | null
 	saturation?:       number | null
+	priority:          number
+	parallel_segments: number
+	speed_profile: SpeedProfile
+	incremental: boolean
+	preview: boolean
+	start_time?:       string | null
+	end_time?:         string | null
+	daily_start?:      string | null
+	daily_end?:        string | null
+	every_nth?:        number | null
+	sample_interval_seconds?: number | null
+	queue_position:    number | null
+}
+
+// Pushed by /api/v1/exports/{id}/events while a job is active
+export interface ExportProgress {
+	job_id:       number
+	status:       ExportStatus
+	frames_done:  number
+	total_frames: number
+	progress_pct: number
+	fps:          number | null  // input frames encoded per second
+	speed:        number | null  // seconds of video per second of encoding
+	eta_seconds:  number | null
 }